@@ -1,13 +1,72 @@
-from django.contrib import admin
-from .models import Room, Student, Feedback, CustomUser, ContactInquiry, RoomBooking, Message
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.files.storage import default_storage
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.urls import path
+from django.utils import timezone
+from .models import Room, Student, Feedback, CustomUser, ContactInquiry, RoomBooking, Message, RentLedgerEntry, RentBalance, RoomType, RoomRate, Task
+from .allocation import assign_pending_bookings
+from .bulkio import FORMATS, export_rooms, export_students, import_upload
+from .search import search_ids
 
 # Register your models here.
 
-class StudentAdmin(admin.ModelAdmin):
+class ImportExportMixin:
+    """Adds streaming CSV/JSON Lines import and export pages to a ModelAdmin."""
+    change_list_template = 'admin/import_export_change_list.html'
+    import_kind = None  # Key of hostel.bulkio.IMPORTERS
+    exporter = None
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view),
+                 name=f'{opts.app_label}_{opts.model_name}_import'),
+            path('export/', self.admin_site.admin_view(self.export_view),
+                 name=f'{opts.app_label}_{opts.model_name}_export'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:index')
+        if request.method == 'POST' and request.FILES.get('file'):
+            upload = request.FILES['file']
+            fmt = request.POST.get('format') or ('jsonl' if upload.name.endswith('.jsonl') else 'csv')
+            # Large files take a while, so a worker imports them; the counts and errors end up on the task
+            name = default_storage.save(f'imports/{upload.name}', upload)
+            job = import_upload.delay(kind=self.import_kind, name=name, fmt=fmt if fmt in FORMATS else 'csv')
+            self.message_user(request, f"Importing {upload.name} in the background"
+                                       + (f" (task #{job.pk}); its result is on the task page." if job else "."))
+            return redirect(f'admin:{self.model._meta.app_label}_{self.model._meta.model_name}_changelist')
+        return render(request, 'admin/import_form.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f"Import {self.model._meta.verbose_name_plural}",
+            'formats': FORMATS,
+        })
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            return redirect('admin:index')
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in FORMATS:
+            fmt = 'csv'
+        response = StreamingHttpResponse(
+            self.exporter(fmt),
+            content_type='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.model._meta.model_name}s.{fmt}"'
+        return response
+
+
+class StudentAdmin(ImportExportMixin, admin.ModelAdmin):
+    import_kind = 'students'
+    exporter = staticmethod(export_students)
     list_display = ('name', 'student_id', 'room', 'rent_paid', 'rent_due')
     list_filter = ('room',)
     search_fields = ('name', 'student_id')
-    readonly_fields = ('rent_due',)  # Rent due is calculated automatically
+    readonly_fields = ('rent_paid', 'rent_due')  # Rent is recorded through the ledger
 
     fieldsets = (
         ('Personal Information', {
@@ -18,12 +77,9 @@ class StudentAdmin(admin.ModelAdmin):
         }),
     )
 
-    def save_model(self, request, obj, form, change):
-        """Override save_model to calculate rent due after saving."""
-        obj.calculate_rent_due()
-        super().save_model(request, obj, form, change)
-
-class RoomAdmin(admin.ModelAdmin):
+class RoomAdmin(ImportExportMixin, admin.ModelAdmin):
+    import_kind = 'rooms'
+    exporter = staticmethod(export_rooms)
     list_display = ('room_number', 'room_type', 'capacity', 'beds_available', 'is_available')
     list_filter = ('room_type', 'is_available')
     search_fields = ('room_number',)
@@ -35,47 +91,157 @@ class RoomAdmin(admin.ModelAdmin):
 
 
 class RoomBookingAdmin(admin.ModelAdmin):
-    list_display = ('student', 'room_type', 'room', 'status')
+    list_display = ('student', 'room_type', 'room', 'status', 'priority', 'booking_date')
     list_filter = ('status', 'room_type')
-    actions = ['assign_room']
+    readonly_fields = ('priority',)
+    actions = ['assign_room', 'vacate']
 
     def assign_room(self, request, queryset):
         """Admin action to assign a room to selected bookings."""
-        for booking in queryset:
-            if booking.status == 'pending':
-                # Find an available room of the selected room type
-                available_room = Room.objects.filter(room_type=booking.room_type, is_available=True).first()
-                if available_room:
-                    # Assign the room and update the booking status
-                    booking.assign_room(available_room)  # Call the assign_room method
-                    self.message_user(request, f"Room {available_room.room_number} assigned to {booking.student.name}.")
-                else:
-                    # Notify the student if no room is available
-                    booking.notify_unavailability()
-                    self.message_user(request, f"No available rooms for {booking.student.name}.", level='error')
+        assigned, unmatched = assign_pending_bookings(queryset)
+        if assigned:
+            self.message_user(request, f"Assigned rooms to {len(assigned)} booking(s).")
+        if unmatched:
+            names = ', '.join(booking.student.name for booking in unmatched[:10])
+            if len(unmatched) > 10:
+                names += f" and {len(unmatched) - 10} more"
+            self.message_user(request, f"No available rooms for {names}.", level='error')
 
     assign_room.short_description = "Assign room to selected bookings"
 
+    def vacate(self, request, queryset):
+        """Admin action to end assigned bookings; the freed beds go to the waitlist."""
+        vacated = sum(booking.vacate() for booking in queryset.filter(status='assigned'))
+        self.message_user(request, f"Vacated {vacated} booking(s).")
+
+    vacate.short_description = "Vacate selected bookings"
+
     def save_model(self, request, obj, form, change):
         """Override save_model to call assign_room when a room is assigned."""
-        if obj.room and obj.status == 'pending':  # Check if a room is being assigned
-            obj.assign_room(obj.room)  # Call the assign_room method
+        room = obj.room
+        if room and obj.status == 'pending':  # Check if a room is being assigned
+            # Save the other edits first; assign_room then takes the bed atomically
+            obj.room = None
+            super().save_model(request, obj, form, change)
+            if not obj.assign_room(room):
+                self.message_user(request, f"Room {room.room_number} has no free beds left.", level='error')
+            return
         super().save_model(request, obj, form, change)  # Call the parent save method
 
 
 
-class MessageAdmin(admin.ModelAdmin):
+class FullTextSearchMixin:
+    """
+    Match the search box against the full-text index of search_kind, on top of the
+    search_fields lookups, instead of scanning the text column with icontains.
+    """
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        matched, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if not search_term:
+            return matched, may_have_duplicates
+        ids = search_ids(self.search_kind, search_term)
+        if len(ids) >= getattr(settings, 'SEARCH_RESULT_LIMIT', 200):
+            self.message_user(request, f"Showing the {len(ids)} best text matches only; "
+                                       f"add words to narrow the search.", level=messages.WARNING)
+        return matched | queryset.filter(pk__in=ids), may_have_duplicates
+
+
+class MessageAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('student', 'content', 'timestamp')
     list_filter = ('student',)
-    search_fields = ('student__name', 'content')
+    search_fields = ('student__name',)
+    search_kind = 'message'
+
+
+class FeedbackAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ('student', 'message', 'timestamp')
+    list_select_related = ('student',)
+    date_hierarchy = 'timestamp'
+    search_fields = ('student__name',)
+    search_kind = 'feedback'
+
+
+class ContactInquiryAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ('name', 'email', 'inquiry_type', 'submitted_at')
+    list_filter = ('inquiry_type',)
+    date_hierarchy = 'submitted_at'
+    search_fields = ('name', 'email')
+    search_kind = 'inquiry'
+
+class RentLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'entry_type', 'amount', 'note', 'created_at')
+    list_filter = ('entry_type',)
+    search_fields = ('student__name', 'student__student_id')
+    raw_id_fields = ('student',)
+
+    # The ledger is append-only: entries can be added but never edited or removed
+    def has_change_permission(self, request, obj=None):
+        return obj is None and super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class RentBalanceAdmin(admin.ModelAdmin):
+    list_display = ('student', 'total_charged', 'total_paid', 'balance', 'updated_at')
+    search_fields = ('student__name', 'student__student_id')
+    list_select_related = ('student',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class RoomRateInline(admin.TabularInline):
+    model = RoomRate
+    extra = 1
+    ordering = ('-effective_from',)
+
+
+class RoomTypeAdmin(admin.ModelAdmin):
+    list_display = ('code', 'name', 'current_rent')
+    inlines = (RoomRateInline,)
+
+    def current_rent(self, obj):
+        return RoomType.price_for(obj.code)
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = [field.name for field in Task._meta.fields]
+    actions = ['requeue']
+
+    def has_add_permission(self, request):
+        return False
+
+    def requeue(self, request, queryset):
+        """Admin action to give dead tasks a fresh set of attempts."""
+        requeued = queryset.filter(status='dead').update(status='queued', attempts=0, run_at=timezone.now(),
+                                                         locked_until=None, finished_at=None)
+        self.message_user(request, f"Requeued {requeued} task(s).")
+
+    requeue.short_description = "Requeue selected dead tasks"
+
 
 admin.site.register(Room, RoomAdmin)
 admin.site.register(RoomBooking, RoomBookingAdmin)
 admin.site.register(CustomUser)
 admin.site.register(Student, StudentAdmin)
-admin.site.register(Feedback)
-admin.site.register(ContactInquiry)
+admin.site.register(Feedback, FeedbackAdmin)
+admin.site.register(ContactInquiry, ContactInquiryAdmin)
 admin.site.register(Message, MessageAdmin)
+admin.site.register(RentLedgerEntry, RentLedgerEntryAdmin)
+admin.site.register(RentBalance, RentBalanceAdmin)
+admin.site.register(RoomType, RoomTypeAdmin)
+admin.site.register(Task, TaskAdmin)
 
 
 
@@ -0,0 +1,180 @@
+"""
+Batch room matching for pending room bookings.
+
+The rooms and the stays already in them are loaded once into an in-memory index
+keyed by room type, every booking is matched in waitlist order (priority, then booking
+date) to a room with a bed free for its whole stay, and the results are written back
+with a fixed number of set-based queries however large the batch is. hostel.waitlist
+assigns single beds as they free up.
+"""
+from collections import Counter, defaultdict
+
+from django.db import models, transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from .models import BedOccupancy, Room, RoomBooking, RoomType, Student
+from .notifications import send_booking_messages
+from .signals import bookings_changed, room_beds_changed
+from .versions import bump_student_versions
+
+# Room types that can satisfy each booking preference
+BOOKING_ROOM_TYPES = {
+    'single': ('single', 'studio'),
+    'double': ('twin',),
+    'shared': ('4_sharing', '6_sharing', '8_sharing'),
+}
+
+
+def compatible_room_types(booking_room_type):
+    """Return the room types that satisfy a booking preference, best match first.
+
+    Fallbacks are ranked by size (fewest beds per room first) and then by price.
+    A preference that is already a room type only matches that room type.
+    """
+    room_types = BOOKING_ROOM_TYPES.get(booking_room_type, (booking_room_type,))
+    return sorted(room_types, key=lambda room_type: (
+        Room.ROOM_TYPE_SIZES.get(room_type, 0), RoomType.price_for(room_type)
+    ))
+
+
+class RoomIndex:
+    """Rooms and the stays already in them held in memory, one list of rooms per room type."""
+
+    def __init__(self, rooms, stays=()):
+        """rooms: Room objects in the order to fill them; stays: (room_id, start, end) rows."""
+        self.stays = defaultdict(list)  # room id -> [(start, end)]
+        for room_id, start, end in stays:
+            self.stays[room_id].append((start, end))
+        self.rooms_by_type = defaultdict(list)
+        for room in rooms:
+            self.rooms_by_type[room.room_type].append(room)
+
+    def free(self, room_types, start, end):
+        """Yield the rooms with a bed free for the whole of [start, end), room types in the order given."""
+        for room_type in room_types:
+            for room in self.rooms_by_type.get(room_type, ()):
+                overlapping = [(s, e) for s, e in self.stays[room.pk] if s < end and e > start]
+                if BedOccupancy.most_taken(overlapping + [(start, end)]) <= room.capacity:
+                    yield room
+
+    def take(self, room_types, start, end):
+        """Take a bed for [start, end) in the first room in free(), or return None if there is none."""
+        room = next(self.free(room_types, start, end), None)
+        if room:
+            self.stays[room.pk].append((start, end))
+        return room
+
+
+def match_bookings(bookings, rooms, stays=()):
+    """
+    Match bookings to rooms in memory, each to a room with a bed free for its whole stay
+    given the stays (room_id, start, end) already in the rooms. Returns (list of
+    (booking, room), unmatched bookings).
+    """
+    index = RoomIndex(rooms, stays)
+    assigned, unmatched = [], []
+    for booking in bookings:
+        room = index.take(compatible_room_types(booking.room_type), booking.check_in_date, booking.check_out_date)
+        if room:
+            assigned.append((booking, room))
+        else:
+            unmatched.append(booking)
+    return assigned, unmatched
+
+
+def assign_pending_bookings(queryset):
+    """
+    Assign rooms to every pending booking in queryset and notify the students.
+
+    Runs a fixed number of queries per batch. If another assigner changes the same
+    rooms or bookings in the meantime, the batch is rolled back and the bookings are
+    assigned one by one through RoomBooking.assign_room instead.
+    Returns (list of (booking, room), unmatched bookings).
+    """
+    bookings = list(queryset.filter(status='pending').select_related('student')
+                    .order_by('-priority', 'booking_date', 'pk'))  # Waitlist order
+    if not bookings:
+        return [], []
+
+    room_types = {room_type for booking in bookings for room_type in compatible_room_types(booking.room_type)}
+    start = min(booking.check_in_date for booking in bookings)
+    end = max(booking.check_out_date for booking in bookings)
+    with transaction.atomic():
+        # Every room of the types, not only those with a bed free today: a stay that starts
+        # later fits a room that is full now. Partly filled rooms first, so fewer end up half empty.
+        rooms = list(Room.objects.select_for_update().filter(room_type__in=room_types)
+                     .order_by('beds_available', 'room_number'))
+        # Locked rooms take no new stays, so these are all the stays the matches have to fit around
+        stays = BedOccupancy.objects.filter(room__in=rooms, start__lt=end, end__gt=start).values_list(
+            'room_id', 'start', 'end')
+        assigned, unmatched = match_bookings(bookings, rooms, stays)
+        if assigned and not _write_assignments(assigned):
+            transaction.set_rollback(True)
+            conflicted = True
+        else:
+            # One queued task writes every message, however many students there are
+            send_booking_messages.delay(assigned=[[booking.pk, room.pk] for booking, room in assigned],
+                                        unmatched=[booking.pk for booking in unmatched])
+            conflicted = False
+
+    if conflicted:
+        return _assign_one_by_one([booking.pk for booking in bookings])
+    for booking, room in assigned:
+        booking.room = room
+        booking.status = 'assigned'
+    if assigned:
+        room_beds_changed.send(sender=Room, room_ids=list({room.pk for _, room in assigned}))
+        bookings_changed.send(sender=RoomBooking, booking_ids=[booking.pk for booking, _ in assigned])
+    return assigned, unmatched
+
+
+def _write_assignments(assigned):
+    """
+    Take the matched beds and claim the bookings. Returns False if anything changed underneath.
+    match_bookings checked the dates against the stays loaded after the rooms were locked,
+    which no other assigner can add to before this transaction ends.
+    """
+    # Only stays that have begun take a bed today; the others count from their check-in
+    today = timezone.localdate()
+    beds_taken = Counter(room.pk for booking, room in assigned if booking.stays_on(today))
+    if not Room.take_beds(beds_taken):
+        return False
+
+    bookings_by_room = defaultdict(list)
+    for booking, room in assigned:
+        bookings_by_room[room.pk].append(booking.pk)
+    claimed = RoomBooking.objects.filter(
+        pk__in=[booking.pk for booking, _ in assigned], status='pending'
+    ).update(status='assigned', room=Case(
+        *(When(pk__in=booking_ids, then=Value(room_id)) for room_id, booking_ids in bookings_by_room.items()),
+        output_field=models.BigIntegerField(),
+    ))
+    if claimed != len(assigned):
+        return False
+    BedOccupancy.record(assigned)
+    Student.move_in(assigned)
+    bump_student_versions(booking.student_id for booking, _ in assigned)
+    return True
+
+
+def _assign_one_by_one(booking_ids):
+    """Slow path used after a conflict: assign each still-pending booking on its own."""
+    assigned, unmatched = [], []
+    bookings = (RoomBooking.objects.filter(pk__in=booking_ids, status='pending')
+                .select_related('student').order_by('-priority', 'booking_date', 'pk'))
+    for booking in bookings:
+        start, end = booking.check_in_date, booking.check_out_date
+        room_types = compatible_room_types(booking.room_type)
+        rooms = list(Room.objects.filter(room_type__in=room_types).order_by('beds_available', 'room_number'))
+        index = RoomIndex(rooms, BedOccupancy.objects.filter(room__in=rooms, start__lt=end, end__gt=start)
+                          .values_list('room_id', 'start', 'end'))
+        # Read without locks; assign_room checks the room again once it holds the lock
+        room = next((room for room in index.free(room_types, start, end) if booking.assign_room(room)), None)
+        if room:
+            assigned.append((booking, room))
+        else:
+            unmatched.append(booking)
+    if unmatched:
+        send_booking_messages.delay(unmatched=[booking.pk for booking in unmatched])
+    return assigned, unmatched
@@ -0,0 +1,168 @@
+"""
+Read-only JSON API (v1) for the mobile and kiosk clients, under /hostel/api/v1/.
+
+Every response carries a strong ETag computed from the data versions behind it (see
+hostel.versions), the URL and, for a student's own data, who is asking. Reading the
+versions is a cache lookup, so a poll whose If-None-Match still matches gets a 304
+without running the view: no query and no serialising. The serialised body of a 200
+is kept in the cache under its ETag too, so the first poll after a change builds it
+once and every other client gets the same bytes. Both need the shared cache that
+hostel.checks insists on, or changes made by another process never move the ETag. Lists are paginated with keyset
+cursors (hostel.pagination): pass `cursor` from `next` or `previous`, and `limit`.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Sum
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+from .models import InboxCounter, Message, Room, RoomBooking, RoomType
+from .pagination import keyset_paginate
+from .versions import get_versions
+
+API_VERSION = 'v1'
+BODY_KEY = 'hostel:api:%s'  # ETag
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _page_size(request):
+    default = getattr(settings, 'API_PAGE_SIZE', 50)
+    try:
+        size = int(request.GET.get('limit', default))
+    except ValueError:
+        size = default
+    return max(1, min(size, getattr(settings, 'API_MAX_PAGE_SIZE', 200)))
+
+
+def _page(page, serialize):
+    return {'data': [serialize(row) for row in page], 'next': page.next_cursor, 'previous': page.previous_cursor}
+
+
+def api_view(version_names, student=False):
+    """
+    Serve the decorated view, which returns JSON-ready data, with an ETag from the data
+    versions that version_names(request) lists. student=True limits the view to logged-in
+    students and keys the ETag by user.
+    """
+    def decorate(view):
+        @require_safe
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if student:
+                if not request.user.is_authenticated:
+                    return _error('Authentication required.', 401)
+                if getattr(request.user, 'student', None) is None:  # Loaded with the user by hostel.identity
+                    return _error('Only students have bookings and messages.', 403)
+
+            versions = get_versions(*version_names(request))
+            # Prices depend on the date, so the day is part of every ETag
+            parts = [API_VERSION, request.get_full_path(), request.user.pk if student else None,
+                     str(timezone.localdate()), sorted(versions.items())]
+            etag = hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()[:32]
+            response = get_conditional_response(request, etag=quote_etag(etag))
+            if response is None:
+                body = cache.get(BODY_KEY % etag)
+                if body is None:
+                    body = json.dumps(view(request, *args, **kwargs), cls=DjangoJSONEncoder, separators=(',', ':'))
+                    cache.set(BODY_KEY % etag, body, getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300))
+                response = HttpResponse(body, content_type='application/json')
+            response['ETag'] = quote_etag(etag)
+            patch_cache_control(response, no_cache=True, **({'private': True} if student else {}))
+            if student:
+                patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorate
+
+
+def _catalogue_versions(request):
+    return ('rooms', 'room_types')
+
+
+def _student_versions(request):
+    return (f'student:{request.user.student.pk}', 'rooms')  # Bookings show their room's number
+
+
+@api_view(_catalogue_versions)
+def rooms(request):
+    """Rooms with a free bed, by room type and number."""
+    free = Room.objects.filter(is_available=True, beds_available__gt=0).only(
+        'room_number', 'room_type', 'capacity', 'beds_available')
+    if request.GET.get('type'):
+        free = free.filter(room_type=request.GET['type'])
+    page = keyset_paginate(free, ('room_type', 'room_number'), request.GET.get('cursor'), _page_size(request))
+    return _page(page, lambda room: {
+        'id': room.pk,
+        'number': room.room_number,
+        'type': room.room_type,
+        'capacity': room.capacity,
+        'free_beds': room.beds_available,
+        'rent': RoomType.price_for(room.room_type),
+    })
+
+
+@api_view(_catalogue_versions)
+def room_types(request):
+    """Every room type with today's rent and its free rooms and beds."""
+    free = {
+        row['room_type']: row
+        for row in Room.objects.filter(is_available=True, beds_available__gt=0).values('room_type')
+        .annotate(rooms=Count('pk'), beds=Sum('beds_available')).order_by()
+    }
+    return {'data': [
+        {
+            'code': code,
+            'name': name,
+            'rent': RoomType.price_for(code),
+            'beds_per_room': Room.ROOM_TYPE_SIZES.get(code),
+            'free_rooms': free.get(code, {}).get('rooms', 0),
+            'free_beds': free.get(code, {}).get('beds', 0),
+        }
+        for code, (name, _) in sorted(RoomType.catalogue().items())
+    ]}
+
+
+@api_view(_student_versions, student=True)
+def my_bookings(request):
+    """The logged-in student's bookings, newest first."""
+    bookings = RoomBooking.objects.filter(student=request.user.student).select_related('room')
+    page = keyset_paginate(bookings, ('-booking_date',), request.GET.get('cursor'), _page_size(request))
+    return _page(page, lambda booking: {
+        'id': booking.pk,
+        'status': booking.status,
+        'room_type': booking.room_type,
+        'room': booking.room.room_number if booking.room else None,
+        'check_in': booking.check_in_date,
+        'check_out': booking.check_out_date,
+        'duration': booking.duration_of_stay,
+        'booked_at': booking.booking_date,
+    })
+
+
+@api_view(_student_versions, student=True)
+def my_messages(request):
+    """The logged-in student's messages, newest first; ?unread=1 for the unread ones only."""
+    student = request.user.student
+    inbox = Message.objects.filter(student=student)
+    if request.GET.get('unread') == '1':
+        inbox = inbox.filter(is_read=False)
+    page = keyset_paginate(inbox, ('-timestamp',), request.GET.get('cursor'), _page_size(request))
+    data = _page(page, lambda message: {
+        'id': message.pk,
+        'content': message.content,
+        'sent_at': message.timestamp,
+        'read': message.is_read,
+    })
+    data['unread'] = InboxCounter.unread_for(student.pk)
+    return data
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class HostelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hostel'
+
+    def ready(self):
+        from . import availability  # noqa: F401  Connects the cache invalidation receivers
+        from . import checks  # noqa: F401  Registers the system checks
+        from . import dashboard  # noqa: F401  Connects the dashboard snapshot refresh receivers
+        from . import identity  # noqa: F401  Connects the cached user invalidation receivers
+        from . import inbox  # noqa: F401  Connects the unread counter receivers
+        from . import live  # noqa: F401  Connects the receivers that publish live events
+        from . import occupancy  # noqa: F401  Connects the occupancy version receivers
+        from . import pricing  # noqa: F401  Connects the price change receivers
+        from . import querystats  # noqa: F401  Connects the receiver that hooks new connections
+        from . import versions  # noqa: F401  Connects the data version receivers
+        from . import waitlist  # noqa: F401  Connects the receivers that fill freed beds
@@ -0,0 +1,115 @@
+"""
+Cached snapshot of free rooms for the student-facing room listing.
+
+The snapshot lives in Django's cache framework, so the hot read path does no
+database work. Writes to Room (saves, deletes and bed assignments) drop the
+snapshot once their transaction commits; settings.ROOM_AVAILABILITY_CACHE_TIMEOUT
+bounds how stale it can get if a write bypasses those hooks.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Room, RoomType
+from .signals import room_beds_changed
+
+SNAPSHOT_KEY = 'hostel:room-availability'
+
+# Card image for each room type on the landing page
+ROOM_IMAGES = {
+    'single': 'assets/images/single (2).jpg',
+    'studio': 'assets/images/studio.jpg',
+    'twin': 'assets/images/twinroom.jpg',
+    '4_sharing': 'assets/images/4sharing.jpg',
+    '6_sharing': 'assets/images/6sharing.jpg',
+    '8_sharing': 'assets/images/8sharing.jpg',
+}
+
+
+def _cache():
+    return caches[getattr(settings, 'ROOM_AVAILABILITY_CACHE', 'default')]
+
+
+def _free_rooms():
+    return (
+        Room.objects.filter(is_available=True, beds_available__gt=0)
+        .order_by('room_type', 'room_number')
+        .values('id', 'room_number', 'room_type', 'capacity', 'beds_available')
+    )
+
+
+def _summarise(rooms):
+    free_beds_by_type = {}
+    for room in rooms:
+        room['room_type_display'] = RoomType.name_for(room['room_type'])
+        room['rent_price'] = RoomType.price_for(room['room_type'])
+        free_beds_by_type[room['room_type']] = free_beds_by_type.get(room['room_type'], 0) + room['beds_available']
+    return {
+        'rooms': rooms,
+        'free_beds_by_type': free_beds_by_type,
+        'built_at': time.time(),
+    }
+
+
+def build_availability_snapshot():
+    """Read free rooms from the database and summarise free beds per room type."""
+    return _summarise(list(_free_rooms()))
+
+
+def get_availability_snapshot():
+    """Return the cached snapshot, rebuilding it on a miss."""
+    cache = _cache()
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        snapshot = build_availability_snapshot()
+        cache.set(SNAPSHOT_KEY, snapshot, getattr(settings, 'ROOM_AVAILABILITY_CACHE_TIMEOUT', 30))
+    return snapshot
+
+
+async def aget_availability_snapshot():
+    """Async version of get_availability_snapshot(), for async views."""
+    cache = _cache()
+    snapshot = await cache.aget(SNAPSHOT_KEY)
+    if snapshot is None:
+        # The catalogue behind the names and prices may need loading, which is sync ORM work
+        snapshot = await sync_to_async(_summarise)([room async for room in _free_rooms()])
+        await cache.aset(SNAPSHOT_KEY, snapshot, getattr(settings, 'ROOM_AVAILABILITY_CACHE_TIMEOUT', 30))
+    return snapshot
+
+
+def room_type_cards():
+    """One entry per room type with its name, monthly rent, image and free beds."""
+    free_beds = get_availability_snapshot()['free_beds_by_type']
+    return [
+        {
+            'room_type': room_type,
+            'name': RoomType.name_for(room_type),
+            'rent_price': RoomType.price_for(room_type),
+            'image': ROOM_IMAGES.get(room_type),
+            'free_beds': free_beds.get(room_type, 0),
+        }
+        for room_type in Room.ROOM_TYPE_SIZES  # Smallest rooms first
+    ]
+
+
+def room_catalogue(request):
+    """Context processor: `room_cards` is built only if a template uses it outside a cached fragment."""
+    return {'room_cards': room_type_cards}
+
+
+def invalidate_availability():
+    """Drop the snapshot once the current transaction commits (immediately outside one)."""
+    transaction.on_commit(lambda: _cache().delete(SNAPSHOT_KEY))
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(room_beds_changed)
+def drop_availability_snapshot(sender, **kwargs):
+    invalidate_availability()
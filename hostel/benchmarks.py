@@ -0,0 +1,368 @@
+"""
+Micro-benchmarks for the models, admin actions and hot views.
+
+seed() fills the database with synthetic data at a given scale, run_benchmarks()
+times each case and returns a JSON-serialisable report, and compare() flags cases
+that got slower than a stored baseline. explain_hot_queries() captures query plans
+and timings for the hot lookups with and without their supporting indexes. Every timed run happens inside a transaction
+that is rolled back afterwards, so each repetition starts from the same data.
+slow_client_throughput() compares requests per second of a threaded WSGI worker and
+an ASGI event loop when clients are slow to read their responses.
+Use the `benchmark` management command to run them against a throwaway test database.
+"""
+import asyncio
+import io
+import platform
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+import django
+from django.contrib.admin.sites import site
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.template import engines
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from .dashboard import rebuild as rebuild_dashboard
+from .models import CustomUser, Feedback, Message, RentBalance, Room, RoomBooking, Student
+from .occupancy import OccupancyIndex
+from .querystats import QueryRecorder
+
+ROOM_MIX = ['single', 'studio', 'twin', '4_sharing', '6_sharing', '8_sharing']
+BOOKING_MIX = ['single', 'double', 'shared']
+
+
+class _Rollback(Exception):
+    pass
+
+
+def seed(scale, batch_size=2000):
+    """Create scale students, scale // 2 rooms, scale // 10 pending bookings, balances and messages."""
+    rooms = Room.objects.bulk_create([
+        Room(room_number=f'B{i:06d}', room_type=ROOM_MIX[i % len(ROOM_MIX)],
+             capacity=Room.ROOM_TYPE_SIZES[ROOM_MIX[i % len(ROOM_MIX)]],
+             beds_available=Room.ROOM_TYPE_SIZES[ROOM_MIX[i % len(ROOM_MIX)]])
+        for i in range(max(scale // 2, 1))
+    ], batch_size=batch_size)
+    users = CustomUser.objects.bulk_create([
+        CustomUser(username=f'bench{i}', user_type='student', password='!') for i in range(scale)
+    ], batch_size=batch_size)
+    students = Student.objects.bulk_create([
+        Student(user=user, name=f'Student {i}', email=f'bench{i}@example.com', student_id=f'B{i:08d}',
+                phone=f'07{i:08d}', room=rooms[i % len(rooms)] if i % 3 else None,
+                rent_paid=Decimal(8500 if i % 4 else 2000), rent_due=Decimal(0 if i % 4 else 6500))
+        for i, user in enumerate(users)
+    ], batch_size=batch_size)
+    RentBalance.objects.bulk_create([
+        RentBalance(student=student, total_charged=Decimal(8500), total_paid=Decimal(8500 if i % 4 else 2000),
+                    balance=Decimal(0 if i % 4 else 6500))
+        for i, student in enumerate(students)
+    ], batch_size=batch_size)
+    RoomBooking.objects.bulk_create([
+        RoomBooking(student=student, room_type=BOOKING_MIX[i % len(BOOKING_MIX)],
+                    check_in_date=date.today() + timedelta(days=30), duration_of_stay='one_semester')
+        for i, student in enumerate(students[::10])
+    ], batch_size=batch_size)
+    Message.objects.bulk_create([
+        Message(student=student, content=f'Seeded message {n}')
+        for student in students[:max(scale // 10, 1)] for n in range(5)
+    ], batch_size=batch_size)
+    Feedback.objects.bulk_create([
+        Feedback(student=student, message='Seeded feedback') for student in students[::10]
+    ], batch_size=batch_size)
+    admin = CustomUser.objects.create(username='bench-admin', user_type='admin', is_staff=True,
+                                      is_superuser=True, password='!')
+    return {'admin': admin, 'student_user': users[0]}
+
+
+def _timed(run, setup=None, repeat=5):
+    """Time run() repeat times, each inside a rolled-back transaction. setup() runs untimed first."""
+    timings, queries = [], []
+    for _ in range(repeat):
+        try:
+            with transaction.atomic():
+                arg = setup() if setup else None
+                with QueryRecorder() as recorder:
+                    start = time.perf_counter()
+                    run(arg)
+                    timings.append(time.perf_counter() - start)
+                queries.append(recorder.count)
+                raise _Rollback
+        except _Rollback:
+            pass
+    return {
+        'median': statistics.median(timings),
+        'min': min(timings),
+        'mean': statistics.mean(timings),
+        'runs': len(timings),
+        'queries': max(queries),
+    }
+
+
+def _cases(fixtures, ops):
+    admin_client, student_client = Client(), Client()
+    admin_client.force_login(fixtures['admin'])
+    student_client.force_login(fixtures['student_user'])
+    request = RequestFactory().post('/admin/hostel/roombooking/')
+    request.user = fixtures['admin']
+    request._messages = CookieStorage(request)  # The admin action reports back through messages
+    booking_admin = site._registry[RoomBooking]
+    due = date.today().replace(day=28)
+
+    def save_students(students):
+        for student in students:
+            student.save()
+
+    def assign_each(pairs):
+        for booking, room in pairs:
+            booking.assign_room(room)
+
+    def cold_templates():
+        # Drop cached fragments and compiled templates, as after a deploy
+        cache.clear()
+        for loader in engines['django'].engine.template_loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
+
+    def occupancy_index():
+        # Every bed booked for back-to-back semesters over two years, staggered by room
+        rooms = list(Room.objects.values_list('id', 'room_type', 'capacity'))
+        today = date.today()
+        stays = [
+            (room_id, start, start + timedelta(days=120))
+            for room_id, _, capacity in rooms for bed in range(capacity)
+            for start in (today + timedelta(days=(room_id + bed) % 60 + 120 * n) for n in range(6))
+        ]
+        return OccupancyIndex(rooms, stays)
+
+    def query_occupancy(index):
+        start = date.today() + timedelta(days=200)
+        for room_type in ROOM_MIX:
+            index.free_beds(room_type, start, start + timedelta(days=120))
+            index.earliest_free(room_type, start, 120)
+
+    def pending_pairs():
+        bookings = list(RoomBooking.objects.filter(status='pending').select_related('student')[:ops])
+        rooms = list(Room.objects.filter(is_available=True, beds_available__gt=0)[:ops])
+        return list(zip(bookings, rooms))
+
+    return {
+        'student_save': dict(
+            setup=lambda: list(Student.objects.select_related('room')[:ops]),
+            run=save_students),
+        'booking_assign_room': dict(setup=pending_pairs, run=assign_each),
+        'admin_assign_action': dict(
+            run=lambda _: booking_admin.assign_room(request, RoomBooking.objects.filter(status='pending'))),
+        'send_rent_reminders': dict(
+            run=lambda _: call_command('send_rent_reminders', date=due.isoformat(), due_day=due.day,
+                                       stdout=io.StringIO())),
+        'occupancy_queries': dict(setup=occupancy_index, run=query_occupancy),
+        'view_student_rooms': dict(run=lambda _: student_client.get(reverse('student_rooms'))),
+        'view_rent_management': dict(run=lambda _: admin_client.get(reverse('rent_management'))),
+        'view_admin_dashboard': dict(setup=rebuild_dashboard, run=lambda _: admin_client.get(reverse('admin_dashboard'))),
+        'view_my_profile': dict(run=lambda _: student_client.get(reverse('my_profile'))),
+        'view_my_profile_cold': dict(setup=cold_templates, run=lambda _: student_client.get(reverse('my_profile'))),
+        'view_index': dict(run=lambda _: student_client.get(reverse('index'))),
+        'view_index_cold': dict(setup=cold_templates, run=lambda _: student_client.get(reverse('index'))),
+        'view_book_room': dict(run=lambda _: student_client.get(reverse('book_room'))),
+        'view_book_room_cold': dict(setup=cold_templates, run=lambda _: student_client.get(reverse('book_room'))),
+    }
+
+
+def run_benchmarks(scale=1000, repeat=5, ops=100, only=None):
+    """Seed the database and time every case. Returns the report as a dict."""
+    started = timezone.now()
+    fixtures = seed(scale)
+    results = {}
+    for name, case in _cases(fixtures, ops).items():
+        if only and name not in only:
+            continue
+        try:
+            results[name] = _timed(case['run'], case.get('setup'), repeat)
+        except Exception as exc:  # A broken case is reported, not fatal to the rest of the suite
+            results[name] = {'error': f'{type(exc).__name__}: {exc}'}
+    return {
+        'meta': {
+            'scale': scale,
+            'repeat': repeat,
+            'ops': ops,
+            'vendor': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'started_at': started.isoformat(),
+        },
+        'results': results,
+    }
+
+
+def _wsgi_get(handler, path, cookie, client_delay):
+    environ = RequestFactory(HTTP_COOKIE=cookie).get(path).environ
+    response = handler(environ, lambda status, headers: None)
+    try:
+        for _ in response:
+            time.sleep(client_delay)  # The worker thread is stuck writing to a slow client
+    finally:
+        response.close()
+
+
+async def _asgi_get(application, path, cookie, client_delay):
+    done = asyncio.Event()
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.body' and not message.get('more_body'):
+            await asyncio.sleep(client_delay)  # Only this request waits on the slow client
+            done.set()
+
+    path, _, query = path.partition('?')
+    await application({
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }, receive, send)
+
+
+def slow_client_throughput(scale=1000, clients=50, requests=300, client_delay=0.05, threads=4):
+    """
+    Seed the database, then serve requests GETs of the async student views to clients
+    concurrent clients that each take client_delay seconds to read a response: once
+    through a WSGI handler on a pool of threads (one worker with that many threads),
+    once through the ASGI application on a single event loop. Returns the report as a dict.
+    """
+    fixtures = seed(scale)
+    client = Client()
+    client.force_login(fixtures['student_user'])
+    cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+    paths = [reverse(name) for name in ('index', 'student_rooms', 'my_profile')]
+    jobs = [paths[i % len(paths)] for i in range(requests)]
+
+    handler = WSGIHandler()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda path: _wsgi_get(handler, path, cookie, client_delay), jobs))
+    wsgi_seconds = time.perf_counter() - start
+
+    application = get_asgi_application()
+
+    async def serve_all():
+        slots = asyncio.Semaphore(clients)
+
+        async def one(path):
+            async with slots:
+                await _asgi_get(application, path, cookie, client_delay)
+
+        await asyncio.gather(*(one(path) for path in jobs))
+
+    start = time.perf_counter()
+    asyncio.run(serve_all())
+    asgi_seconds = time.perf_counter() - start
+
+    return {
+        'meta': {'scale': scale, 'clients': clients, 'requests': requests, 'client_delay': client_delay,
+                 'wsgi_threads': threads, 'vendor': connection.vendor, 'django': django.get_version()},
+        'results': {
+            'wsgi': {'seconds': wsgi_seconds, 'requests_per_second': requests / wsgi_seconds},
+            'asgi': {'seconds': asgi_seconds, 'requests_per_second': requests / asgi_seconds},
+        },
+    }
+
+
+def _hot_queries(fixtures):
+    """name -> (model, names of the indexes that serve it, queryset factory)."""
+    student_id = fixtures['student_user'].student.pk
+    return {
+        'free_rooms_by_type': (Room, ['hostel_room_type_free_idx'], lambda: (
+            Room.objects.filter(room_type__in=['twin'], is_available=True, beds_available__gt=0)
+            .order_by('beds_available', 'room_number')[:50])),
+        'inbox_page': (Message, ['hostel_message_inbox_idx'], lambda: (
+            Message.objects.filter(student_id=student_id).order_by('-timestamp', '-pk')[:21])),
+        'profile_bookings': (RoomBooking, ['hostel_booking_student_idx'], lambda: (
+            RoomBooking.objects.filter(student_id=student_id).order_by('-booking_date')[:10])),
+        'pending_bookings': (RoomBooking, ['hostel_booking_status_idx'], lambda: (
+            RoomBooking.objects.filter(status='pending').order_by('booking_date', 'pk')[:2000])),
+        # The rent page's balances owed, largest first
+        'debtors': (RentBalance, ['hostel_rentbalance_balance_idx'], lambda: (
+            RentBalance.objects.filter(balance__gt=0).order_by('-balance')[:50])),
+        # A batch of send_rent_reminders, resuming after the last student reminded. The primary
+        # key serves it: the range scan stops once it has a batch, so a whole run reads each
+        # student once, and an index on the debtors alone measured no faster.
+        'reminder_batch': (Student, [], lambda: (
+            Student.objects.filter(rent_due__gt=0, pk__gt=student_id).order_by('pk')
+            .values_list('pk', 'rent_due')[:2000])),
+        'feedback_page': (Feedback, ['hostel_feedback_time_idx'], lambda: (
+            Feedback.objects.order_by('-timestamp', '-pk')[:51])),
+    }
+
+
+def _full_scan(plan):
+    """Best-effort check of an EXPLAIN plan for a full table scan."""
+    if connection.vendor == 'sqlite':
+        return any(line.split('SCAN ', 1)[-1].count(' USING ') == 0
+                   for line in plan.splitlines() if 'SCAN ' in line and 'TEMP B-TREE' not in line)
+    return ' ALL ' in f' {plan} '  # MySQL access type for a full scan
+
+
+def _measure(factory, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(factory())
+        timings.append(time.perf_counter() - start)
+    plan = factory().explain()
+    return {'median': statistics.median(timings), 'plan': plan, 'full_scan': _full_scan(plan)}
+
+
+def explain_hot_queries(scale=100000, repeat=5):
+    """
+    Seed the database, then time and EXPLAIN each hot query with its indexes
+    dropped ("before") and restored ("after"). Returns the report as a dict.
+    """
+    fixtures = seed(scale)
+    results = {}
+    for name, (model, index_names, factory) in _hot_queries(fixtures).items():
+        indexes = [index for index in model._meta.indexes if index.name in index_names]
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(model, index)
+        before = _measure(factory, repeat)
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(model, index)
+        after = _measure(factory, repeat)
+        results[name] = {'indexes': index_names, 'before': before, 'after': after}
+    return {
+        'meta': {'scale': scale, 'repeat': repeat, 'vendor': connection.vendor, 'django': django.get_version()},
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold=0.2):
+    """Return [(name, baseline median, current median, ratio)] for cases slower than baseline by > threshold."""
+    regressions = []
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or 'median' not in previous or 'median' not in current:
+            continue
+        ratio = current['median'] / previous['median'] if previous['median'] else 0
+        if ratio > 1 + threshold:
+            regressions.append((name, previous['median'], current['median'], ratio))
+    return regressions
@@ -0,0 +1,280 @@
+"""
+Streaming bulk import and export of rooms and students.
+
+Imports read CSV or JSON Lines a chunk at a time, validate each chunk against the
+unique keys already in the database with one IN query per key and chunk (plus an
+in-memory set of keys seen earlier in the file), and write the valid rows with
+bulk_create. Exports walk the table with a server-side iterator and yield encoded
+lines, so neither direction ever holds the whole table in memory. Uploads from the
+admin are imported by a background task (import_upload), not in the request.
+"""
+import csv
+import io
+import json
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BedOccupancy, CustomUser, RentLedgerEntry, Room, RoomBooking, Student
+from .queue import task
+from .signals import room_beds_changed
+
+FORMATS = ('csv', 'jsonl')
+
+ROOM_FIELDS = ['room_number', 'room_type', 'capacity', 'beds_available']
+STUDENT_FIELDS = ['student_id', 'name', 'email', 'phone', 'username', 'room_number']
+IMPORTED_STAY = 'one_year'  # Imported students with a room hold their bed from the import date for this long
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []  # (line number, message)
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, dict) for each record in a text stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key.strip(): (value or '').strip() for key, value in row.items() if key}
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield line_number, None
+                    continue
+                yield line_number, {key: '' if value is None else str(value).strip() for key, value in row.items()}
+    else:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {', '.join(FORMATS)}.")
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def import_rooms(stream, fmt='csv', batch_size=1000):
+    """Import rooms from a text stream. Rows with errors are skipped and reported."""
+    result = ImportResult()
+    seen = set()
+    room_types = dict(Room.ROOM_TYPE_CHOICES)
+    for chunk in chunked(read_rows(stream, fmt), batch_size):
+        numbers = [row.get('room_number') for _, row in chunk if row]
+        existing = set(Room.objects.filter(room_number__in=numbers).values_list('room_number', flat=True))
+        rooms = []
+        for line, row in chunk:
+            if row is None:
+                result.error(line, 'Not valid JSON.')
+                continue
+            number = row.get('room_number', '')
+            if not number or len(number) > 10:
+                result.error(line, 'room_number is required and at most 10 characters.')
+            elif number in existing or number in seen:
+                result.error(line, f'Room {number} already exists.')
+            elif row.get('room_type') not in room_types:
+                result.error(line, f"Unknown room_type '{row.get('room_type')}'.")
+            else:
+                try:
+                    capacity = int(row.get('capacity') or 1)
+                    beds = int(row['beds_available']) if row.get('beds_available') else capacity
+                except ValueError:
+                    result.error(line, 'capacity and beds_available must be whole numbers.')
+                    continue
+                if capacity < 1 or not 0 <= beds <= capacity:
+                    result.error(line, 'Need capacity >= 1 and 0 <= beds_available <= capacity.')
+                    continue
+                seen.add(number)
+                # bulk_create skips Room.save, so set availability here
+                rooms.append(Room(room_number=number, room_type=row['room_type'], capacity=capacity,
+                                  beds_available=beds, is_available=beds > 0))
+        with transaction.atomic():
+            created = Room.objects.bulk_create(rooms)
+        result.created += len(created)
+        if created:
+            room_beds_changed.send(sender=Room, room_ids=[room.pk for room in created])
+    return result
+
+
+def _max_lengths(model, fields):
+    return {field: model._meta.get_field(field).max_length for field in fields}
+
+
+def import_students(stream, fmt='csv', batch_size=1000):
+    """
+    Import students from a text stream, creating a login for each with an unusable
+    password (they set one through password reset). A student given a room takes one
+    of its free beds with an assigned booking and its stay, from today for IMPORTED_STAY,
+    so the bed stays taken when Room.count_free_beds recounts it. Rows with errors are skipped.
+    """
+    result = ImportResult()
+    seen_ids, seen_phones, seen_usernames = set(), set(), set()
+    max_lengths = _max_lengths(Student, ['name', 'email', 'phone']) | _max_lengths(CustomUser, ['username'])
+    check_in = timezone.localdate()
+    check_out = RoomBooking(check_in_date=check_in, duration_of_stay=IMPORTED_STAY).check_out_date
+    for chunk in chunked(read_rows(stream, fmt), batch_size):
+        rows = [row for _, row in chunk if row]
+        existing_ids = set(Student.objects.filter(
+            student_id__in=[row.get('student_id') for row in rows]).values_list('student_id', flat=True))
+        existing_phones = set(Student.objects.filter(
+            phone__in=[row['phone'] for row in rows if row.get('phone')]).values_list('phone', flat=True))
+        existing_usernames = set(CustomUser.objects.filter(
+            username__in=[row.get('username') or row.get('student_id') for row in rows]
+        ).values_list('username', flat=True))
+
+        with transaction.atomic():
+            # Locked until the chunk is written, so the free beds counted here are still free then
+            rooms = {room.room_number: room for room in Room.objects.select_for_update().filter(
+                room_number__in=[row['room_number'] for row in rows if row.get('room_number')])}
+            beds_taken = Counter()  # room id -> beds taken by this chunk
+            stays = defaultdict(list)  # room id -> [(start, end)] of the stays the new ones have to fit around
+            held = BedOccupancy.objects.filter(room__in=rooms.values(), start__lt=check_out, end__gt=check_in)
+            for room_id, start, end in held.values_list('room_id', 'start', 'end'):
+                stays[room_id].append((start, end))
+
+            users, students = [], []
+            for line, row in chunk:
+                if row is None:
+                    result.error(line, 'Not valid JSON.')
+                    continue
+                student_id, phone = row.get('student_id', ''), row.get('phone') or None
+                username = row.get('username') or student_id
+                room = rooms.get(row.get('room_number'))
+                too_long = [field for field, value in (('name', row.get('name')), ('email', row.get('email')),
+                                                      ('phone', phone), ('username', username))
+                            if value and len(value) > max_lengths[field]]
+                if not student_id or len(student_id) > 10:
+                    result.error(line, 'student_id is required and at most 10 characters.')
+                elif not row.get('name') or not row.get('email'):
+                    result.error(line, 'name and email are required.')
+                elif too_long:
+                    result.error(line, '; '.join(f'{field} is at most {max_lengths[field]} characters'
+                                                 for field in too_long) + '.')
+                elif student_id in existing_ids or student_id in seen_ids:
+                    result.error(line, f'Student {student_id} already exists.')
+                elif phone and (phone in existing_phones or phone in seen_phones):
+                    result.error(line, f'Phone {phone} is already in use.')
+                elif username in existing_usernames or username in seen_usernames:
+                    result.error(line, f'Username {username} is already taken.')
+                elif row.get('room_number') and room is None:
+                    result.error(line, f"Room {row['room_number']} does not exist.")
+                elif room and (beds_taken[room.pk] >= room.beds_available or BedOccupancy.most_taken(
+                        stays[room.pk] + [(check_in, check_out)]) > room.capacity):
+                    result.error(line, f'Room {room.room_number} has no free bed left.')
+                else:
+                    seen_ids.add(student_id)
+                    seen_usernames.add(username)
+                    if phone:
+                        seen_phones.add(phone)
+                    if room:
+                        beds_taken[room.pk] += 1
+                        stays[room.pk].append((check_in, check_out))
+                    users.append(CustomUser(username=username, email=row['email'], user_type='student',
+                                            password=make_password(None)))
+                    # bulk_create skips Student.save, so work out rent due here
+                    students.append(Student(name=row['name'], email=row['email'], student_id=student_id,
+                                            phone=phone, room=room, rent_due=room.rent_price if room else 0,
+                                            room_rent=room.rent_price if room else 0))
+
+            if not Room.take_beds(beds_taken):  # Not while the rooms are locked, but never oversell a room
+                transaction.set_rollback(True)
+                result.error(chunk[0][0], 'Free beds changed during the import; the rows from here were skipped.')
+                beds_taken.clear()
+                continue
+            CustomUser.objects.bulk_create(users)
+            # Not every backend returns primary keys from bulk_create, so look them up in one query
+            user_ids = dict(CustomUser.objects.filter(
+                username__in=[user.username for user in users]).values_list('username', 'pk'))
+            for user, student in zip(users, students):
+                student.user_id = user_ids[user.username]
+            result.created += len(Student.objects.bulk_create(students))
+            student_pks = dict(Student.objects.filter(
+                student_id__in=[student.student_id for student in students]).values_list('student_id', 'pk'))
+            # Open each new student's ledger with the rent set above, so the balances match rent_due
+            RentLedgerEntry.journal([entry for student in students if student.rent_due
+                                     for entry in RentLedgerEntry.opening(student_pks[student.student_id],
+                                                                          student.rent_due, 0)])
+            # Book the beds they were given, with the stays the nightly recount goes by
+            housed = [student for student in students if student.room]
+            bookings = RoomBooking.objects.bulk_create([
+                RoomBooking(student_id=student_pks[student.student_id], room=student.room, status='assigned',
+                            room_type=student.room.room_type, check_in_date=check_in, duration_of_stay=IMPORTED_STAY)
+                for student in housed
+            ])
+            booking_ids = dict(RoomBooking.objects.filter(
+                student_id__in=[booking.student_id for booking in bookings]).values_list('student_id', 'pk'))
+            for booking in bookings:
+                booking.pk = booking_ids[booking.student_id]
+            BedOccupancy.record([(booking, student.room) for booking, student in zip(bookings, housed)])
+        if beds_taken:
+            room_beds_changed.send(sender=Room, room_ids=list(beds_taken))
+    return result
+
+
+IMPORTERS = {'rooms': import_rooms, 'students': import_students}
+
+
+@task(max_attempts=1, atomic=False)  # The importers commit chunk by chunk
+def import_upload(kind, name, fmt='csv'):
+    """
+    Import an uploaded file that was saved to default_storage, then delete it. The
+    counts and the first errors are kept as the task's result.
+    """
+    try:
+        with default_storage.open(name, 'rb') as upload:
+            result = IMPORTERS[kind](text_stream(upload), fmt)
+    finally:
+        default_storage.delete(name)
+    return {
+        'created': result.created,
+        'skipped': len(result.errors),
+        'errors': [f'Line {line}: {error}' for line, error in result.errors[:100]],
+    }
+
+
+class _Echo:
+    """File-like object whose write() just returns the line, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+def _export(queryset, fields, fmt, chunk_size):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {', '.join(FORMATS)}.")
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    names = [field.split('__')[-1] for field in fields]  # room__room_number -> room_number
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(names)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(names, row)), default=str) + '\n'
+
+
+def export_rooms(fmt='csv', chunk_size=2000):
+    """Yield encoded lines for every room."""
+    return _export(Room.objects.order_by('pk'), ROOM_FIELDS, fmt, chunk_size)
+
+
+def export_students(fmt='csv', chunk_size=2000):
+    """Yield encoded lines for every student, with the room number rather than the room id."""
+    fields = ['student_id', 'name', 'email', 'phone', 'user__username', 'room__room_number']
+    return _export(Student.objects.order_by('pk'), fields, fmt, chunk_size)
+
+
+def text_stream(uploaded_file, encoding='utf-8-sig'):
+    """Wrap an uploaded or stored (binary) file so it can be read line by line as text."""
+    return io.TextIOWrapper(uploaded_file.file, encoding=encoding, newline='')
@@ -0,0 +1,66 @@
+"""
+System checks for settings that the rest of the app relies on.
+
+Data versions (hostel.versions), cached users (hostel.identity), sessions and rate
+limits live in the default cache, and every process that changes or reads them has
+to see the same cache: the web workers, the `run_tasks` worker and management
+commands such as import_data or recalculate_rent. A process-local cache gives each
+its own copy, so a change made in one never reaches the others and, for instance,
+the API keeps answering 304 with data that changed long ago.
+
+Live events (hostel.live) are published by whichever process makes the change, so
+their backend has to reach the streams of every other process too.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = {'django.core.cache.backends.locmem.LocMemCache'}
+
+
+def cache_is_shared(alias='default'):
+    """False if the cache alias is private to each process."""
+    return settings.CACHES.get(alias, {}).get('BACKEND') not in PROCESS_LOCAL_CACHES
+
+
+def _unshared(level, id):
+    return [level(
+        "The default cache is local to each process, so data versions and cached users "
+        "changed by one process (run_tasks, management commands, another worker) are never "
+        "seen by the others.",
+        hint="Set HOSTEL_CACHE_URL to a Redis server, or point CACHES['default'] at another "
+             "cache that every process shares.",
+        id=id,
+    )]
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    # Fine for one process (tests, a quick look with TASKS_EAGER); `check --deploy` refuses it
+    return [] if cache_is_shared() else _unshared(Warning, 'hostel.W001')
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache_deploy(app_configs, **kwargs):
+    return [] if cache_is_shared() else _unshared(Error, 'hostel.E001')
+
+
+def live_events_problem():
+    """Why settings.LIVE_EVENTS_BACKEND would lose events published by other processes, or None."""
+    backend = getattr(settings, 'LIVE_EVENTS_BACKEND', 'hostel.live.DatabaseBackend')
+    if backend == 'hostel.live.LocalBackend' and not getattr(settings, 'TASKS_EAGER', False):
+        return ("LIVE_EVENTS_BACKEND is LocalBackend but tasks run in `run_tasks`, so the events "
+                "they publish never reach a stream.")
+    if backend == 'hostel.live.CacheBackend' and not cache_is_shared():
+        return ("LIVE_EVENTS_BACKEND is CacheBackend but the default cache is local to each "
+                "process, so events only reach streams in the process that published them.")
+    return None
+
+
+@register()
+def check_live_events_backend(app_configs, **kwargs):
+    problem = live_events_problem()
+    return [] if problem is None else [Error(
+        problem,
+        hint="Use 'hostel.live.DatabaseBackend', or CacheBackend with a cache every process shares.",
+        id='hostel.E002',
+    )]
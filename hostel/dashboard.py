@@ -0,0 +1,165 @@
+"""
+Precomputed figures for the admin dashboard.
+
+Today's DashboardSnapshot and OccupancySnapshot rows are kept current as data
+changes, after each writing transaction commits:
+
+* room saves, deletes and bed assignments recount only the room types involved;
+* new and changed bookings recount pending bookings with one index range count;
+* ledger entries add their amount to the rent totals with an UPDATE, no recount. The
+  ledger has a charge for every change to what students owe (see RentLedgerEntry),
+  so the totals charged and paid are the rent expected and collected.
+
+A refresh runs after the write has committed, so one that fails is logged (by
+on_commit's robust mode) rather than turning the saved write into an error page.
+
+The first write or dashboard view of a day, and the nightly `rebuild_dashboard`
+command, recount everything into that day's row, which also corrects any drift
+from writes that bypassed these hooks. Rows of earlier days are left as they were
+and make up the history.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import DashboardSnapshot, OccupancySnapshot, RentBalance, RentLedgerEntry, Room, RoomBooking
+from .signals import ledger_journaled, room_beds_changed
+
+
+def _occupancy_rows(day, room_types=None):
+    """Count rooms and beds per room type; every requested type gets a row, even with no rooms."""
+    rooms = Room.objects.all()
+    if room_types is not None:
+        rooms = rooms.filter(room_type__in=room_types)
+    counts = {
+        row['room_type']: row for row in
+        rooms.values('room_type').annotate(rooms=Count('id'), beds_total=Sum('capacity'),
+                                           beds_free=Sum('beds_available')).order_by()
+    }
+    return [
+        OccupancySnapshot(day=day, room_type=room_type, rooms=counts.get(room_type, {}).get('rooms', 0),
+                          beds_total=counts.get(room_type, {}).get('beds_total') or 0,
+                          beds_free=counts.get(room_type, {}).get('beds_free') or 0)
+        for room_type in (room_types if room_types is not None else Room.ROOM_TYPE_SIZES)
+    ]
+
+
+def _save_occupancy(day, rows):
+    OccupancySnapshot.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['day', 'room_type'],
+        update_fields=['rooms', 'beds_total', 'beds_free'],
+    )
+    totals = OccupancySnapshot.objects.filter(day=day).aggregate(
+        rooms=Sum('rooms'), beds_total=Sum('beds_total'), beds_free=Sum('beds_free'))
+    DashboardSnapshot.objects.filter(day=day).update(
+        rooms=totals['rooms'] or 0, beds_total=totals['beds_total'] or 0, beds_free=totals['beds_free'] or 0,
+        updated_at=timezone.now(),
+    )
+
+
+def rebuild(day=None):
+    """Recount every figure for day (today by default) and return its DashboardSnapshot."""
+    day = day or timezone.localdate()
+    rent = RentBalance.objects.aggregate(expected=Sum('total_charged'), collected=Sum('total_paid'))
+    with transaction.atomic():
+        snapshot, _ = DashboardSnapshot.objects.select_for_update().get_or_create(day=day)
+        snapshot.pending_bookings = RoomBooking.objects.filter(status='pending').count()
+        snapshot.rent_expected = rent['expected'] or 0
+        snapshot.rent_collected = rent['collected'] or 0
+        snapshot.rebuilt_at = timezone.now()
+        snapshot.save()
+        _save_occupancy(day, _occupancy_rows(day))
+    snapshot.refresh_from_db()
+    return snapshot
+
+
+def current_snapshot():
+    """Today's snapshot, rebuilt first if today has none yet. Returns (snapshot, rebuilt)."""
+    snapshot = DashboardSnapshot.objects.filter(day=timezone.localdate()).first()
+    if snapshot is not None:
+        return snapshot, False
+    try:
+        return rebuild(), True
+    except IntegrityError:  # Another process created today's row first
+        return DashboardSnapshot.objects.get(day=timezone.localdate()), False
+
+
+def refresh_room_types(room_types):
+    """Recount the occupancy of the given room types in today's snapshot."""
+    snapshot, rebuilt = current_snapshot()
+    if not rebuilt and room_types:
+        _save_occupancy(snapshot.day, _occupancy_rows(snapshot.day, sorted(room_types)))
+
+
+def refresh_pending_bookings():
+    snapshot, rebuilt = current_snapshot()
+    if not rebuilt:
+        DashboardSnapshot.objects.filter(pk=snapshot.pk).update(
+            pending_bookings=RoomBooking.objects.filter(status='pending').count(), updated_at=timezone.now())
+
+
+def add_rent(charged, paid):
+    """Apply the amounts of committed ledger entries to today's rent totals."""
+    snapshot, rebuilt = current_snapshot()
+    if rebuilt or not (charged or paid):
+        return  # The recount already included them
+    DashboardSnapshot.objects.filter(pk=snapshot.pk).update(
+        rent_expected=F('rent_expected') + charged, rent_collected=F('rent_collected') + paid,
+        updated_at=timezone.now())
+
+
+def history(days=30):
+    """The latest snapshots, oldest first, for the trend charts."""
+    return list(reversed(DashboardSnapshot.objects.order_by('-day')[:days]))
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, **kwargs):
+    # A room that changed type leaves a stale count on its old type until the nightly rebuild
+    room_types = {instance.room_type}
+    transaction.on_commit(lambda: refresh_room_types(room_types), robust=True)
+
+
+@receiver(post_delete, sender=Room)
+def room_deleted(sender, instance, **kwargs):
+    room_types = {instance.room_type}
+    transaction.on_commit(lambda: refresh_room_types(room_types), robust=True)
+
+
+@receiver(room_beds_changed)
+def beds_changed(sender, room_ids, **kwargs):
+    # Beds are taken when bookings are assigned, so pending bookings change with them
+    room_types = set(Room.objects.filter(pk__in=room_ids).values_list('room_type', flat=True).distinct())
+
+    def refresh():
+        refresh_room_types(room_types)
+        refresh_pending_bookings()
+
+    transaction.on_commit(refresh, robust=True)
+
+
+@receiver(post_save, sender=RoomBooking)
+@receiver(post_delete, sender=RoomBooking)
+def booking_changed(sender, **kwargs):
+    transaction.on_commit(refresh_pending_bookings, robust=True)
+
+
+def _on_ledger_commit(entries):
+    charged = sum((entry.amount for entry in entries if entry.entry_type == 'charge'), Decimal(0))
+    paid = sum((entry.amount for entry in entries if entry.entry_type == 'payment'), Decimal(0))
+    transaction.on_commit(lambda: add_rent(charged, paid), robust=True)
+
+
+@receiver(post_save, sender=RentLedgerEntry)
+def ledger_entry_added(sender, instance, created, **kwargs):
+    if created:
+        _on_ledger_commit([instance])
+
+
+@receiver(ledger_journaled)
+def ledger_entries_journaled(sender, entries, **kwargs):
+    _on_ledger_commit(entries)
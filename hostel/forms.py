@@ -1,6 +1,6 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
-from .models import CustomUser, ContactInquiry, RoomBooking
+from .models import CustomUser, ContactInquiry, RoomBooking, RentLedgerEntry
 from django.contrib.auth import get_user_model
 from .models import Room, Student, Feedback
 
@@ -42,13 +42,24 @@ class RoomForm(forms.ModelForm):
 class StudentForm(forms.ModelForm):
     class Meta:
         model = Student
-        fields = ['student_id', 'name', 'email', 'room', 'rent_paid', 'rent_due']
+        fields = ['student_id', 'name', 'email', 'room']  # Rent is recorded through the ledger
 
-
-class RentForm(forms.ModelForm):
+class StudentEditForm(forms.ModelForm):
     class Meta:
         model = Student
-        fields = ['rent_paid', 'rent_due']
+        fields = ['student_id', 'name', 'email', 'phone']  # Rooms change through bookings, which move the beds
+
+
+class RentEntryForm(forms.ModelForm):
+    class Meta:
+        model = RentLedgerEntry
+        fields = ['entry_type', 'amount', 'note']
+
+    def clean_amount(self):
+        amount = self.cleaned_data['amount']
+        if amount <= 0:
+            raise forms.ValidationError("Amount must be greater than zero.")
+        return amount
 
 class FeedbackManagementForm(forms.ModelForm):
     class Meta:
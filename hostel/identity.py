@@ -0,0 +1,137 @@
+"""
+Cached resolution of the logged-in user together with their Student profile and room.
+
+CachedUserMiddleware replaces request.user (and request.auser) with a lookup that
+reads the user, with student and student.room already attached, from the cache;
+a miss loads all three with one query. The usual session checks still run against
+the cached user, so a password change still logs other sessions out. Entries are
+dropped after commit whenever the user, their Student row or their room changes,
+saved or updated through a queryset; updates that touch every student move all keys
+to a new generation instead. Entries and generations live in the cache every process
+shares (hostel.checks), so a deactivation or password change made by any process is
+seen by the next request. settings.USER_CACHE_TIMEOUT only bounds staleness for raw
+SQL writes, which bypass the hooks.
+"""
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .models import CustomUser, Room, Student
+from .signals import room_beds_changed, student_changed, users_changed
+from .versions import bump_version, get_version
+
+USER_KEY = 'hostel:user:%s:%s'  # Version of the 'students' data set, user id
+_MISSING = object()
+
+
+def _key(user_id):
+    return USER_KEY % (get_version('students'), user_id)
+
+
+def load_user(user_id):
+    """Return the user with student and room attached, from the cache if possible; None if there is no such user."""
+    key = _key(user_id)
+    user = cache.get(key, _MISSING)
+    if user is _MISSING:
+        user = CustomUser.objects.select_related('student__room').filter(pk=user_id).first()
+        cache.set(key, user, getattr(settings, 'USER_CACHE_TIMEOUT', 300))
+    return user
+
+
+def _resolve(request):
+    """Same outcome as django.contrib.auth.get_user(), minus the queries when the cache has the user."""
+    session = request.session
+    try:
+        user_id = CustomUser._meta.pk.to_python(session[auth.SESSION_KEY])
+        backend = session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend != 'django.contrib.auth.backends.ModelBackend' or backend not in settings.AUTHENTICATION_BACKENDS:
+        return auth.get_user(request)  # Other backends load users their own way
+
+    user = load_user(user_id)
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+    if user is None or not user.is_active or not (
+            session_hash and constant_time_compare(session_hash, user.get_session_auth_hash())):
+        # Let Django handle deleted users, key fallbacks and flushing stale sessions
+        return auth.get_user(request)
+    user.backend = backend
+    return user
+
+
+def get_user(request):
+    if not hasattr(request, '_hostel_user'):
+        request._hostel_user = _resolve(request)
+    return request._hostel_user
+
+
+async def aget_user(request):
+    if not hasattr(request, '_hostel_user'):
+        request._hostel_user = await sync_to_async(_resolve)(request)
+    return request._hostel_user
+
+
+class CachedUserMiddleware:
+    """Put after AuthenticationMiddleware: resolves request.user through the cache."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.user = SimpleLazyObject(partial(get_user, request))
+        request.auser = partial(aget_user, request)
+        return self.get_response(request)  # A coroutine when the chain is async
+
+
+def forget_users(user_ids):
+    """Drop cached users once the current transaction commits."""
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    if user_ids:
+        transaction.on_commit(lambda: cache.delete_many([_key(user_id) for user_id in user_ids]))
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_changed_user(sender, instance, **kwargs):
+    forget_users([instance.pk])
+
+
+@receiver(users_changed)
+def forget_updated_users(sender, user_ids, **kwargs):
+    forget_users(user_ids)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def forget_changed_student(sender, instance, **kwargs):
+    forget_users([instance.user_id])
+
+
+@receiver(student_changed)
+def forget_updated_students(sender, student_ids, **kwargs):
+    if student_ids is None:
+        bump_version('students')  # Every student may have changed; start a new generation of keys
+        return
+    forget_users(Student.objects.filter(pk__in=student_ids).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=Room)
+@receiver(pre_delete, sender=Room)  # Before the delete detaches the occupants
+@receiver(room_beds_changed)
+def forget_room_occupants(sender, instance=None, room_ids=None, **kwargs):
+    room_ids = room_ids if room_ids is not None else [instance.pk]
+    forget_users(Student.objects.filter(room_id__in=room_ids).values_list('user_id', flat=True))
@@ -0,0 +1,32 @@
+"""
+Student inbox support: keeps InboxCounter right when messages are deleted and
+exposes the unread count to templates for the navbar badge.
+"""
+from functools import cache
+
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import InboxCounter, Message
+
+
+@receiver(post_delete, sender=Message)
+def uncount_deleted_message(sender, instance, **kwargs):
+    if not instance.is_read:
+        # Plain UPDATE: the counter row may already be gone if the student is being deleted
+        InboxCounter.objects.filter(student_id=instance.student_id).update(unread=F('unread') - 1)
+
+
+def unread_messages(request):
+    """Context processor: `unread_messages` is the logged-in student's unread count, looked up on first use."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+
+    @cache
+    def count():
+        return (InboxCounter.objects.filter(student__user_id=user.pk)
+                .values_list('unread', flat=True).first() or 0)
+
+    return {'unread_messages': count}
@@ -0,0 +1,391 @@
+"""
+Live room availability and booking updates, pushed to browsers with Server-Sent Events.
+
+The live_events view keeps a text/event-stream open and sends a snapshot first, then:
+
+    availability  free beds of the room types whose rooms changed ('rooms' channel)
+    booking       a booking of the logged-in student that changed ('student:<id>' channel)
+
+Writes publish events once their transaction commits. The Hub hands them to the
+streams open in this process, each a coroutine waiting on its own queue, so a worker
+can hold thousands of idle streams. The backend named by settings.LIVE_EVENTS_BACKEND
+carries events from the process that published them to the hubs. Events are published
+wherever the write happens: in a web worker, but also in `run_tasks` and management
+commands, which never have streams of their own. DatabaseBackend (the default) stores
+them in a table that every process with open streams polls; CacheBackend appends them
+to a log in a cache shared by every process (Redis, Memcached), which is lighter on the
+database. LocalBackend only reaches streams in the publishing process, so it is for a
+single ASGI process that also runs its tasks inline (TASKS_EAGER); hostel.checks
+reports the combinations that would lose events. A stream that may have missed events
+(a slow reader, an evicted log entry) gets a fresh snapshot instead.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import Case, Q, Sum, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .availability import get_availability_snapshot
+from .models import LiveEvent, Room, RoomBooking
+from .signals import bookings_changed, room_beds_changed
+
+RESYNC = ('resync', None)
+SNAPSHOT_BOOKINGS = 10
+RETRY_MILLISECONDS = 5000  # How long EventSource waits before reconnecting
+
+
+class Subscription:
+    """The queue of events for one open stream."""
+
+    def __init__(self, hub, channels, size):
+        self.hub = hub
+        self.channels = frozenset(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=size)
+
+    def put(self, event):
+        """Queue an event; runs on the stream's event loop."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client reads too slowly: drop what it hasn't read and send it a snapshot instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self, timeout):
+        """The next (name, data) event, or None if there was none for timeout seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class Hub:
+    """In-process publish/subscribe between whoever publishes and the streams open in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # Events are delivered from request and worker threads
+        self._subscriptions = defaultdict(set)  # channel -> {Subscription}
+
+    def subscribe(self, channels, size=100):
+        """Start queueing the events of channels for a stream on the running event loop."""
+        subscription = Subscription(self, channels, size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].discard(subscription)
+                if not self._subscriptions[channel]:
+                    del self._subscriptions[channel]
+
+    def has_subscribers(self):
+        return bool(self._subscriptions)
+
+    def deliver(self, channel, event):
+        """Queue event for every stream subscribed to channel. Safe to call from any thread."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:  # Its event loop has closed
+                self.unsubscribe(subscription)
+
+    def resync(self):
+        """Send every stream a fresh snapshot, after events may have been lost."""
+        with self._lock:
+            channels = list(self._subscriptions)
+        for channel in channels:
+            self.deliver(channel, RESYNC)
+
+
+class LocalBackend:
+    """
+    Delivers events to this process's hub only. Events published by any other process
+    (the `run_tasks` worker, management commands, other web workers) never reach a
+    stream, so it only suits one ASGI process with TASKS_EAGER on.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def active(self):
+        return self.hub.has_subscribers()  # Nobody listening in this process: don't build events
+
+    def publish(self, channel, event):
+        self.hub.deliver(channel, event)
+
+    def start(self):
+        pass
+
+
+class CacheBackend:
+    """
+    Appends events to a numbered log in the cache, which a task in every process with
+    open streams polls and hands to its hub. Needs a cache shared by all the workers.
+    """
+    SEQUENCE_KEY = 'hostel:live:sequence'
+    EVENT_KEY = 'hostel:live:event:%d'
+    MAX_BATCH = 500  # Further behind than this, streams start over from a snapshot
+
+    def __init__(self, hub):
+        self.hub = hub
+        self._poller = None
+
+    def active(self):
+        return True  # Streams may be open in any process
+
+    def publish(self, channel, event):
+        cache.add(self.SEQUENCE_KEY, 0, None)
+        try:
+            number = cache.incr(self.SEQUENCE_KEY)
+        except ValueError:  # Evicted between add and incr; pollers notice the counter going back
+            cache.add(self.SEQUENCE_KEY, 1, None)
+            number = 1
+        cache.set(self.EVENT_KEY % number, (channel, event), getattr(settings, 'LIVE_EVENTS_TTL', 60))
+
+    def start(self):
+        """Make sure this process is polling the log; call from the event loop."""
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+
+    async def _poll(self):
+        interval = getattr(settings, 'LIVE_EVENTS_POLL_INTERVAL', 0.5)
+        last = await cache.aget(self.SEQUENCE_KEY) or 0
+        stalled = 0
+        while self.hub.has_subscribers():  # Stops with the last stream; start() restarts it
+            await asyncio.sleep(interval)
+            sequence = await cache.aget(self.SEQUENCE_KEY) or 0
+            if sequence < last or sequence - last > self.MAX_BATCH:  # Counter lost, or too far behind
+                last = sequence
+                self.hub.resync()
+                continue
+            numbers = range(last + 1, sequence + 1)
+            found = await cache.aget_many([self.EVENT_KEY % number for number in numbers])
+            for number in numbers:
+                entry = found.get(self.EVENT_KEY % number)
+                if entry is None:
+                    stalled += 1
+                    if stalled < 3:
+                        break  # Numbered but not stored yet; look again on the next poll
+                    self.hub.resync()  # Expired or evicted
+                else:
+                    self.hub.deliver(*entry)
+                stalled = 0
+                last = number
+
+
+class DatabaseBackend:
+    """
+    Stores events in the LiveEvent table, which a task in every process with open streams
+    polls and hands to its hub; works wherever every process shares the database.
+    A poll reads the rows of the last LIVE_EVENTS_GRACE seconds and skips those it has
+    delivered, so an insert that commits after a later one is still picked up; the
+    clocks of the publishing hosts have to agree within that. Rows are deleted once
+    they are LIVE_EVENTS_TTL seconds old.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+        self._poller = None
+
+    def active(self):
+        return True  # Streams may be open in any process
+
+    def publish(self, channel, event):
+        name, data = event
+        LiveEvent.objects.create(channel=channel, name=name, data=data)
+
+    def start(self):
+        """Make sure this process is polling the table; call from the event loop."""
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+
+    @staticmethod
+    def _fetch(since, seen):
+        rows = LiveEvent.objects.filter(created_at__gte=since).exclude(pk__in=list(seen)).order_by('created_at', 'pk')
+        return list(rows.values_list('pk', 'created_at', 'channel', 'name', 'data'))
+
+    @staticmethod
+    def _delete_expired(before):
+        LiveEvent.objects.filter(created_at__lt=before).delete()
+
+    async def _poll(self):
+        interval = getattr(settings, 'LIVE_EVENTS_POLL_INTERVAL', 0.5)
+        grace = timedelta(seconds=getattr(settings, 'LIVE_EVENTS_GRACE', 5))
+        ttl = getattr(settings, 'LIVE_EVENTS_TTL', 60)
+        started = timezone.now()  # Streams start from a snapshot, so older events are not wanted
+        seen = {}  # pk -> created_at of the rows delivered within the grace period
+        expired_at = 0
+        while self.hub.has_subscribers():  # Stops with the last stream; start() restarts it
+            await asyncio.sleep(interval)
+            now = timezone.now()
+            since = max(started, now - grace)
+            seen = {pk: created_at for pk, created_at in seen.items() if created_at >= since}
+            for pk, created_at, channel, name, data in await _in_pool(self._fetch)(since, seen):
+                seen[pk] = created_at
+                self.hub.deliver(channel, (name, data))
+            if time.monotonic() - expired_at > ttl:
+                expired_at = time.monotonic()
+                await _in_pool(self._delete_expired)(now - timedelta(seconds=ttl))
+
+
+hub = Hub()
+_backend = None
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(getattr(settings, 'LIVE_EVENTS_BACKEND', 'hostel.live.DatabaseBackend'))(hub)
+    return _backend
+
+
+def publish(channel, name, data):
+    """Send an event to the streams subscribed to channel, in whichever process they are."""
+    backend().publish(channel, (name, data))
+
+
+def _free_beds(room_ids=(), room_types=()):
+    """{room_type: free beds} for room_types and the types of the rooms in room_ids."""
+    changed = Q(room_type__in=list(room_types)) | Q(
+        room_type__in=Room.objects.filter(pk__in=list(room_ids)).values('room_type'))
+    free = Sum(Case(When(is_available=True, beds_available__gt=0, then='beds_available'), default=Value(0)))
+    counts = Room.objects.filter(changed).values('room_type').annotate(free=free).order_by()
+    return {room_type: 0 for room_type in room_types} | dict(counts.values_list('room_type', 'free'))
+
+
+def publish_availability(room_ids=(), room_types=()):
+    if backend().active():
+        publish('rooms', 'availability', {'free_beds_by_type': _free_beds(room_ids, room_types)})
+
+
+def _booking_data(booking):
+    return {
+        'id': booking.pk,
+        'status': booking.status,
+        'room_type': booking.room_type,
+        'room': booking.room.room_number if booking.room else None,
+        'check_in': booking.check_in_date,
+    }
+
+
+def publish_bookings(booking_ids):
+    if backend().active():
+        for booking in RoomBooking.objects.filter(pk__in=booking_ids).select_related('room'):
+            publish(f'student:{booking.student_id}', 'booking', _booking_data(booking))
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def room_changed(sender, instance, **kwargs):
+    room_type = instance.room_type
+    transaction.on_commit(lambda: publish_availability(room_types=[room_type]), robust=True)
+
+
+@receiver(room_beds_changed)
+def beds_changed(sender, room_ids, **kwargs):
+    transaction.on_commit(lambda: publish_availability(room_ids=room_ids), robust=True)
+
+
+@receiver(post_save, sender=RoomBooking)
+def booking_saved(sender, instance, **kwargs):
+    booking_id = instance.pk
+    transaction.on_commit(lambda: publish_bookings([booking_id]), robust=True)
+
+
+@receiver(bookings_changed)
+def bookings_updated(sender, booking_ids, **kwargs):
+    transaction.on_commit(lambda: publish_bookings(booking_ids), robust=True)
+
+
+@receiver(post_delete, sender=RoomBooking)
+def booking_deleted(sender, instance, **kwargs):
+    channel, data = f'student:{instance.student_id}', {'id': instance.pk, 'status': 'deleted'}
+    transaction.on_commit(lambda: backend().active() and publish(channel, 'booking', data), robust=True)
+
+
+def _event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))}\n\n'
+
+
+def _snapshot(student):
+    data = {'free_beds_by_type': get_availability_snapshot()['free_beds_by_type']}
+    if student:
+        bookings = (RoomBooking.objects.filter(student=student).select_related('room')
+                    .order_by('-booking_date')[:SNAPSHOT_BOOKINGS])
+        data['bookings'] = [_booking_data(booking) for booking in bookings]
+    return data
+
+
+def _in_pool(func):
+    """
+    Run func(*args) in the shared thread pool and close its connections afterwards. The
+    request's own thread would otherwise stay alive, with its connection, for as long
+    as the stream is open.
+    """
+    def call(*args):
+        try:
+            return func(*args)
+        finally:
+            connections.close_all()
+    return sync_to_async(call, thread_sensitive=False)
+
+
+def _student(request):
+    return getattr(request.user, 'student', None)  # None for visitors and staff
+
+
+async def _stream(request):
+    student = await _in_pool(_student)(request)
+    channels = ['rooms'] + ([f'student:{student.pk}'] if student else [])
+    subscription = hub.subscribe(channels, getattr(settings, 'LIVE_EVENTS_QUEUE_SIZE', 100))
+    backend().start()
+    heartbeat = getattr(settings, 'LIVE_EVENTS_HEARTBEAT', 15)
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        yield _event('snapshot', await _in_pool(_snapshot)(student))  # Subscribed first, so nothing in between is lost
+        while True:
+            event = await subscription.get(heartbeat)
+            if event is None:
+                yield ': keep-alive\n\n'  # A comment; also how a closed connection gets noticed
+            elif event == RESYNC:
+                yield _event('snapshot', await _in_pool(_snapshot)(student))
+            else:
+                yield _event(*event)
+    finally:
+        subscription.close()
+
+
+async def live_events(request):
+    """Server-Sent Events stream of room availability and the logged-in student's bookings."""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI a stream would hold a worker thread for as long as it is open.
+        # 204 tells EventSource to stop reconnecting; pages keep their rendered numbers.
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(_stream(request), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
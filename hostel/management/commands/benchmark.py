@@ -0,0 +1,96 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from hostel.benchmarks import compare, explain_hot_queries, run_benchmarks, slow_client_throughput
+
+
+class Command(BaseCommand):
+    help = 'Seeds a throwaway test database with synthetic data and times the hot code paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1000, help='Number of students to seed (rooms = scale / 2)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark')
+        parser.add_argument('--ops', type=int, default=100,
+                            help='Records touched per run by the per-record benchmarks')
+        parser.add_argument('--only', nargs='*', help='Run only these benchmarks')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Baseline JSON report to check for regressions')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed slowdown against the baseline median (0.2 = 20%%)')
+        parser.add_argument('--explain', action='store_true',
+                            help='Instead of the suite, EXPLAIN and time the hot queries without and with their indexes')
+        parser.add_argument('--slow-clients', type=int, metavar='CLIENTS',
+                            help='Instead of the suite, compare WSGI and ASGI throughput with this many concurrent '
+                                 'slow clients')
+        parser.add_argument('--client-delay', type=float, default=0.05,
+                            help='Seconds each slow client takes to read a response')
+        parser.add_argument('--threads', type=int, default=4, help='Threads of the WSGI worker in --slow-clients')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        # Benchmarks run against a fresh test database, never the real one
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            if options['explain']:
+                report = explain_hot_queries(options['scale'], options['repeat'])
+            elif options['slow_clients']:
+                report = slow_client_throughput(options['scale'], options['slow_clients'], options['ops'] * 3,
+                                                options['client_delay'], options['threads'])
+            else:
+                report = run_benchmarks(options['scale'], options['repeat'], options['ops'], options['only'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['explain']:
+            for name, result in report['results'].items():
+                before, after = result['before'], result['after']
+                self.stdout.write(
+                    f"{name:<20} before={before['median'] * 1000:8.2f}ms{' (full scan)' if before['full_scan'] else ''}"
+                    f"  after={after['median'] * 1000:8.2f}ms{' (full scan)' if after['full_scan'] else ''}"
+                )
+                self.stdout.write(f"    plan: {after['plan']}".replace('\n', '\n          '))
+            if options['output']:
+                with open(options['output'], 'w') as f:
+                    json.dump(report, f, indent=2)
+                self.stdout.write(f'Report written to {options["output"]}')
+            return
+
+        if options['slow_clients']:
+            for name, result in report['results'].items():
+                self.stdout.write(f"{name:<6} {result['requests_per_second']:8.1f} req/s "
+                                  f"({report['meta']['requests']} requests in {result['seconds']:.2f}s)")
+            if options['output']:
+                with open(options['output'], 'w') as f:
+                    json.dump(report, f, indent=2)
+                self.stdout.write(f'Report written to {options["output"]}')
+            return
+
+        for name, result in report['results'].items():
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(f'{name:<24} {result["error"]}'))
+            else:
+                self.stdout.write(f'{name:<24} median={result["median"] * 1000:9.2f}ms '
+                                  f'min={result["min"] * 1000:9.2f}ms queries={result["queries"]}')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+        if baseline is not None:
+            regressions = compare(report, baseline, options['threshold'])
+            for name, before, after, ratio in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f'REGRESSION {name}: {before * 1000:.2f}ms -> {after * 1000:.2f}ms ({ratio:.2f}x)'
+                ))
+            if regressions:
+                raise CommandError(f'{len(regressions)} benchmark(s) regressed against {options["compare"]}.')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+from hostel.models import Room
+
+
+class Command(BaseCommand):
+    help = ("Recounts every room's free beds from the stays covering today; run nightly so stays "
+            "that begin or end take and free their beds")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        changed = Room.count_free_beds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted free beds: {len(changed)} room(s) changed in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from hostel.bulkio import FORMATS, export_rooms, export_students
+
+EXPORTERS = {
+    'rooms': export_rooms,
+    'students': export_students,
+}
+
+
+class Command(BaseCommand):
+    help = 'Streams every room or student out as CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTERS))
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', help='File to write (default: standard output)')
+
+    def handle(self, *args, **options):
+        lines = EXPORTERS[options['kind']](options['format'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as out:
+                out.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
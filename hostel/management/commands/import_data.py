@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from hostel.bulkio import FORMATS, IMPORTERS
+
+
+class Command(BaseCommand):
+    help = 'Imports rooms or students from a CSV or JSON Lines file in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--format', choices=FORMATS, help='File format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows validated and inserted per chunk')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('jsonl' if options['path'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        started = time.perf_counter()
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                result = IMPORTERS[options['kind']](stream, fmt, options['batch_size'])
+        except OSError as exc:
+            raise CommandError(exc)
+
+        for line, message in result.errors:
+            self.stderr.write(f'line {line}: {message}')
+        style = self.style.SUCCESS if not result.errors else self.style.WARNING
+        self.stdout.write(style(
+            f"Imported {result.created} {options['kind']}, skipped {len(result.errors)} "
+            f"in {time.perf_counter() - started:.2f}s."
+        ))
@@ -0,0 +1,30 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from hostel.dashboard import rebuild
+from hostel.models import DashboardSnapshot, OccupancySnapshot
+
+
+class Command(BaseCommand):
+    help = "Recounts today's dashboard snapshot from scratch and prunes old history; run nightly"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=730,
+                            help='Days of snapshot history to keep (default: 730)')
+
+    def handle(self, *args, **options):
+        if options['keep_days'] < 1:
+            raise CommandError('--keep-days must be at least 1.')
+        started = time.perf_counter()
+        snapshot = rebuild()
+
+        cutoff = snapshot.day - timedelta(days=options['keep_days'])
+        OccupancySnapshot.objects.filter(day__lt=cutoff).delete()
+        pruned, _ = DashboardSnapshot.objects.filter(day__lt=cutoff).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the dashboard for {snapshot.day}: {snapshot.occupancy}% of {snapshot.beds_total} beds taken, '
+            f'{snapshot.pending_bookings} pending bookings, {snapshot.rent_collected} of {snapshot.rent_expected} '
+            f'rent collected. Pruned {pruned} old snapshot(s) in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,29 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from hostel.models import Room, Student
+from hostel.pricing import publish_prices
+
+
+class Command(BaseCommand):
+    help = ("Recalculates every student's rent due from the room type catalogue in one UPDATE; "
+            "run nightly so rates with a future effective date take effect")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room-type', action='append', choices=[code for code, _ in Room.ROOM_TYPE_CHOICES],
+                            help='Only students in rooms of this type (repeatable)')
+        parser.add_argument('--date', default=None, help='Use the rates in effect on this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        on = date.fromisoformat(options['date']) if options['date'] else timezone.localdate()
+        with transaction.atomic():
+            updated = Student.recalculate_rent_due(options['room_type'], on)
+            publish_prices()  # A rate may have taken effect today
+        self.stdout.write(self.style.SUCCESS(
+            f'Recalculated rent due for {updated} student(s) using rates in effect on {on} '
+            f'in {time.perf_counter() - started:.2f}s.'
+        ))
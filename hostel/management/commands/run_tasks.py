@@ -0,0 +1,33 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from hostel.checks import live_events_problem
+from hostel.queue import Worker
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background tasks (notifications, waitlist fills, imports) until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Tasks run at once (default: 4)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait before looking again when no task is due (default: 1)')
+        parser.add_argument('--keep-days', type=int, default=7,
+                            help='Days to keep finished tasks; dead ones are kept until requeued (default: 7)')
+        parser.add_argument('--once', action='store_true', help='Stop as soon as no task is due')
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1:
+            raise CommandError('--threads must be at least 1.')
+        problem = live_events_problem()
+        if problem:
+            raise CommandError(problem)
+        worker = Worker(threads=options['threads'], poll_interval=options['poll_interval'],
+                        keep_days=options['keep_days'])
+        # Finish the tasks in hand, then exit
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: worker.stop())
+        self.stdout.write(f'Worker {worker.name} running tasks on {worker.threads} thread(s).')
+        counts = worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stopped: {counts['done']} done, {counts['queued']} to retry, {counts['dead']} dead."))
@@ -1,19 +1,108 @@
-from django.core.management.base import BaseCommand
+import calendar
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
-from hostel.models import Student, Message
+from hostel.models import Message, RentReminderRun, Student
+from hostel.notifications import send_rent_reminders
+
+
+def parse_due_day(value):
+    """Return a due day given as a day of the month (1-31) or 'last'; raise CommandError otherwise."""
+    if str(value) == 'last':
+        return 'last'
+    if str(value).isdigit() and 1 <= int(value) <= 31:
+        return int(value)
+    raise CommandError(f"--due-day must be a day of the month (1-31) or 'last', not '{value}'.")
+
+
+def due_date_for(today, due_day):
+    """Return this month's due date, clamping days past the end of the month to its last day."""
+    last_day = calendar.monthrange(today.year, today.month)[1]
+    day = last_day if due_day == 'last' else min(int(due_day), last_day)
+    return today.replace(day=day)
+
 
 class Command(BaseCommand):
     help = 'Sends rent reminders to students with outstanding rent'
 
-    def handle(self, *args, **kwargs):
-        today = timezone.now().date()
-        if today.day == 30:  # Check if it's the 30th of the month
-            students = Student.objects.filter(rent_due__gt=0)  # Find students with rent due
-            for student in students:
-                Message.objects.create(
-                    student=student,
-                    content=f"Reminder: You have an outstanding rent balance of {student.rent_due}. Please complete your payment."
+    def add_arguments(self, parser):
+        parser.add_argument('--due-day', default=None,
+                            help="Day of the month rent is due, or 'last' (default: settings.RENT_REMINDER_DUE_DAY)")
+        parser.add_argument('--date', default=None,
+                            help='Run as if today were this date (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Debtors written per bulk insert')
+        parser.add_argument('--dry-run', action='store_true', help='Count the reminders without sending them')
+        parser.add_argument('--background', action='store_true',
+                            help='Queue the run for a `run_tasks` worker, which retries it if it fails')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        today = date.fromisoformat(options['date']) if options['date'] else timezone.localdate()
+        due_day = parse_due_day(options['due_day'] or getattr(settings, 'RENT_REMINDER_DUE_DAY', 30))
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        if options['background']:
+            job = send_rent_reminders.delay(date=today.isoformat(), due_day=str(due_day))
+            self.stdout.write(self.style.SUCCESS(
+                f'Queued rent reminders for {today}' + (f' as task #{job.pk}.' if job else '.')))
+            return
+
+        cycle = due_date_for(today, due_day)
+        if today < cycle:
+            self.stdout.write(self.style.WARNING(f'Rent is not due until {cycle}. No reminders sent.'))
+            return
+
+        if options['dry_run']:
+            run = RentReminderRun.objects.filter(cycle=cycle).first()
+            if run and run.completed_at:
+                self.stdout.write(self.style.WARNING(f'Reminders for {cycle} were already sent.'))
+                return
+            pending = Student.objects.filter(rent_due__gt=0, pk__gt=run.last_student_id if run else 0).count()
+            self.stdout.write(f'Dry run: {pending} reminders would be sent for {cycle} '
+                              f'({time.perf_counter() - started:.2f}s).')
+            return
+
+        run, _ = RentReminderRun.objects.get_or_create(cycle=cycle)
+        if run.completed_at:
+            self.stdout.write(self.style.WARNING(f'Reminders for {cycle} were already sent.'))
+            return
+
+        sent = 0
+        while True:
+            with transaction.atomic():
+                # Lock the marker so concurrent runs take turns, and resume from where it says
+                run = RentReminderRun.objects.select_for_update().get(pk=run.pk)
+                if run.completed_at:
+                    break
+                # rent_due is what each student owes, whether or not the ledger has entries for them
+                debtors = list(
+                    Student.objects.filter(rent_due__gt=0, pk__gt=run.last_student_id)
+                    .order_by('pk')
+                    .values_list('pk', 'rent_due')[:batch_size]
                 )
-            self.stdout.write(self.style.SUCCESS('Rent reminders sent successfully.'))
-        else:
-            self.stdout.write(self.style.WARNING('Today is not the 30th. No reminders sent.'))
\ No newline at end of file
+                if not debtors:
+                    run.completed_at = timezone.now()
+                    run.save(update_fields=['completed_at'])
+                    break
+                Message.objects.bulk_create([
+                    Message(
+                        student_id=student_id,
+                        content=f"Reminder: You have an outstanding rent balance of {balance}. Please complete your payment."
+                    )
+                    for student_id, balance in debtors
+                ])
+                run.last_student_id = debtors[-1][0]
+                run.sent += len(debtors)
+                run.save(update_fields=['last_student_id', 'sent'])
+                sent += len(debtors)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rent reminders sent successfully: {sent} for {cycle} in {elapsed:.2f}s.'
+        ))
@@ -0,0 +1,105 @@
+import threading
+import time
+import uuid
+from queue import Empty, Queue
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from hostel.models import CustomUser, Room, RoomBooking, Student
+
+
+class Command(BaseCommand):
+    help = ('Measures concurrent RoomBooking.assign_room calls against one room at several thread counts; '
+            'an optional load run on top of ConcurrentAssignmentTests, which checks the same invariant in the test suite')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', default='1,2,4,8',
+                            help='Comma separated thread counts to run, e.g. 1,2,4,8')
+        parser.add_argument('--beds', type=int, default=200, help='Beds in the contended room')
+        parser.add_argument('--bookings', type=int, default=400,
+                            help='Pending bookings competing for those beds')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] in ('', ':memory:'):
+            raise CommandError('The stress test needs a file-backed database shared between threads.')
+
+        thread_counts = [int(n) for n in options['threads'].split(',') if n.strip()]
+        beds, bookings = options['beds'], options['bookings']
+        baseline = None
+        failed = False
+
+        for threads in thread_counts:
+            room, booking_ids, users = self.seed(beds, bookings)
+            try:
+                elapsed, errors = self.run(room, booking_ids, threads)
+                room.refresh_from_db()
+                assigned = RoomBooking.objects.filter(room=room, status='assigned').count()
+                oversold = max(assigned - beds, 0) + max(-room.beds_available, 0)
+                consistent = assigned + room.beds_available == beds
+            finally:
+                CustomUser.objects.filter(pk__in=users).delete()  # Cascades to students, bookings and messages
+                Room.objects.filter(pk=room.pk).delete()
+
+            rate = bookings / elapsed if elapsed else 0
+            baseline = baseline or rate
+            line = (f"threads={threads:<3} assigned={assigned}/{beds} oversold={oversold} errors={errors} "
+                    f"time={elapsed:.2f}s rate={rate:.0f}/s speedup={rate / baseline:.2f}x")
+            if oversold or not consistent:
+                failed = True
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+
+        if failed:
+            raise CommandError('Beds were oversold or the room counter drifted from the assignments.')
+
+    def seed(self, beds, bookings):
+        """Create a throwaway room and pending bookings, one per throwaway student."""
+        run = uuid.uuid4().hex[:3]
+        room = Room.objects.create(room_number=f'stress{run}', room_type='8_sharing',
+                                   capacity=beds, beds_available=beds)
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'stress-{run}-{i}', user_type='student') for i in range(bookings)
+        ])
+        students = Student.objects.bulk_create([
+            Student(user=user, name=user.username, email=f'{user.username}@example.com', student_id=f'x{run}{i}')
+            for i, user in enumerate(users)
+        ])
+        created = RoomBooking.objects.bulk_create([
+            RoomBooking(student=student, room_type='shared', check_in_date=timezone.now().date(),
+                        duration_of_stay='one_semester')
+            for student in students
+        ])
+        return room, [booking.pk for booking in created], [user.pk for user in users]
+
+    def run(self, room, booking_ids, threads):
+        """Drain the bookings from a shared queue with the given number of threads."""
+        queue = Queue()
+        for booking_id in booking_ids:
+            queue.put(booking_id)
+        errors = []
+
+        def worker():
+            close_old_connections()
+            try:
+                while True:
+                    try:
+                        booking_id = queue.get_nowait()
+                    except Empty:
+                        return
+                    try:
+                        booking = RoomBooking.objects.select_related('student').get(pk=booking_id)
+                        booking.assign_room(Room.objects.get(pk=room.pk))
+                    except Exception as exc:  # Database lock timeouts etc. are counted, not fatal
+                        errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - start, len(errors)
@@ -0,0 +1,62 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .querystats import QueryRecorder, budget_for
+
+logger = logging.getLogger('hostel.queries')
+
+
+class QueryStatsMiddleware:
+    """
+    Record the SQL each request runs. In debug mode the figures are sent back as
+    X-Query-* response headers; otherwise they are logged, at WARNING level when a
+    view goes over its budget in settings.QUERY_BUDGETS. Works under WSGI and ASGI
+    alike: async views aren't pushed back onto a thread by this middleware, and the
+    queries they run through sync_to_async are counted in its worker threads.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self._report(request, response, recorder)
+
+    async def __acall__(self, request):
+        with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        return self._report(request, response, recorder)
+
+    def _report(self, request, response, recorder):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else request.path
+        duplicates = recorder.duplicates()
+        repeated = sum(times - 1 for times in duplicates.values())
+        time_ms = recorder.total_time * 1000
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Time-Ms'] = f'{time_ms:.1f}'
+            response['X-Query-Duplicates'] = str(repeated)
+            return response
+
+        budget = budget_for(match.url_name) if match else None
+        over_budget = budget is not None and recorder.count > budget
+        logger.log(
+            logging.WARNING if over_budget else logging.INFO,
+            'view=%s status=%s queries=%d sql_ms=%.1f duplicates=%d budget=%s',
+            view, response.status_code, recorder.count, time_ms, repeated, budget if budget is not None else '-',
+        )
+        if over_budget and duplicates:
+            worst, times = max(duplicates.items(), key=lambda item: item[1])
+            logger.warning('view=%s most repeated query (%dx): %s', view, times, worst)
+        return response
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_balances(apps, schema_editor):
+    """Seed the ledger with each student's existing rent_due/rent_paid as opening entries."""
+    Student = apps.get_model('hostel', 'Student')
+    RentLedgerEntry = apps.get_model('hostel', 'RentLedgerEntry')
+    RentBalance = apps.get_model('hostel', 'RentBalance')
+
+    entries, balances = [], []
+    for student in Student.objects.only('pk', 'rent_paid', 'rent_due').iterator():
+        charged = student.rent_due + student.rent_paid
+        if not charged and not student.rent_paid:
+            continue
+        if charged:
+            entries.append(RentLedgerEntry(student_id=student.pk, entry_type='charge', amount=charged,
+                                           note='Opening balance'))
+        if student.rent_paid:
+            entries.append(RentLedgerEntry(student_id=student.pk, entry_type='payment', amount=student.rent_paid,
+                                           note='Opening balance'))
+        balances.append(RentBalance(student_id=student.pk, total_charged=charged, total_paid=student.rent_paid,
+                                    balance=student.rent_due))
+    RentLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+    RentBalance.objects.bulk_create(balances, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0009_alter_room_room_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentBalance',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rent_balance', serialize=False, to='hostel.student')),
+                ('total_charged', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['balance'], name='hostel_rentbalance_balance_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RentLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('charge', 'Charge'), ('payment', 'Payment')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='hostel.student')),
+            ],
+            options={
+                'verbose_name_plural': 'rent ledger entries',
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
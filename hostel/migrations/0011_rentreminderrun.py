@@ -0,0 +1,24 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0010_rent_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentReminderRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cycle', models.DateField(unique=True)),
+                ('last_student_id', models.BigIntegerField(default=0)),
+                ('sent', models.IntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
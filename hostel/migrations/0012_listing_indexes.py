@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0011_rentreminderrun'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['timestamp', 'id'], name='hostel_feedback_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['name', 'id'], name='hostel_student_name_idx'),
+        ),
+    ]
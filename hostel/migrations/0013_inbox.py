@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def count_unread(apps, schema_editor):
+    """Existing messages start unread; seed each student's counter from them."""
+    Message = apps.get_model('hostel', 'Message')
+    InboxCounter = apps.get_model('hostel', 'InboxCounter')
+    counts = Message.objects.values_list('student_id').annotate(n=models.Count('pk')).order_by()
+    InboxCounter.objects.bulk_create(
+        [InboxCounter(student_id=student_id, unread=n) for student_id, n in counts.iterator()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0012_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxCounter',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inbox', serialize=False, to='hostel.student')),
+                ('unread', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='is_read',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
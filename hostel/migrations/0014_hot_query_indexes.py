@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0013_inbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['student', '-timestamp', '-id'], name='hostel_message_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['room_type', 'is_available', 'beds_available'], name='hostel_room_type_free_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roombooking',
+            index=models.Index(fields=['student', '-booking_date'], name='hostel_booking_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roombooking',
+            index=models.Index(fields=['status', 'booking_date'], name='hostel_booking_status_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0014_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('rooms', models.IntegerField(default=0)),
+                ('beds_total', models.IntegerField(default=0)),
+                ('beds_free', models.IntegerField(default=0)),
+                ('pending_bookings', models.IntegerField(default=0)),
+                ('rent_expected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('rent_collected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('rebuilt_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OccupancySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('room_type', models.CharField(choices=[('single', 'Single Room - 10,000'), ('studio', 'Studio Room - 12,000'), ('4_sharing', '4 Sharing - 8,500'), ('twin', 'Twin Room - 9,500'), ('6_sharing', '6 Sharing - 7,500'), ('8_sharing', '8 Sharing - 6,500')], max_length=20)),
+                ('rooms', models.IntegerField(default=0)),
+                ('beds_total', models.IntegerField(default=0)),
+                ('beds_free', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'room_type'), name='hostel_occupancy_day_type_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:41
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The prices that used to be hardcoded as Room.RENT_PRICES
+ROOM_TYPES = [
+    ('single', 'Single Room', 10000),
+    ('studio', 'Studio Room', 12000),
+    ('4_sharing', '4 Sharing', 8500),
+    ('twin', 'Twin Room', 9500),
+    ('6_sharing', '6 Sharing', 7500),
+    ('8_sharing', '8 Sharing', 6500),
+]
+
+
+def seed_room_types(apps, schema_editor):
+    """Move the hardcoded room types and rents into the catalogue, with rates effective from the start."""
+    RoomType = apps.get_model('hostel', 'RoomType')
+    RoomRate = apps.get_model('hostel', 'RoomRate')
+    RoomType.objects.bulk_create([RoomType(code=code, name=name) for code, name, _ in ROOM_TYPES])
+    RoomRate.objects.bulk_create([
+        RoomRate(room_type_id=code, monthly_rent=rent, effective_from=datetime.date(2000, 1, 1))
+        for code, _, rent in ROOM_TYPES
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0015_dashboard_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomType',
+            fields=[
+                ('code', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='occupancysnapshot',
+            name='room_type',
+            field=models.CharField(choices=[('single', 'Single Room'), ('studio', 'Studio Room'), ('4_sharing', '4 Sharing'), ('twin', 'Twin Room'), ('6_sharing', '6 Sharing'), ('8_sharing', '8 Sharing')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='room',
+            name='room_type',
+            field=models.CharField(choices=[('single', 'Single Room'), ('studio', 'Studio Room'), ('4_sharing', '4 Sharing'), ('twin', 'Twin Room'), ('6_sharing', '6 Sharing'), ('8_sharing', '8 Sharing')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='RoomRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('monthly_rent', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('effective_from', models.DateField()),
+                ('room_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='hostel.roomtype')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('room_type', 'effective_from'), name='hostel_roomrate_type_date_uniq')],
+            },
+        ),
+        migrations.RunPython(seed_room_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0016_room_type_catalogue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roombooking',
+            name='priority',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='roombooking',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('assigned', 'Room Assignment Complete'), ('vacated', 'Vacated')], default='pending', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='roombooking',
+            index=models.Index(fields=['status', 'room_type', '-priority', 'booking_date', 'id'], name='hostel_booking_waitlist_idx'),
+        ),
+    ]
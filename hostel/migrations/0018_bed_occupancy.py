@@ -0,0 +1,47 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:46
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# RoomBooking.STAY_DAYS when this migration was written
+STAY_DAYS = {'one_month': 30, 'one_semester': 120, 'one_year': 365}
+
+
+def record_assigned_stays(apps, schema_editor):
+    """Give every assigned booking its stay, from check-in for the length of stay it booked."""
+    RoomBooking = apps.get_model('hostel', 'RoomBooking')
+    BedOccupancy = apps.get_model('hostel', 'BedOccupancy')
+    bookings = RoomBooking.objects.filter(status='assigned', room__isnull=False).only(
+        'pk', 'room_id', 'check_in_date', 'duration_of_stay')
+    BedOccupancy.objects.bulk_create([
+        BedOccupancy(room_id=booking.room_id, booking_id=booking.pk, start=booking.check_in_date,
+                     end=booking.check_in_date + datetime.timedelta(days=STAY_DAYS.get(booking.duration_of_stay, 30)))
+        for booking in bookings.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0017_booking_waitlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BedOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateField()),
+                ('end', models.DateField()),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='hostel.roombooking')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancies', to='hostel.room')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['end', 'start'], name='hostel_occupancy_range_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end__gt', models.F('start'))), name='hostel_occupancy_end_after_start')],
+            },
+        ),
+        migrations.RunPython(record_assigned_stays, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# (table, text column, date column, kind code in the rowid, inquiry type column or None)
+SOURCES = [
+    ('hostel_feedback', 'message', 'timestamp', 1, None),
+    ('hostel_contactinquiry', 'message', 'submitted_at', 2, 'inquiry_type'),
+    ('hostel_message', 'content', 'timestamp', 3, None),
+]
+
+
+def sqlite_statements():
+    yield ("CREATE VIRTUAL TABLE hostel_search USING fts5("
+           "body, inquiry_type UNINDEXED, created UNINDEXED, tokenize='porter unicode61')")
+    for table, text, date, code, inquiry_type in SOURCES:
+        kind = inquiry_type or "''"
+        yield (f"INSERT INTO hostel_search(rowid, body, inquiry_type, created) "
+               f"SELECT id * 4 + {code}, {text}, {kind}, {date} FROM {table}")
+        new_kind = f'new.{inquiry_type}' if inquiry_type else "''"
+        yield (f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN "
+               f"INSERT INTO hostel_search(rowid, body, inquiry_type, created) "
+               f"VALUES (new.id * 4 + {code}, new.{text}, {new_kind}, new.{date}); END")
+        columns = ', '.join(filter(None, [text, inquiry_type]))
+        yield (f"CREATE TRIGGER {table}_search_update AFTER UPDATE OF {columns} ON {table} BEGIN "
+               f"UPDATE hostel_search SET body = new.{text}, inquiry_type = {new_kind} "
+               f"WHERE rowid = new.id * 4 + {code}; END")
+        yield (f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN "
+               f"DELETE FROM hostel_search WHERE rowid = old.id * 4 + {code}; END")
+
+
+def create_search_index(apps, schema_editor):
+    """FTS5 table plus triggers on SQLite, FULLTEXT indexes on MySQL; nothing elsewhere."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in sqlite_statements():
+            schema_editor.execute(statement)
+    elif vendor == 'mysql':
+        for table, text, _, _, _ in SOURCES:
+            schema_editor.execute(f'ALTER TABLE {table} ADD FULLTEXT INDEX {table}_{text}_ft ({text})')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for table, _, _, _, _ in SOURCES:
+            for event in ('insert', 'update', 'delete'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_search_{event}')
+        schema_editor.execute('DROP TABLE IF EXISTS hostel_search')
+    elif vendor == 'mysql':
+        for table, text, _, _, _ in SOURCES:
+            schema_editor.execute(f'ALTER TABLE {table} DROP INDEX {table}_{text}_ft')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0019_task_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
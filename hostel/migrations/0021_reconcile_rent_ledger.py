@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+
+def reconcile(apps, schema_editor):
+    """
+    Post a charge for the difference wherever rent_due was changed without a ledger entry
+    (imports, room changes, recalculated rents), so every balance equals rent_due again.
+    """
+    Student = apps.get_model('hostel', 'Student')
+    RentLedgerEntry = apps.get_model('hostel', 'RentLedgerEntry')
+    RentBalance = apps.get_model('hostel', 'RentBalance')
+
+    students = (Student.objects.annotate(balance=Coalesce('rent_balance__balance', Value(Decimal(0))))
+                .values_list('pk', 'rent_due', 'balance'))
+    differences = {student_id: rent_due - balance for student_id, rent_due, balance in students.iterator()
+                   if rent_due != balance}
+    entries, created, changed = [], [], []
+    balances = RentBalance.objects.in_bulk(list(differences))
+    for student_id, difference in differences.items():
+        entries.append(RentLedgerEntry(student_id=student_id, entry_type='charge', amount=difference,
+                                       note='Reconciled with rent due'))
+        row = balances.get(student_id)
+        if row is None:
+            created.append(RentBalance(student_id=student_id, total_charged=difference, balance=difference))
+        else:
+            row.total_charged += difference
+            row.balance += difference
+            changed.append(row)
+    RentLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+    RentBalance.objects.bulk_create(created, batch_size=1000)
+    RentBalance.objects.bulk_update(changed, ['total_charged', 'balance'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0020_full_text_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(reconcile, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:27
+
+import hostel.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0021_reconcile_rent_ledger'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', hostel.models.CustomUserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:44
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def charge_current_rooms(apps, schema_editor):
+    """Record today's price of each student's room as the rent already charged for it, as it was last recalculated."""
+    Room = apps.get_model('hostel', 'Room')
+    RoomRate = apps.get_model('hostel', 'RoomRate')
+    Student = apps.get_model('hostel', 'Student')
+    room_type = Room.objects.filter(pk=OuterRef(OuterRef('room_id'))).values('room_type')[:1]
+    price = Subquery(RoomRate.objects.filter(room_type_id=Subquery(room_type), effective_from__lte=timezone.localdate())
+                     .order_by('-effective_from').values('monthly_rent')[:1])
+    Student.objects.filter(room__isnull=False).update(room_rent=Coalesce(price, Value(Decimal(0))))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0023_live_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='room_rent',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(charge_current_rooms, migrations.RunPython.noop),
+    ]
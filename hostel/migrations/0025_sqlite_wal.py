@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def use_wal(apps, schema_editor):
+    """
+    Switch a SQLite database to write-ahead logging, which lets readers run alongside
+    the single writer. The mode is stored in the database file, so it is set once here
+    rather than by every connection.
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('PRAGMA journal_mode=WAL')
+
+
+def use_rollback_journal(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('PRAGMA journal_mode=DELETE')
+
+
+class Migration(migrations.Migration):
+    atomic = False  # SQLite can't change the journal mode inside a transaction
+
+    dependencies = [
+        ('hostel', '0024_student_room_rent'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_wal, use_rollback_journal, elidable=True),
+    ]
@@ -1,8 +1,37 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .signals import bookings_changed, ledger_journaled, room_beds_changed, student_changed, users_changed
 
 # Create your models here.
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Update the users and tell users_changed which ones, as queryset updates skip post_save."""
+        with transaction.atomic(using=self.db):
+            user_ids = list(self.values_list('pk', flat=True))
+            updated = super().update(**kwargs)
+        if user_ids:
+            users_changed.send(sender=CustomUser, user_ids=user_ids)
+        return updated
+
+    update.alters_data = True
+
+
+class CustomUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class CustomUser(AbstractUser):
     USER_TYPE_CHOICES = (
         ('admin', 'Admin'),
@@ -10,45 +39,169 @@ class CustomUser(AbstractUser):
     )
     user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES, default='student')
     student: 'Student'
+
+    objects = CustomUserManager()
+
     def __str__(self):
         return self.username
 
 
+class RoomType(models.Model):
+    """
+    Catalogue entry for a room type. Prices live in RoomRate rows with the date each
+    takes effect. The whole catalogue is small, so each process keeps it in memory and
+    reloads it when the 'room_types' data version moves (any process changing it bumps it,
+    which reaches the others through the shared cache that hostel.checks requires).
+    """
+    code = models.CharField(max_length=20, primary_key=True)  # Matches Room.room_type
+    name = models.CharField(max_length=50)
+
+    _catalogue = None  # (data version, {code: (name, [(effective_from, monthly_rent), ...] newest first)})
+
+    @classmethod
+    def catalogue(cls):
+        from .versions import get_version  # versions imports this module
+        version = get_version('room_types')
+        if cls._catalogue is None or cls._catalogue[0] != version:
+            entries = {room_type.code: (room_type.name, []) for room_type in cls.objects.all()}
+            for rate in RoomRate.objects.order_by('room_type_id', '-effective_from'):
+                entries[rate.room_type_id][1].append((rate.effective_from, rate.monthly_rent))
+            cls._catalogue = (version, entries)
+        return cls._catalogue[1]
+
+    @classmethod
+    def price_for(cls, code, on=None):
+        """Monthly rent of a room type on a date (today by default); 0 for unknown types or dates before any rate."""
+        on = on or timezone.localdate()
+        _, rates = cls.catalogue().get(code, ('', []))
+        return next((rent for effective_from, rent in rates if effective_from <= on), 0)
+
+    @classmethod
+    def name_for(cls, code):
+        return cls.catalogue().get(code, (code, []))[0]
+
+    @staticmethod
+    def price_expression(room_type, on=None):
+        """SQL expression for the monthly rent in effect on a date for room_type (a code or an expression)."""
+        return Subquery(
+            RoomRate.objects.filter(room_type_id=room_type, effective_from__lte=on or timezone.localdate())
+            .order_by('-effective_from').values('monthly_rent')[:1]
+        )
+
+    def __str__(self):
+        return self.name
+
+
+class RoomRate(models.Model):
+    """Monthly rent of a room type from effective_from until the next rate starts."""
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, related_name='rates')
+    monthly_rent = models.DecimalField(max_digits=10, decimal_places=2)
+    effective_from = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room_type', 'effective_from'], name='hostel_roomrate_type_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_type_id}: {self.monthly_rent} from {self.effective_from}"
+
+
 class Room(models.Model):
-    # Define room types and their fixed rent prices
+    # Room type codes; names and prices come from the RoomType catalogue
     ROOM_TYPE_CHOICES = [
-        ('single', 'Single Room - 10,000'),
-        ('studio', 'Studio Room - 12,000'),
-        ('4_sharing', '4 Sharing - 8,500'),
-        ('twin', 'Twin Room - 9,500'),
-        ('6_sharing', '6 Sharing - 7,500'),
-        ('8_sharing', '8 Sharing - 6,500'),
+        ('single', 'Single Room'),
+        ('studio', 'Studio Room'),
+        ('4_sharing', '4 Sharing'),
+        ('twin', 'Twin Room'),
+        ('6_sharing', '6 Sharing'),
+        ('8_sharing', '8 Sharing'),
     ]
 
     # Room fields
     room_number = models.CharField(max_length=10, unique=True)  # Unique room identifier
     room_type = models.CharField(max_length=20, choices=ROOM_TYPE_CHOICES)  # Type of room
     capacity = models.IntegerField(default=1)  # Total beds in the room
-    beds_available = models.IntegerField(default=1)  # Beds left
+    beds_available = models.IntegerField(default=1)  # Beds free today; BedOccupancy has the stays ahead
     is_available = models.BooleanField(default=True)  # Availability status
 
+    class Meta:
+        indexes = [
+            # Free-room lookups in the assign action and batch matcher
+            models.Index(fields=['room_type', 'is_available', 'beds_available'], name='hostel_room_type_free_idx'),
+        ]
+
+    # Beds per room for each room type, used to rank fallback room types by size
+    ROOM_TYPE_SIZES = {
+        'single': 1,
+        'studio': 1,
+        'twin': 2,
+        '4_sharing': 4,
+        '6_sharing': 6,
+        '8_sharing': 8,
+    }
+
     @property
     def rent_price(self):
-        """Return the fixed rent price based on the room type."""
-        prices = {
-            'single': 10000,
-            'studio': 12000,
-            '4_sharing': 8500,
-            'twin': 9500,
-            '6_sharing': 7500,
-            '8_sharing': 6500,
-        }
-        return prices.get(self.room_type, 0)  # Default to 0 if room type is invalid
+        """Return today's rent for the room type from the catalogue (0 if it has none)."""
+        return RoomType.price_for(self.room_type)
 
     def update_availability(self):
         """Update room availability based on available beds."""
         self.is_available = self.beds_available > 0
 
+    @classmethod
+    def count_free_beds(cls, on=None):
+        """
+        Set every room's free beds to its capacity less the stays covering `on` (today):
+        stays that begin or end without a booking changing. Returns the ids of the rooms changed.
+        """
+        on = on or timezone.localdate()
+        taken = Coalesce(Subquery(
+            BedOccupancy.objects.filter(room=OuterRef('pk'), start__lte=on, end__gt=on)
+            .values('room').annotate(count=Count('pk')).values('count')
+        ), 0)
+        free = Greatest(F('capacity') - taken, 0)
+        with transaction.atomic():
+            changed = list(cls.objects.select_for_update().annotate(free=free).exclude(beds_available=F('free'))
+                           .values_list('pk', flat=True))
+            cls.objects.filter(pk__in=changed).update(beds_available=free)
+            cls.objects.filter(pk__in=changed).update(is_available=Q(beds_available__gt=0))
+        if changed:
+            room_beds_changed.send(sender=cls, room_ids=changed)
+        return changed
+
+    @classmethod
+    def take_beds(cls, beds_taken):
+        """
+        Take beds_taken[room_id] free beds from each room with one conditional UPDATE: a
+        room only changes if it still has that many free. Returns False if any room was
+        short, in which case the caller rolls back the rooms that did change.
+        """
+        rooms_by_count = defaultdict(list)
+        for room_id, count in beds_taken.items():
+            if count:
+                rooms_by_count[count].append(room_id)
+        if not rooms_by_count:
+            return True
+        updated = cls.objects.filter(
+            reduce(or_, (Q(pk__in=room_ids, beds_available__gte=count) for count, room_ids in rooms_by_count.items()))
+        ).update(beds_available=F('beds_available') - Case(
+            *(When(pk__in=room_ids, then=Value(count)) for count, room_ids in rooms_by_count.items()),
+            default=Value(0), output_field=models.IntegerField(),
+        ))
+        if updated != sum(len(room_ids) for room_ids in rooms_by_count.values()):
+            return False
+        cls.objects.filter(pk__in=beds_taken, beds_available__lte=0).update(is_available=False)
+        return True
+
+    @classmethod
+    def release_beds(cls, room_ids):
+        """Give one bed back to each room in room_ids, never beyond its capacity. Returns the rooms updated."""
+        return cls.objects.filter(pk__in=room_ids, beds_available__lt=F('capacity')).update(
+            beds_available=F('beds_available') + 1, is_available=True
+        )
+
 
     def save(self, *args, **kwargs):
         """
@@ -69,17 +222,114 @@ class Student(models.Model):
     room = models.ForeignKey('Room', on_delete=models.SET_NULL, null=True, blank=True)
     rent_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     rent_due = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Rent charged for the current room so far; a new room or price charges the difference
+    room_rent = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'], name='hostel_student_name_idx'),  # Keyset pagination by name
+        ]
 
     def calculate_rent_due(self):
-        """Calculate rent due based on the room's fixed price."""
+        """
+        Charge the difference between the room's current price and the rent charged for a
+        room so far, leaving other charges and credits in rent_due alone. Without a room
+        nothing more is charged; what is owed for the last one stays due.
+        """
+        rent = self.room.rent_price if self.room else Decimal(0)
         if self.room:
-            self.rent_due = self.room.rent_price - self.rent_paid
+            self.rent_due += rent - self.room_rent
+        self.room_rent = rent
 
+    @classmethod
+    def recalculate_rent_due(cls, room_types=None, on=None):
+        """
+        Charge every student with a room (of room_types, if given) the difference between
+        the catalogue price of their room and the rent charged for it so far, in one UPDATE
+        (the set-based version of calculate_rent_due()), and post each difference to the
+        ledger. Other charges and credits stay in rent_due. Returns the row count.
+        """
+        room_type = Room.objects.filter(pk=OuterRef(OuterRef('room_id'))).values('room_type')[:1]
+        price = Coalesce(RoomType.price_expression(Subquery(room_type), on), Value(Decimal(0)))
+        students = cls.objects.filter(room__isnull=False)
+        if room_types is not None:
+            students = students.filter(room__room_type__in=room_types)
+        with transaction.atomic():
+            # Locked, so a room change can't land between reading the old amounts and the UPDATE
+            changes = [
+                RentLedgerEntry(student_id=pk, entry_type='charge', amount=(new - old).quantize(Decimal('0.01')),
+                                note='Rent recalculated from the room type catalogue')
+                for pk, old, new in students.select_for_update().annotate(new_rent=price)
+                .values_list('pk', 'room_rent', 'new_rent').iterator(chunk_size=2000)
+                if new != old
+            ]
+            updated = students.exclude(room_rent=price).update(rent_due=F('rent_due') + price - F('room_rent'),
+                                                              room_rent=price)
+            RentLedgerEntry.journal(changes)  # The same change, on the ledger
+        if updated:
+            student_changed.send(sender=cls, student_ids=None)
+        return updated
 
     def save(self, *args, **kwargs):
-        """Override save method to update rent due whenever the student is saved."""
-        self.calculate_rent_due()
-        super().save(*args, **kwargs)
+        """
+        Override save method to charge rent for a new room whenever the student is saved
+        with one, and post the charge to the rent ledger so the student's balance stays
+        equal to rent_due. Saves that leave the room as it was keep the stored rent fields.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'rent_due' not in update_fields and 'room' not in update_fields:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            entries = []
+            if self._state.adding:
+                self.calculate_rent_due()
+                super().save(*args, **kwargs)
+                entries += RentLedgerEntry.opening(self.pk, self.rent_due, self.rent_paid)
+            else:
+                # Payments and charges change the stored rent fields with database arithmetic; start
+                # from those, not this copy
+                stored = (Student.objects.select_for_update().filter(pk=self.pk)
+                          .values('rent_due', 'rent_paid', 'room_rent', 'room_id').first())
+                if stored:
+                    self.rent_due, self.rent_paid, self.room_rent = (
+                        stored['rent_due'], stored['rent_paid'], stored['room_rent'])
+                    if self.room_id != stored['room_id']:
+                        self.calculate_rent_due()
+                super().save(*args, **kwargs)
+                if stored and self.rent_due != stored['rent_due']:
+                    entries.append(RentLedgerEntry(student_id=self.pk, entry_type='charge',
+                                                   amount=self.rent_due - stored['rent_due'],
+                                                   note=f'Rent for room {self.room.room_number}'))
+            RentLedgerEntry.journal(entries)
+
+    @classmethod
+    def move_in(cls, assigned):
+        """
+        Set the room of each student whose booking was just assigned, from (booking, room)
+        pairs, recompute their rent due for it and post the change to the ledger.
+        """
+        rooms = {booking.student_id: room for booking, room in assigned}
+        students = list(cls.objects.select_for_update().filter(pk__in=rooms).only('pk', 'rent_due', 'room_rent'))
+        entries = []
+        for student in students:
+            before = student.rent_due
+            student.room = rooms[student.pk]
+            student.calculate_rent_due()
+            if student.rent_due != before:
+                entries.append(RentLedgerEntry(student_id=student.pk, entry_type='charge',
+                                               amount=student.rent_due - before,
+                                               note=f'Rent for room {student.room.room_number}'))
+        cls.objects.bulk_update(students, ['room', 'rent_due', 'room_rent'], batch_size=500)
+        RentLedgerEntry.journal(entries)
+        student_changed.send(sender=cls, student_ids=list(rooms))
+
+    def record_payment(self, amount, note=''):
+        """Append a rent payment to the ledger and return the entry."""
+        return RentLedgerEntry.objects.create(student=self, entry_type='payment', amount=amount, note=note)
+
+    def record_charge(self, amount, note=''):
+        """Append a rent charge to the ledger and return the entry."""
+        return RentLedgerEntry.objects.create(student=self, entry_type='charge', amount=amount, note=note)
 
     def __str__(self):
         return self.name
@@ -92,6 +342,11 @@ class Feedback(models.Model):
     message = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='hostel_feedback_time_idx'),  # Keyset pagination by time
+        ]
+
     def __str__(self):
         return f"Feedback from {self.student.name}"
 
@@ -127,7 +382,14 @@ class RoomBooking(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('assigned', 'Room Assignment Complete'),
+        ('vacated', 'Vacated'),
     ]
+    # Nights each stay books a bed for, counted from the check-in date
+    STAY_DAYS = {
+        'one_month': 30,
+        'one_semester': 120,
+        'one_year': 365,
+    }
 
     student = models.ForeignKey('Student', on_delete=models.CASCADE)  # Changed back to FK for better tracking
     phone = models.CharField(max_length=15, unique=True, null=True)
@@ -138,36 +400,510 @@ class RoomBooking(models.Model):
     special_requests = models.TextField(blank=True, null=True)
     booking_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    priority = models.IntegerField(default=0)  # Waitlist priority, higher first; see hostel.waitlist
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', '-booking_date'], name='hostel_booking_student_idx'),  # my_profile
+            models.Index(fields=['status', 'booking_date'], name='hostel_booking_status_idx'),  # Pending queue
+            models.Index(fields=['status', 'room_type', '-priority', 'booking_date', 'id'],
+                         name='hostel_booking_waitlist_idx'),  # Head of the waitlist for one preference
+        ]
+
+    @property
+    def check_out_date(self):
+        """The day the bed is free again (the stay covers check-in up to, not including, this date)."""
+        return self.check_in_date + timedelta(days=self.STAY_DAYS.get(self.duration_of_stay, 30))
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            from .waitlist import priority_for  # waitlist imports this module
+            self.priority = priority_for(self)
+        super().save(*args, **kwargs)
 
+    def stays_on(self, day):
+        """True if the booking's stay covers day."""
+        return self.check_in_date <= day < self.check_out_date
 
     def assign_room(self, room):
-        """Assign a room, update status, and notify the student."""
-        if room and room.beds_available > 0:
-            self.room = room
-            self.status = 'assigned'
-            room.beds_available -= 1
-            room.update_availability()  # Update availability
-            room.save()  # Save the room after updating
-            self.save()  # Save the booking after assigning the room
-            Message.objects.create(
-                student=self.student,
-                content=f"Your room assignment is complete! You have been assigned Room {room.room_number}."
+        """
+        Assign a room, update status, and queue the student's notification.
+
+        The room row is locked and the stays already in it are checked against the
+        booking's dates, so any number of concurrent assigners can never put more
+        stays in the room at once than it has beds. beds_available counts the beds
+        free today, so it only goes down when the stay has already begun. Returns
+        True if the booking was assigned, False if it was no longer pending or the
+        room has no bed free for the whole stay.
+        """
+        if room is None:
+            return False
+        with transaction.atomic():
+            if self.pk is None:
+                self.save()
+            # Claim the booking first so the same booking can't take two beds
+            claimed = RoomBooking.objects.filter(pk=self.pk, status='pending').update(
+                room=room, status='assigned'
             )
+            if not claimed:
+                return False
+            capacity = Room.objects.select_for_update().values_list('capacity', flat=True).get(pk=room.pk)
+            if not BedOccupancy.fits(room.pk, capacity, [(self.check_in_date, self.check_out_date)]):
+                transaction.set_rollback(True)  # Release the claim on the booking
+                return False
+            if self.stays_on(timezone.localdate()):
+                taken = Room.objects.filter(pk=room.pk, beds_available__gt=0).update(
+                    beds_available=F('beds_available') - 1
+                )
+                if not taken:  # Out of step with the stays; Room.count_free_beds recounts it
+                    transaction.set_rollback(True)
+                    return False
+                Room.objects.filter(pk=room.pk, beds_available__lte=0).update(is_available=False)
+            BedOccupancy.record([(self, room)])
+            Student.move_in([(self, room)])
+            from .versions import bump_student_versions  # versions imports this module
+            bump_student_versions([self.student_id])
+            from .notifications import send_booking_messages  # notifications imports this module
+            send_booking_messages.delay(assigned=[[self.pk, room.pk]])
+        room_beds_changed.send(sender=Room, room_ids=[room.pk])
+        bookings_changed.send(sender=RoomBooking, booking_ids=[self.pk])
+        self.room = room
+        self.status = 'assigned'
+        room.refresh_from_db(fields=['beds_available', 'is_available'])
+        return True
+
+    def vacate(self):
+        """
+        End an assigned booking and give its bed back to the room, where the waitlist
+        picks it up. Returns False if the booking was not assigned.
+        """
+        with transaction.atomic():
+            if not RoomBooking.objects.filter(pk=self.pk, status='assigned').update(status='vacated'):
+                return False
+            if self.stays_on(timezone.localdate()):  # A stay not begun yet holds no bed today
+                Room.release_beds([self.room_id])
+            BedOccupancy.end_stays([self.pk])
+            # The student leaves the room; what they owe for it stays due
+            if Student.objects.filter(pk=self.student_id, room_id=self.room_id).update(room=None, room_rent=0):
+                student_changed.send(sender=Student, student_ids=[self.student_id])
+            from .versions import bump_student_versions
+            bump_student_versions([self.student_id])
+        room_beds_changed.send(sender=Room, room_ids=[self.room_id])
+        bookings_changed.send(sender=RoomBooking, booking_ids=[self.pk])
+        self.status = 'vacated'
+        return True
 
     def notify_unavailability(self):
-        """Send a message if room request is denied."""
-        Message.objects.create(
+        """Queue a message telling the student their room request is on the waitlist."""
+        from .notifications import send_booking_messages
+        send_booking_messages.delay(unmatched=[self.pk])
+
+    def assignment_message(self, room):
+        """Build (without saving) the message telling the student which room they got."""
+        return Message(
+            student=self.student,
+            content=f"Your room assignment is complete! You have been assigned Room {room.room_number}."
+        )
+
+    def unavailability_message(self):
+        """Build (without saving) the message telling the student no room was available."""
+        return Message(
             student=self.student,
-            content="Unfortunately, the room you requested is unavailable. Please select another room."
+            content="Unfortunately, the room you requested is unavailable right now. You are on the waitlist "
+                    "and will be assigned a room automatically as soon as a bed frees up."
         )
 
     def __str__(self):
         return f"{self.student.name} - {self.get_status_display()}"
 
+class BedOccupancy(models.Model):
+    """
+    One bed in a room taken by an assigned booking from start up to (not including)
+    end. hostel.occupancy builds its interval index from these rows.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='occupancies')
+    booking = models.OneToOneField(RoomBooking, on_delete=models.CASCADE, related_name='occupancy')
+    start = models.DateField()
+    end = models.DateField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['end', 'start'], name='hostel_occupancy_range_idx'),  # Current and future stays
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end__gt=F('start')), name='hostel_occupancy_end_after_start'),
+        ]
+
+    @staticmethod
+    def most_taken(stays):
+        """The most of stays ((start, end) pairs) that overlap on any one day."""
+        taken = most = 0
+        # Ends sort before starts on the same day, so a bed can be handed over the same day
+        for _, change in sorted([(start, 1) for start, _ in stays] + [(end, -1) for _, end in stays]):
+            taken += change
+            most = max(most, taken)
+        return most
+
+    @classmethod
+    def fits(cls, room_id, capacity, stays):
+        """
+        True if the room has a bed free for each of the new stays ((start, end) pairs)
+        alongside those already in it. Lock the room row first.
+        """
+        start, end = min(start for start, _ in stays), max(end for _, end in stays)
+        held = cls.objects.filter(room_id=room_id, start__lt=end, end__gt=start).values_list('start', 'end')
+        return cls.most_taken(list(held) + list(stays)) <= capacity
+
+    @classmethod
+    def record(cls, assignments):
+        """Record the stay of each (booking, room) that was just assigned."""
+        from .versions import bump_version  # versions imports this module
+        cls.objects.bulk_create([
+            cls(room=room, booking=booking, start=booking.check_in_date, end=booking.check_out_date)
+            for booking, room in assignments
+        ])
+        bump_version('occupancy')
+
+    @classmethod
+    def end_stays(cls, booking_ids, on=None):
+        """Cut the stays of vacated bookings short: stays not started yet go, the others end on `on` (today)."""
+        from .versions import bump_version
+        on = on or timezone.localdate()
+        stays = cls.objects.filter(booking_id__in=booking_ids)
+        stays.filter(start__gte=on).delete()
+        stays.filter(end__gt=on).update(end=on)
+        bump_version('occupancy')
+
+    def __str__(self):
+        return f"Room {self.room_id}: {self.start} to {self.end}"
+
+
+class MessageQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Insert the messages and add the unread ones to their students' inbox counters."""
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            InboxCounter.add_unread(Counter(message.student_id for message in created if not message.is_read))
+        from .versions import bump_student_versions  # versions imports this module
+        bump_student_versions(message.student_id for message in created)
+        return created
+
+    def mark_read(self):
+        """
+        Mark the unread messages in this queryset as read, one UPDATE per student, and take
+        from each counter the rows its UPDATE changed: a concurrent call that read the same
+        messages as unread finds them read by then and changes nothing.
+        """
+        per_student = {}
+        with transaction.atomic(using=self.db):
+            unread = self.filter(is_read=False)
+            for student_id in unread.values_list('student_id', flat=True).distinct().order_by('student_id'):
+                per_student[student_id] = unread.filter(student_id=student_id).update(is_read=True)
+            InboxCounter.add_unread({student_id: -n for student_id, n in per_student.items()})
+            if any(per_student.values()):
+                from .versions import bump_student_versions
+                bump_student_versions(student_id for student_id, n in per_student.items() if n)
+        return sum(per_student.values())
+
+
 class Message(models.Model):
     student = models.ForeignKey('Student', on_delete=models.CASCADE)
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    is_read = models.BooleanField(default=False)
+
+    objects = MessageQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', '-timestamp', '-id'], name='hostel_message_inbox_idx'),  # Inbox pages
+        ]
+
+    def save(self, *args, **kwargs):
+        """Keep the inbox counters in step with new unread messages and is_read or student changes."""
+        deltas = Counter()
+        with transaction.atomic():
+            if not self._state.adding:
+                # Locked, so a concurrent mark_read() or save() can't move the counter in between
+                old = Message.objects.select_for_update().filter(pk=self.pk).values_list('student_id', 'is_read').first()
+                if old and not old[1]:
+                    deltas[old[0]] -= 1
+            if not self.is_read:
+                deltas[self.student_id] += 1
+            super().save(*args, **kwargs)
+            InboxCounter.add_unread(deltas)
+
+    def __str__(self):
+        return f"Message for {self.student.name} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
+
+
+class InboxCounter(models.Model):
+    """Denormalized count of a student's unread messages, so the navbar badge is one primary key lookup."""
+    student = models.OneToOneField('Student', on_delete=models.CASCADE, primary_key=True, related_name='inbox')
+    unread = models.IntegerField(default=0)
+
+    @classmethod
+    def add_unread(cls, deltas):
+        """Apply {student_id: change} to the counters with one INSERT and one UPDATE, whatever the size."""
+        deltas = {student_id: delta for student_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        cls.objects.bulk_create([cls(student_id=student_id) for student_id in deltas], ignore_conflicts=True)
+        students_by_delta = {}
+        for student_id, delta in deltas.items():
+            students_by_delta.setdefault(delta, []).append(student_id)
+        cls.objects.filter(student_id__in=deltas).update(unread=F('unread') + Case(
+            *(When(student_id__in=student_ids, then=Value(delta)) for delta, student_ids in students_by_delta.items()),
+            default=Value(0), output_field=models.IntegerField(),
+        ))
+
+    @classmethod
+    def unread_for(cls, student_id):
+        return cls.objects.filter(student_id=student_id).values_list('unread', flat=True).first() or 0
+
+    @classmethod
+    async def aunread_for(cls, student_id):
+        return await cls.objects.filter(student_id=student_id).values_list('unread', flat=True).afirst() or 0
+
+    def __str__(self):
+        return f"{self.student.name}: {self.unread} unread"
+
+
+class RentLedgerEntry(models.Model):
+    """
+    One rent charge or payment. Entries are insert-only: corrections are made by
+    posting another entry, so concurrent payments never overwrite each other.
+
+    Student.rent_due stays what the student owes, and the ledger records every change to
+    it: entries saved one at a time (payments, charges from the rent page) update
+    rent_due themselves, and whatever else changes it (a room assigned, a price change,
+    an import) posts the difference as a charge, negative for a credit. So a student's
+    RentBalance.balance always equals rent_due.
+    """
+    ENTRY_TYPE_CHOICES = [
+        ('charge', 'Charge'),
+        ('payment', 'Payment'),
+    ]
+
+    student = models.ForeignKey('Student', on_delete=models.CASCADE, related_name='ledger_entries')
+    entry_type = models.CharField(max_length=10, choices=ENTRY_TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'rent ledger entries'
+
+    def save(self, *args, **kwargs):
+        """Insert the entry and apply it to the student's balance in the same transaction."""
+        if self.pk is not None:
+            raise ValueError("Rent ledger entries are append-only and cannot be changed.")
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            RentBalance.apply(self.student_id, self.entry_type, self.amount)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Rent ledger entries are append-only and cannot be deleted.")
+
+    @classmethod
+    def opening(cls, student_id, rent_due, rent_paid):
+        """Unsaved entries that bring a new student's balance to rent_due, with rent_paid already paid."""
+        return [
+            cls(student_id=student_id, entry_type='charge', amount=rent_due + rent_paid, note='Opening balance'),
+            cls(student_id=student_id, entry_type='payment', amount=rent_paid, note='Opening balance'),
+        ]
+
+    @classmethod
+    def journal(cls, entries):
+        """
+        Insert entries whose effect on Student.rent_due and rent_paid has already been
+        written (a recalculated rent, an import) and add them to the balances, a few
+        queries however many there are. Entries of zero are left out.
+        """
+        entries = [entry for entry in entries if entry.amount]
+        if not entries:
+            return []
+        with transaction.atomic():
+            created = cls.objects.bulk_create(entries, batch_size=1000)
+            RentBalance.add(entries)
+            ledger_journaled.send(sender=cls, entries=created)
+        return created
+
+    def __str__(self):
+        return f"{self.get_entry_type_display()} of {self.amount} for {self.student.name}"
+
+
+class RentBalance(models.Model):
+    """Materialized per-student totals of the rent ledger, updated incrementally in the database."""
+    student = models.OneToOneField('Student', on_delete=models.CASCADE, primary_key=True, related_name='rent_balance')
+    total_charged = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # total_charged - total_paid
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['balance'], name='hostel_rentbalance_balance_idx'),
+        ]
+
+    @classmethod
+    def apply(cls, student_id, entry_type, amount):
+        """Add one ledger entry to the student's totals with database-side arithmetic."""
+        if entry_type == 'charge':
+            changes = {'total_charged': F('total_charged') + amount, 'balance': F('balance') + amount}
+            Student.objects.filter(pk=student_id).update(rent_due=F('rent_due') + amount)
+        else:
+            changes = {'total_paid': F('total_paid') + amount, 'balance': F('balance') - amount}
+            # Keep the per-room rent fields on Student in step with payments
+            Student.objects.filter(pk=student_id).update(
+                rent_paid=F('rent_paid') + amount, rent_due=F('rent_due') - amount
+            )
+        student_changed.send(sender=Student, student_ids=[student_id])
+        changes['updated_at'] = timezone.now()
+        if cls.objects.filter(student_id=student_id).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(student_id=student_id)
+        except IntegrityError:
+            pass  # Another writer created the row first
+        cls.objects.filter(student_id=student_id).update(**changes)
+
+    @classmethod
+    def add(cls, entries):
+        """Add ledger entries to the totals of their students, without touching Student."""
+        charged, paid = Counter(), Counter()
+        for entry in entries:
+            (charged if entry.entry_type == 'charge' else paid)[entry.student_id] += entry.amount
+        student_ids = list(charged.keys() | paid.keys())
+        cls.objects.bulk_create([cls(student_id=student_id) for student_id in student_ids], ignore_conflicts=True)
+        for start in range(0, len(student_ids), 500):  # Keeps each CASE a reasonable size
+            batch = student_ids[start:start + 500]
+            charges = Case(*(When(student_id=student_id, then=Value(charged[student_id])) for student_id in batch),
+                           default=Value(Decimal(0)), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+            payments = Case(*(When(student_id=student_id, then=Value(paid[student_id])) for student_id in batch),
+                            default=Value(Decimal(0)), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+            cls.objects.filter(student_id__in=batch).update(
+                total_charged=F('total_charged') + charges, total_paid=F('total_paid') + payments,
+                balance=F('balance') + charges - payments, updated_at=timezone.now(),
+            )
+
+    def __str__(self):
+        return f"{self.student.name}: {self.balance}"
+
+
+class RentReminderRun(models.Model):
+    """Idempotency marker for one rent reminder cycle, so reruns never send duplicates."""
+    cycle = models.DateField(unique=True)  # Due date the reminders are for
+    last_student_id = models.BigIntegerField(default=0)  # Reminders are sent in student id order; resume after this
+    sent = models.IntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Rent reminders for {self.cycle} ({self.sent} sent)"
+
+
+
+class DashboardSnapshot(models.Model):
+    """
+    Hostel-wide figures for one day. Today's row is kept current by hostel.dashboard as
+    rooms, bookings and rent change; earlier rows are the history behind the trend charts.
+    """
+    day = models.DateField(unique=True)
+    rooms = models.IntegerField(default=0)
+    beds_total = models.IntegerField(default=0)
+    beds_free = models.IntegerField(default=0)
+    pending_bookings = models.IntegerField(default=0)
+    rent_expected = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Everything charged so far
+    rent_collected = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Everything paid so far
+    rebuilt_at = models.DateTimeField(null=True, blank=True)  # Last full recount
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def beds_taken(self):
+        return self.beds_total - self.beds_free
+
+    @property
+    def occupancy(self):
+        """Share of beds taken, as a percentage."""
+        return round(100 * self.beds_taken / self.beds_total, 1) if self.beds_total else 0
+
+    @property
+    def rent_outstanding(self):
+        return self.rent_expected - self.rent_collected
+
+    @property
+    def collection_rate(self):
+        """Share of charged rent that has been paid, as a percentage."""
+        return round(100 * self.rent_collected / self.rent_expected, 1) if self.rent_expected else 0
+
+    def __str__(self):
+        return f"Dashboard for {self.day}"
+
+
+class OccupancySnapshot(models.Model):
+    """Rooms and beds of one room type on one day, next to that day's DashboardSnapshot."""
+    day = models.DateField()
+    room_type = models.CharField(max_length=20, choices=Room.ROOM_TYPE_CHOICES)
+    rooms = models.IntegerField(default=0)
+    beds_total = models.IntegerField(default=0)
+    beds_free = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'room_type'], name='hostel_occupancy_day_type_uniq'),
+        ]
+
+    @property
+    def beds_taken(self):
+        return self.beds_total - self.beds_free
+
+    @property
+    def occupancy(self):
+        return round(100 * self.beds_taken / self.beds_total, 1) if self.beds_total else 0
+
+    def __str__(self):
+        return f"{self.get_room_type_display()} on {self.day}"
+
+
+class Task(models.Model):
+    """A queued call of a background task (see hostel.queue)."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('dead', 'Dead'),  # Out of attempts; kept for an admin to inspect and requeue
+    ]
+
+    name = models.CharField(max_length=200)  # Dotted path of the @task function
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now)  # Not before; pushed back after a failed attempt
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)  # Worker holding the lease
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    result = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='hostel_task_due_idx'),  # Claiming due tasks
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+
+
+class LiveEvent(models.Model):
+    """A live update on its way to the open streams of every process (see hostel.live.DatabaseBackend)."""
+    channel = models.CharField(max_length=50)
+    name = models.CharField(max_length=20)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     def __str__(self):
-        return f"Message for {self.student.name} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.name} on {self.channel} at {self.created_at}"
@@ -0,0 +1,37 @@
+"""
+Student notifications, sent as background tasks so requests don't wait for them.
+
+Assigning rooms only queues one task however many students it affects; the task writes
+the messages (and is where emails or SMS would go).
+"""
+import io
+
+from django.core.management import call_command
+
+from .models import Message, Room, RoomBooking
+from .queue import task
+
+
+@task
+def send_booking_messages(assigned=(), unmatched=()):
+    """
+    Tell students which room they got, for [booking id, room id] pairs in assigned,
+    or that they are on the waitlist, for the booking ids in unmatched.
+    """
+    bookings = RoomBooking.objects.select_related('student').in_bulk(
+        [booking_id for booking_id, _ in assigned] + list(unmatched))
+    rooms = Room.objects.in_bulk([room_id for _, room_id in assigned])
+    messages = [bookings[booking_id].assignment_message(rooms[room_id])
+                for booking_id, room_id in assigned if booking_id in bookings and room_id in rooms]
+    messages += [bookings[booking_id].unavailability_message() for booking_id in unmatched if booking_id in bookings]
+    Message.objects.bulk_create(messages)
+    return {'sent': len(messages)}
+
+
+@task(atomic=False)  # The command commits each batch and resumes where a failed run stopped
+def send_rent_reminders(date=None, due_day=None):
+    """Run the send_rent_reminders command; its report is kept as the task's result."""
+    out = io.StringIO()
+    options = {key: value for key, value in (('date', date), ('due_day', due_day)) if value is not None}
+    call_command('send_rent_reminders', stdout=out, **options)
+    return {'output': out.getvalue().strip()}
@@ -0,0 +1,175 @@
+"""
+Date-aware bed occupancy.
+
+Every assigned booking holds a bed from its check-in date up to its check-out date
+(a BedOccupancy row). OccupancyIndex loads the rooms and the stays that haven't ended
+into memory and answers "how many beds of type X are free from A to B" and "what is
+the earliest date a bed of type X is free for N nights" without touching the database.
+
+The index works on gaps. For a room and each j up to its capacity, a j-gap is a
+period in which fewer than j of its beds are taken. A room with at most m beds taken
+between A and B has that range inside exactly capacity - m of its gaps, one for each
+j above m, so the free beds of a room type are the number of its rooms' gaps that
+contain [A, B). The gaps of each room type sit in a merge-sort tree (sorted by start,
+each node holding the sorted ends below it), which counts them in O(log² n) however
+many rooms there are. The capacity-gaps, when a room has at least one bed free, answer
+the earliest-date question with a bisection. Each process keeps one index and rebuilds
+it when the 'occupancy' or 'rooms' data version moves.
+"""
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import BedOccupancy, Room
+from .versions import bump_version, get_versions
+
+
+def room_gaps(capacity, stays):
+    """
+    Return (j-gaps, capacity-gaps) of one room: (start, end) of every period in which
+    fewer than j of its beds are taken, for each j from 1 to capacity.
+    """
+    taken, steps = 0, [(date.min, 0)]  # Beds taken from each date until the next
+    for day, change in sorted([(start, 1) for start, _ in stays] + [(end, -1) for _, end in stays]):
+        taken += change  # Stays ending on a day come first, so a bed can be handed over the same day
+        if steps[-1][0] == day:
+            steps[-1] = (day, taken)
+        else:
+            steps.append((day, taken))
+
+    gaps = []
+    for level in range(1, capacity + 1):
+        first = len(gaps)
+        gap_start = None
+        for day, taken in steps:
+            if taken < level and gap_start is None:
+                gap_start = day
+            elif taken >= level and gap_start is not None:
+                gaps.append((gap_start, day))
+                gap_start = None
+        if gap_start is not None:
+            gaps.append((gap_start, date.max))
+    return gaps, gaps[first:] if capacity else []
+
+
+class GapTree:
+    """Counts the gaps that contain a date range."""
+
+    def __init__(self, gaps):
+        gaps = sorted(gaps)
+        self.size = len(gaps)
+        self.starts = [start for start, _ in gaps]
+        # Leaves hold the end of one gap each, every parent the sorted ends of its two children
+        self.ends = [[] for _ in range(self.size)] + [[end] for _, end in gaps]
+        for node in range(self.size - 1, 0, -1):
+            self.ends[node] = sorted(self.ends[2 * node] + self.ends[2 * node + 1])
+
+    def count(self, start, end):
+        """Gaps that begin on or before start and end on or after end."""
+        total = 0
+        low, high = self.size, self.size + bisect_right(self.starts, start)
+        while low < high:
+            if low & 1:
+                total += len(self.ends[low]) - bisect_left(self.ends[low], end)
+                low += 1
+            if high & 1:
+                high -= 1
+                total += len(self.ends[high]) - bisect_left(self.ends[high], end)
+            low >>= 1
+            high >>= 1
+        return total
+
+
+class OccupancyIndex:
+    """Free-bed gaps of every room, indexed by room type."""
+
+    def __init__(self, rooms, stays):
+        """rooms: (id, room_type, capacity) rows; stays: (room_id, start, end) rows."""
+        stays_by_room = defaultdict(list)
+        for room_id, start, end in stays:
+            stays_by_room[room_id].append((start, end))
+        gaps, windows = defaultdict(list), defaultdict(list)
+        for room_id, room_type, capacity in rooms:
+            room_type_gaps, room_windows = room_gaps(capacity, stays_by_room.get(room_id, []))
+            gaps[room_type].extend(room_type_gaps)
+            windows[room_type].extend(room_windows)
+
+        self.trees = {room_type: GapTree(type_gaps) for room_type, type_gaps in gaps.items()}
+        self.windows = {}  # room_type -> (starts, latest end so far, [(start, end)]) of gaps with a bed free
+        for room_type, type_windows in windows.items():
+            type_windows.sort()
+            self.windows[room_type] = (
+                [start for start, _ in type_windows],
+                list(accumulate((end for _, end in type_windows), max)),
+                type_windows,
+            )
+        self._long_windows = {}  # (room_type, nights) -> sorted starts of windows at least that long
+
+    def free_beds(self, room_type, start, end):
+        """Beds in rooms of room_type that are free for the whole of [start, end)."""
+        tree = self.trees.get(room_type)
+        return tree.count(start, end) if tree else 0
+
+    def earliest_free(self, room_type, start, nights):
+        """First date on or after start with a bed of room_type free for nights, or None if there are no such beds."""
+        if room_type not in self.windows:
+            return None
+        starts, reach, windows = self.windows[room_type]
+        stay = timedelta(days=nights)
+        # A window already open on `start` that lasts long enough
+        opened = bisect_right(starts, start)
+        if opened and reach[opened - 1] >= start + stay:
+            return start
+        # Otherwise the first window opening later that is long enough
+        key = (room_type, nights)
+        if key not in self._long_windows:
+            self._long_windows[key] = [window_start for window_start, window_end in windows
+                                       if window_end - window_start >= stay]
+        long_starts = self._long_windows[key]
+        later = bisect_right(long_starts, start)
+        return long_starts[later] if later < len(long_starts) else None
+
+
+_index = None  # (data versions, OccupancyIndex)
+
+
+def build_index(on=None):
+    """Load the rooms and the stays that end after `on` (today) into a new OccupancyIndex."""
+    on = on or timezone.localdate()
+    return OccupancyIndex(
+        Room.objects.values_list('id', 'room_type', 'capacity'),
+        BedOccupancy.objects.filter(end__gt=on).values_list('room_id', 'start', 'end'),
+    )
+
+
+def current_index():
+    """This process's index, rebuilt if rooms or stays changed since it was built."""
+    global _index
+    versions = get_versions('occupancy', 'rooms')
+    if _index is None or _index[0] != versions:
+        _index = (versions, build_index())
+    return _index[1]
+
+
+def free_beds(room_types, start, end):
+    """{room_type: beds free for the whole of [start, end)}."""
+    index = current_index()
+    return {room_type: index.free_beds(room_type, start, end) for room_type in room_types}
+
+
+def earliest_free(room_types, start, nights):
+    """Earliest date on or after start that any of room_types has a bed free for nights, or None."""
+    index = current_index()
+    dates = [index.earliest_free(room_type, start, nights) for room_type in room_types]
+    return min((date for date in dates if date is not None), default=None)
+
+
+@receiver(post_save, sender=BedOccupancy)
+@receiver(post_delete, sender=BedOccupancy)
+def stay_changed(sender, **kwargs):
+    bump_version('occupancy')
@@ -0,0 +1,126 @@
+"""
+Keyset (seek) pagination for the custom admin listings.
+
+Instead of an OFFSET, each page continues from the sort key of the row at its edge,
+so every page is the same index seek however deep into the table it is. Cursors are
+opaque URL-safe strings holding that sort key.
+"""
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    """One page of rows plus the cursors for the pages either side of it."""
+
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(direction, values):
+    data = json.dumps([direction, values], default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (direction, values), or None if the cursor is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        direction, values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('next', 'previous') or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _sort_key(row, ordering):
+    return [getattr(row, field.lstrip('-')) for field in ordering]
+
+
+def _seek_filter(ordering, values):
+    """Rows strictly after values in ordering: (a > x) OR (a = x AND b > y) OR ..."""
+    clauses = []
+    for i, field in enumerate(ordering):
+        equal = {previous.lstrip('-'): value for previous, value in zip(ordering[:i], values[:i])}
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        clauses.append(Q(**equal, **{f'{field.lstrip("-")}__{lookup}': values[i]}))
+    return reduce(or_, clauses)
+
+
+def _keyset_query(queryset, ordering, cursor, page_size):
+    """Return (sliced queryset, ordering, direction, seek values) for a page request."""
+    ordering = list(ordering)
+    if ordering[-1].lstrip('-') not in ('pk', 'id'):
+        ordering.append('-pk' if ordering[-1].startswith('-') else 'pk')
+
+    decoded = decode_cursor(cursor)
+    if decoded and len(decoded[1]) != len(ordering):
+        decoded = None
+    direction, values = decoded or ('next', None)
+
+    # Walking backwards is the same seek with the ordering flipped
+    query_ordering = ordering if direction == 'next' else [_flip(field) for field in ordering]
+    queryset = queryset.order_by(*query_ordering)
+    if values is not None:
+        queryset = queryset.filter(_seek_filter(query_ordering, values))
+    return queryset[:page_size + 1], ordering, direction, values
+
+
+def _keyset_page(rows, ordering, direction, values, page_size):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == 'previous':
+        rows.reverse()
+        has_next, has_previous = values is not None, has_more
+    else:
+        has_next, has_previous = has_more, values is not None
+
+    if not rows:
+        return KeysetPage(rows)
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor('next', _sort_key(rows[-1], ordering)) if has_next else None,
+        previous_cursor=encode_cursor('previous', _sort_key(rows[0], ordering)) if has_previous else None,
+    )
+
+
+def keyset_paginate(queryset, ordering, cursor=None, page_size=50):
+    """
+    Return the KeysetPage of queryset that cursor points at, sorted by ordering.
+
+    ordering should be non-null, indexed fields; the primary key is appended as a
+    tie-breaker so the sort is total. A malformed cursor returns the first page.
+    """
+    queryset, ordering, direction, values = _keyset_query(queryset, ordering, cursor, page_size)
+    return _keyset_page(list(queryset), ordering, direction, values, page_size)
+
+
+async def akeyset_paginate(queryset, ordering, cursor=None, page_size=50):
+    """Async version of keyset_paginate(), for async views."""
+    queryset, ordering, direction, values = _keyset_query(queryset, ordering, cursor, page_size)
+    return _keyset_page([row async for row in queryset], ordering, direction, values, page_size)
@@ -0,0 +1,41 @@
+"""
+Keeps prices consistent when the RoomType catalogue changes.
+
+A saved or deleted RoomType or RoomRate moves the 'room_types' data version once the
+transaction commits, which makes every process reload its in-memory catalogue and
+every price fragment miss, drops the availability snapshot, and charges the students
+in rooms of that type the change in their room's price with one UPDATE, posting each
+change to the rent ledger. Rates that take effect on a later date are picked up by
+the nightly `recalculate_rent` command.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .availability import invalidate_availability
+from .models import RoomRate, RoomType, Student
+from .versions import bump_version
+
+
+def publish_prices():
+    """Once the transaction commits, make every process and cached fragment pick up the current prices."""
+    bump_version('room_types')
+    invalidate_availability()
+
+
+def prices_changed(room_types):
+    """Publish a catalogue change and recalculate rent due for students in rooms of room_types."""
+    publish_prices()
+    transaction.on_commit(lambda: Student.recalculate_rent_due(room_types))
+
+
+@receiver(post_save, sender=RoomType)
+@receiver(post_delete, sender=RoomType)
+def room_type_changed(sender, instance, **kwargs):
+    prices_changed([instance.code])
+
+
+@receiver(post_save, sender=RoomRate)
+@receiver(post_delete, sender=RoomRate)
+def room_rate_changed(sender, instance, **kwargs):
+    prices_changed([instance.room_type_id])
@@ -0,0 +1,132 @@
+"""
+Per-request SQL statistics and query budgets.
+
+Every database connection gets one execute wrapper when it is opened. It reports
+each query to the QueryRecorders active in the current context, which count the
+queries and add up their SQL time, and note how often each query shape (its
+fingerprint) repeats, which is how N+1 loops show up. The recorders live in a
+context variable rather than on the connection: Django keeps a connection per
+thread, and async views run their ORM calls on sync_to_async's worker threads,
+which inherit the caller's context but not its connection.
+
+QueryStatsMiddleware reports those figures for every request; query_budget() and
+assert_query_budget() turn the budgets in settings.QUERY_BUDGETS into test assertions.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.urls import reverse
+
+_IN_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_SPACES = re.compile(r'\s+')
+
+_recorders = ContextVar('query_recorders', default=())
+
+
+def fingerprint(sql):
+    """Reduce a query to its shape, so the same query with other parameters compares equal."""
+    sql = _LITERAL.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _record(execute, sql, params, many, context):
+    recorders = _recorders.get()
+    if not recorders:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - start
+        for recorder in recorders:
+            recorder.queries.append((sql, seconds))
+
+
+def install(connection):
+    """Add the recording execute wrapper to a connection, once."""
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install(connection)
+
+
+class QueryRecorder:
+    """
+    Context manager that records every query run in the current context, on any
+    connection and in any thread the context is carried into, such as the worker
+    threads behind sync_to_async.
+    """
+
+    def __init__(self):
+        self.queries = []  # (sql, seconds)
+        self._token = None
+
+    def __enter__(self):
+        # Connections opened before this module was imported never sent connection_created.
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+        self._token = _recorders.set(_recorders.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _recorders.reset(self._token)
+        return False
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(seconds for _, seconds in self.queries)
+
+    def duplicates(self):
+        """Return {fingerprint: times run} for every query shape that ran more than once."""
+        counts = Counter(fingerprint(sql) for sql, _ in self.queries)
+        return {shape: times for shape, times in counts.items() if times > 1}
+
+
+def budget_for(url_name):
+    """Return the query budget configured for a URL name, or None if it has none."""
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+
+
+@contextmanager
+def query_budget(url_name, budget=None):
+    """Fail with QueryBudgetExceeded if the block runs more queries than the URL name's budget."""
+    budget = budget if budget is not None else budget_for(url_name)
+    if budget is None:
+        raise ValueError(f"No query budget configured for '{url_name}'.")
+    with QueryRecorder() as recorder:
+        yield recorder
+    if recorder.count > budget:
+        lines = '\n'.join(f'  {sql}' for sql, _ in recorder.queries)
+        repeated = '\n'.join(f'  {times}x {shape}' for shape, times in recorder.duplicates().items())
+        raise QueryBudgetExceeded(
+            f"'{url_name}' ran {recorder.count} queries, over its budget of {budget}:\n{lines}"
+            + (f"\nRepeated queries:\n{repeated}" if repeated else '')
+        )
+
+
+def assert_query_budget(client, url_name, budget=None, args=None, kwargs=None, method='get', **request_kwargs):
+    """Request a URL by name with a test client and fail if the view goes over its query budget."""
+    url = reverse(url_name, args=args, kwargs=kwargs)
+    with query_budget(url_name, budget):
+        response = getattr(client, method)(url, **request_kwargs)
+    return response
@@ -0,0 +1,204 @@
+"""
+Database-backed background tasks, with no broker to run.
+
+A function decorated with @task gets a .delay(**kwargs) that stores a Task row instead
+of calling it. The row is written in the caller's transaction, so a task only becomes
+visible to workers if that transaction commits. The `run_tasks` command starts a
+worker: a loop that claims due tasks in batches and runs them on a thread pool. A task
+that raises is retried after an exponential backoff with jitter until it has used its
+attempts, then kept as dead for an admin to look at and requeue. While a task runs its
+worker renews the lease every third of settings.TASK_LEASE, however long the task
+takes; tasks whose worker died mid-run are handed out again once their lease expires,
+so delivery is at least once: tasks should be safe to run twice.
+
+With settings.TASKS_EAGER the tasks run inline after the transaction commits instead,
+which needs no worker (development and tests).
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger('hostel.queue')
+
+
+def task(func=None, *, max_attempts=5, atomic=True):
+    """
+    Make a function runnable in the background with func.delay(**kwargs). The keyword
+    arguments must be JSON-serialisable, and so must the return value, which is kept as
+    the task's result. With atomic=True each attempt runs in one transaction, so a failed
+    attempt leaves nothing behind.
+    """
+    def decorate(func):
+        func.task_name = f'{func.__module__}.{func.__qualname__}'
+        func.task_options = {'max_attempts': max_attempts, 'atomic': atomic}
+        func.delay = lambda **kwargs: enqueue(func, kwargs)
+        return func
+    return decorate(func) if func else decorate
+
+
+def enqueue(func, kwargs, run_at=None):
+    """Queue a call of a @task function. Returns the Task, or None when tasks run eagerly."""
+    if getattr(settings, 'TASKS_EAGER', False):
+        transaction.on_commit(lambda: func(**kwargs))
+        return None
+    return Task.objects.create(name=func.task_name, kwargs=kwargs, run_at=run_at or timezone.now(),
+                               max_attempts=func.task_options['max_attempts'])
+
+
+def backoff(attempt):
+    """Delay before retrying after the given failed attempt: doubling each time, capped, with jitter."""
+    base = getattr(settings, 'TASK_RETRY_BACKOFF', 10)
+    cap = getattr(settings, 'TASK_RETRY_BACKOFF_MAX', 3600)
+    return timedelta(seconds=min(cap, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1))
+
+
+def requeue_expired():
+    """Hand out again the tasks whose worker stopped renewing their lease; bury them if they were out of attempts."""
+    expired = Task.objects.filter(status='running', locked_until__lt=timezone.now())
+    expired.filter(attempts__gte=F('max_attempts')).update(
+        status='dead', last_error='Worker stopped while running the task.', locked_until=None,
+        finished_at=timezone.now())
+    return expired.update(status='queued', locked_until=None)
+
+
+def _lease_end():
+    return timezone.now() + timedelta(seconds=getattr(settings, 'TASK_LEASE', 300))
+
+
+def claim(worker, limit):
+    """Lease up to limit due tasks to worker, oldest first, and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        # On MySQL skip_locked lets several workers claim at once without waiting on each
+        # other. SQLite has no row locks and ignores select_for_update; there the IMMEDIATE
+        # transaction takes the database's write lock, so workers claim one after another.
+        ids = list(Task.objects.select_for_update(skip_locked=True)
+                   .filter(status='queued', run_at__lte=now).order_by('run_at', 'pk')
+                   .values_list('pk', flat=True)[:limit])
+        if not ids:
+            return []
+        Task.objects.filter(pk__in=ids).update(
+            status='running', locked_by=worker, attempts=F('attempts') + 1, locked_until=_lease_end())
+    return list(Task.objects.filter(pk__in=ids).order_by('run_at', 'pk'))
+
+
+def renew_leases(worker, ids):
+    """Extend worker's leases on the tasks in ids that it is still running."""
+    if not ids:
+        return 0
+    return Task.objects.filter(pk__in=ids, status='running', locked_by=worker).update(locked_until=_lease_end())
+
+
+def run_task(task):
+    """Run one claimed task and record how it went. Returns the task's new status."""
+    ours = Task.objects.filter(pk=task.pk, status='running', locked_by=task.locked_by)
+    try:
+        func = import_string(task.name)
+        if func.task_options['atomic']:
+            with transaction.atomic():
+                result = func(**task.kwargs)
+        else:
+            result = func(**task.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if task.attempts >= task.max_attempts:
+            logger.error('task=%s id=%s dead after %d attempts\n%s', task.name, task.pk, task.attempts, error)
+            ours.update(status='dead', last_error=error, locked_until=None, finished_at=timezone.now())
+            return 'dead'
+        delay = backoff(task.attempts)
+        logger.warning('task=%s id=%s attempt %d failed, retrying in %ds\n%s',
+                       task.name, task.pk, task.attempts, delay.total_seconds(), error)
+        ours.update(status='queued', last_error=error, locked_until=None, run_at=timezone.now() + delay)
+        return 'queued'
+    ours.update(status='done', result=result, last_error='', locked_until=None, finished_at=timezone.now())
+    return 'done'
+
+
+def purge_finished(days):
+    """Delete tasks that finished successfully more than days ago. Dead tasks are kept."""
+    return Task.objects.filter(status='done', finished_at__lt=timezone.now() - timedelta(days=days)).delete()[0]
+
+
+class Worker:
+    """Claims due tasks and runs them on a pool of threads until stopped."""
+
+    def __init__(self, threads=4, poll_interval=1.0, keep_days=7):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.keep_days = keep_days
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.counts = {'done': 0, 'queued': 0, 'dead': 0}
+        self._running = set()  # Ids of the tasks on the pool's threads
+        self._lock = threading.Lock()
+
+    def _run(self, task):
+        close_old_connections()  # As around a request: drop connections that are broken or too old
+        with self._lock:
+            self._running.add(task.pk)
+        try:
+            return run_task(task)
+        finally:
+            with self._lock:
+                self._running.discard(task.pk)
+            close_old_connections()
+
+    def _heartbeat(self, finished):
+        """Renew the leases of the running tasks until finished is set, so long tasks aren't handed out twice."""
+        interval = getattr(settings, 'TASK_LEASE', 300) / 3
+        while not finished.wait(interval):
+            with self._lock:
+                ids = list(self._running)
+            try:
+                renew_leases(self.name, ids)
+            except Exception:
+                logger.exception('worker=%s could not renew its task leases', self.name)
+            finally:
+                close_old_connections()
+        connection.close()
+
+    def run(self, once=False):
+        """Work until stop() is called, or with once=True until no task is due."""
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(finished,), name='hostel-task-heartbeat')
+        heartbeat.start()
+        try:
+            return self._work(once)
+        finally:
+            finished.set()
+            heartbeat.join()
+
+    def _work(self, once):
+        purged_at = None
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='hostel-task') as pool:
+            while not self.stopping.is_set():
+                if purged_at is None or timezone.now() - purged_at > timedelta(hours=1):
+                    purge_finished(self.keep_days)
+                    purged_at = timezone.now()
+                requeue_expired()
+                tasks = claim(self.name, self.threads)
+                if not tasks:
+                    if once:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                # One batch at a time, so a worker never holds leases on more tasks than it has threads
+                for status in pool.map(self._run, tasks):
+                    self.counts[status] += 1
+        return self.counts
+
+    def stop(self):
+        self.stopping.set()
@@ -0,0 +1,86 @@
+"""
+Rate limiting for the public form endpoints, counted in the cache.
+
+settings.RATE_LIMITS gives each route its limits as (scope, requests, seconds):
+scope 'ip' counts by client address, any other scope by that POST field (the
+username, for instance), so one address can't flood a form and nobody can try
+passwords for one account from many addresses. Each limit is a sliding window
+approximated with two fixed windows: the previous window's count, weighted by how
+much of it still overlaps the sliding window, plus the current one's. Counting is a
+cache.incr, which is atomic in every backend, and a request over any limit gets a 429
+before the view runs, so no form is validated and no password is hashed for it.
+"""
+import hashlib
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+KEY = 'hostel:ratelimit:%s:%s:%s:%d:%d'  # route, scope, hashed value, window seconds, window number
+
+
+def client_ip(request):
+    """The client's address, read from X-Forwarded-For when RATE_LIMIT_PROXIES proxies add to it."""
+    proxies = getattr(settings, 'RATE_LIMIT_PROXIES', 0)
+    forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]  # Addresses further left were sent by the client and can be forged
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _hit(key, seconds):
+    cache.add(key, 0, seconds * 2)  # Kept through the next window, which weighs it
+    try:
+        return cache.incr(key)
+    except ValueError:  # Evicted between add and incr
+        cache.add(key, 1, seconds * 2)
+        return 1
+
+
+def check(route, request, now=None):
+    """
+    Count a request against route's limits. Returns 0 if it is allowed, otherwise the
+    seconds to wait before the busiest of the exceeded limits lets it through.
+    """
+    now = now or time.time()
+    counts = []
+    for scope, limit, seconds in settings.RATE_LIMITS.get(route, ()):
+        value = client_ip(request) if scope == 'ip' else request.POST.get(scope, '').strip().lower()
+        if not value:
+            continue
+        digest = hashlib.sha256(value.encode()).hexdigest()[:32]  # Safe and bounded in any cache's keys
+        window, elapsed = divmod(now, seconds)
+        current = _hit(KEY % (route, scope, digest, seconds, window), seconds)
+        counts.append((KEY % (route, scope, digest, seconds, window - 1), current, limit, seconds, elapsed))
+
+    previous = cache.get_many([key for key, *_ in counts])
+    wait = 0
+    for key, current, limit, seconds, elapsed in counts:
+        before = previous.get(key, 0)
+        if before * (1 - elapsed / seconds) + current <= limit:
+            continue
+        if current >= limit:
+            until = seconds  # The current window alone is full: wait for the next one
+        else:
+            until = seconds * (1 - (limit - current) / before)  # When the previous window has faded enough
+        wait = max(wait, math.ceil(until - elapsed), 1)
+    return wait
+
+
+def rate_limited(route):
+    """Turn away POSTs to the decorated view that go over settings.RATE_LIMITS[route], with a 429."""
+    def decorate(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method == 'POST':
+                wait = check(route, request)
+                if wait:
+                    response = render(request, 'student/rate_limited.html', {'wait': wait}, status=429)
+                    response['Retry-After'] = str(wait)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorate
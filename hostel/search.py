@@ -0,0 +1,156 @@
+"""
+Full-text search over feedback, contact inquiries and student messages.
+
+On SQLite the three text columns feed one FTS5 table, hostel_search, that triggers
+keep up to date on every insert, update and delete, so bulk_create and queryset
+updates are covered too. An entry's rowid encodes its source row (id * 4 + kind
+code), which makes each trigger a primary-key write. On MySQL each column has an
+InnoDB FULLTEXT index, which InnoDB maintains itself. Both are created by migration
+0020. A search reads only the index entries for its words, ranks them by relevance
+(bm25 or MATCH ... AGAINST) and returns a capped number of hits, so it doesn't slow
+down as the tables grow. Other backends fall back to icontains.
+"""
+import re
+from collections import namedtuple
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ContactInquiry, Feedback, Message
+
+# kind -> (model, text column, date column, code in the SQLite rowid)
+SOURCES = {
+    'feedback': (Feedback, 'message', 'timestamp', 1),
+    'inquiry': (ContactInquiry, 'message', 'submitted_at', 2),
+    'message': (Message, 'content', 'timestamp', 3),
+}
+MAX_TERMS = 8
+_WORD = re.compile(r'\w+')
+
+Hit = namedtuple('Hit', 'kind object_id score excerpt created')
+
+
+def terms(query):
+    """The words of a search query, lowercased; punctuation and search operators are ignored."""
+    return _WORD.findall(query.lower())[:MAX_TERMS]
+
+
+def search(query, kinds=None, inquiry_type=None, since=None, until=None, limit=None):
+    """
+    Return the hits for every word of query, best first. kinds limits the sources
+    ('feedback', 'inquiry', 'message'); inquiry_type only makes sense for inquiries
+    and drops the other kinds; since and until bound the date (until is exclusive).
+    """
+    words = terms(query)
+    kinds = [kind for kind in (kinds or SOURCES) if kind in SOURCES and (not inquiry_type or kind == 'inquiry')]
+    if not words or not kinds:
+        return []
+    limit = limit or getattr(settings, 'SEARCH_RESULT_LIMIT', 200)
+    backend = {'sqlite': _search_sqlite, 'mysql': _search_mysql}.get(connection.vendor, _search_like)
+    return backend(words, kinds, inquiry_type, since, until, limit)
+
+
+def search_ids(kind, query, **filters):
+    """Primary keys of the best matches of one kind, for filtering a queryset."""
+    return [hit.object_id for hit in search(query, kinds=[kind], **filters)]
+
+
+def _search_sqlite(words, kinds, inquiry_type, since, until, limit):
+    sql = ["SELECT rowid, bm25(hostel_search), snippet(hostel_search, 0, '', '', '…', 24), created "
+           "FROM hostel_search WHERE hostel_search MATCH %s"]
+    params = [' '.join(f'"{word}"' for word in words)]  # Quoted, so every word is a plain term
+    if len(kinds) < len(SOURCES):
+        sql.append(f"AND rowid %% 4 IN ({', '.join(['%s'] * len(kinds))})")
+        params += [SOURCES[kind][3] for kind in kinds]
+    if inquiry_type:
+        sql.append('AND inquiry_type = %s')
+        params.append(inquiry_type)
+    if since:
+        sql.append('AND created >= %s')
+        params.append(connection.ops.adapt_datetimefield_value(since))
+    if until:
+        sql.append('AND created < %s')
+        params.append(connection.ops.adapt_datetimefield_value(until))
+    sql.append('ORDER BY bm25(hostel_search) LIMIT %s')
+    params.append(limit)
+
+    kind_for_code = {code: kind for kind, (_, _, _, code) in SOURCES.items()}
+    with connection.cursor() as cursor:
+        cursor.execute(' '.join(sql), params)
+        return [Hit(kind_for_code[rowid % 4], rowid // 4, -rank, excerpt, _stored_datetime(created))
+                for rowid, rank, excerpt, created in cursor.fetchall()]
+
+
+def _stored_datetime(value):
+    value = parse_datetime(value) if isinstance(value, str) else value
+    if value is not None and settings.USE_TZ and timezone.is_naive(value):
+        value = value.replace(tzinfo=dt_timezone.utc)  # SQLite stores UTC without an offset
+    return value
+
+
+def _search_mysql(words, kinds, inquiry_type, since, until, limit):
+    against = ' '.join(f'+{word}' for word in words)  # Boolean mode: every word required
+    hits = []
+    with connection.cursor() as cursor:
+        for kind in kinds:
+            model, text_column, date_column, _ = SOURCES[kind]
+            text, date = connection.ops.quote_name(text_column), connection.ops.quote_name(date_column)
+            match = f'MATCH({text}) AGAINST (%s IN BOOLEAN MODE)'
+            sql = [f'SELECT id, {match}, {text}, {date} FROM {connection.ops.quote_name(model._meta.db_table)} '
+                   f'WHERE {match}']
+            params = [against, against]
+            if inquiry_type:
+                sql.append('AND inquiry_type = %s')
+                params.append(inquiry_type)
+            if since:
+                sql.append(f'AND {date} >= %s')
+                params.append(since)
+            if until:
+                sql.append(f'AND {date} < %s')
+                params.append(until)
+            sql.append('ORDER BY 2 DESC LIMIT %s')
+            params.append(limit)
+            cursor.execute(' '.join(sql), params)
+            hits += [Hit(kind, pk, score, _excerpt(body, words), created)
+                     for pk, score, body, created in cursor.fetchall()]
+    return sorted(hits, key=lambda hit: hit.score, reverse=True)[:limit]
+
+
+def _search_like(words, kinds, inquiry_type, since, until, limit):
+    hits = []
+    for kind in kinds:
+        model, text_column, date_column, _ = SOURCES[kind]
+        rows = model.objects.all()
+        for word in words:
+            rows = rows.filter(**{f'{text_column}__icontains': word})
+        if inquiry_type:
+            rows = rows.filter(inquiry_type=inquiry_type)
+        if since:
+            rows = rows.filter(**{f'{date_column}__gte': since})
+        if until:
+            rows = rows.filter(**{f'{date_column}__lt': until})
+        rows = rows.order_by(f'-{date_column}').values_list('pk', text_column, date_column)[:limit]
+        hits += [Hit(kind, pk, 0, _excerpt(body, words), created) for pk, body, created in rows]
+    return sorted(hits, key=lambda hit: hit.created, reverse=True)[:limit]
+
+
+def _excerpt(text, words, width=160):
+    """About width characters of text around the first search word in it."""
+    lowered = text.lower()
+    found = min((i for i in (lowered.find(word) for word in words) if i >= 0), default=0)
+    start = max(0, found - width // 3)
+    return ('…' if start else '') + text[start:start + width] + ('…' if start + width < len(text) else '')
+
+
+def load(hits):
+    """Pair each hit with its object, fetching each kind with one query. Hits whose row is gone are dropped."""
+    related = {'feedback': ('student',), 'message': ('student',), 'inquiry': ()}
+    objects = {}
+    for kind in {hit.kind for hit in hits}:
+        model = SOURCES[kind][0]
+        objects[kind] = model.objects.select_related(*related[kind]).in_bulk(
+            [hit.object_id for hit in hits if hit.kind == kind])
+    return [(hit, objects[hit.kind][hit.object_id]) for hit in hits if hit.object_id in objects[hit.kind]]
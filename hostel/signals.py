@@ -0,0 +1,22 @@
+from django.dispatch import Signal
+
+# Sent with sender=Room when beds are taken or released through queryset updates,
+# which skip post_save. Receivers get room_ids, the primary keys of the rooms that changed.
+room_beds_changed = Signal()
+
+# Sent with sender=Student when Student rows change through queryset updates.
+# Receivers get student_ids, the primary keys of the students that changed, or None
+# when the update may have touched any student.
+student_changed = Signal()
+
+# Sent with sender=RoomBooking when bookings change status through queryset updates
+# (assigned, vacated). Receivers get booking_ids, the primary keys of those bookings.
+bookings_changed = Signal()
+
+# Sent with sender=RentLedgerEntry when entries are inserted in bulk (RentLedgerEntry.journal),
+# which skips post_save. Receivers get entries, the RentLedgerEntry objects inserted.
+ledger_journaled = Signal()
+
+# Sent with sender=CustomUser when users change through queryset updates (deactivated,
+# password reset), which skip post_save. Receivers get user_ids, the primary keys of those users.
+users_changed = Signal()
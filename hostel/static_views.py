@@ -0,0 +1,70 @@
+"""
+Serve collected static files with precompressed bodies and long-lived cache headers.
+
+Meant for deployments without a front web server or CDN for /static/. Files whose
+names carry a manifest hash never change, so they are sent as immutable for a year;
+everything else gets a short max-age. When the client accepts it, the .br or .gz copy
+written by OptimizedStaticFilesStorage is sent instead of the original.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+SHORT_LIVED = 'public, max-age=300'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _accepted(request):
+    """Return the content codings the client accepts, ignoring any it gives q=0."""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.partition(';')
+        quality = params.strip().removeprefix('q=')
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+@require_safe
+def serve_static(request, path):
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except ValueError:
+        raise Http404('Not found.')
+    if not os.path.isfile(full_path):
+        raise Http404('Not found.')
+
+    stat = os.stat(full_path)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+    content_type, _ = mimetypes.guess_type(full_path)
+
+    encoding, body_path = None, full_path
+    accepted = _accepted(request)
+    for name, suffix in ENCODINGS:
+        if name in accepted and os.path.isfile(full_path + suffix):
+            encoding, body_path = name, full_path + suffix
+            break
+
+    response = FileResponse(open(body_path, 'rb'), content_type=content_type or 'application/octet-stream',
+                            filename=os.path.basename(full_path))
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = IMMUTABLE if HASHED_NAME.search(os.path.basename(path)) else SHORT_LIVED
+    response['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(os.path.getsize(body_path))
+    return response
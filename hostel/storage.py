@@ -0,0 +1,129 @@
+"""
+Static files storage that, on top of Django's content-hashed manifest storage,
+builds responsive image derivatives and precompressed copies during collectstatic.
+
+For every collected JPEG/PNG it writes resized copies at settings.STATIC_IMAGE_WIDTHS
+in the original format plus WebP and AVIF (when Pillow supports them), named after
+the hashed original so they are immutable too, and records them in responsive.json
+for the {% responsive_picture %} and {% bg_image_set %} tags. Hashed CSS, JS, SVG and
+source maps get .gz and .br (with the optional brotli package) siblings that
+hostel.static_views.serve_static can send to clients that accept them.
+"""
+import gzip
+import json
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow is optional; without it images are only hashed
+    Image = None
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip copies are written
+    brotli = None
+
+RESPONSIVE_MANIFEST = 'responsive.json'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.map', '.json', '.txt')
+# WebP/AVIF encoder settings that keep photos visually lossless at a fraction of the size
+ENCODE_OPTIONS = {
+    'JPEG': {'quality': 82, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 80, 'method': 6},
+    'AVIF': {'quality': 60},
+}
+
+
+class OptimizedStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name  # Not collected yet (development, tests); serve it unhashed
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            if content is not None:
+                raise
+            return name  # Dangling reference in vendor CSS, e.g. a source map that isn't shipped
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        hashed = sorted(set(self.hashed_files.values()))
+        responsive = {}
+        for name in hashed:
+            if name.lower().endswith(IMAGE_EXTENSIONS) and Image is not None:
+                variants = self._image_variants(name)
+                if variants:
+                    responsive[name] = variants
+            elif name.lower().endswith(COMPRESS_EXTENSIONS):
+                self._precompress(name)
+        if self.exists(RESPONSIVE_MANIFEST):
+            self.delete(RESPONSIVE_MANIFEST)  # _save() would pick a new name rather than overwrite it
+        self._save(RESPONSIVE_MANIFEST, ContentFile(json.dumps(responsive, indent=1).encode()))
+
+    def _image_variants(self, name):
+        """Write resized and re-encoded copies of one image; return [{format, width, name}]."""
+        with self.open(name) as f:
+            try:
+                image = Image.open(BytesIO(f.read()))
+                image.load()
+            except OSError:
+                return []
+        source_format = 'PNG' if name.lower().endswith('.png') else 'JPEG'
+        formats = [source_format, 'WEBP'] + (['AVIF'] if features.check('avif') else [])
+        widths = sorted({w for w in getattr(settings, 'STATIC_IMAGE_WIDTHS', [480, 960, 1600]) if w < image.width})
+        widths.append(min(image.width, max(getattr(settings, 'STATIC_IMAGE_WIDTHS', [1600]))))
+
+        stem, ext = os.path.splitext(name)
+        variants = []
+        for width in sorted(set(widths)):
+            resized = image if width == image.width else image.resize(
+                (width, round(image.height * width / image.width)), Image.LANCZOS)
+            for fmt in formats:
+                extension = {'JPEG': ext, 'PNG': ext, 'WEBP': '.webp', 'AVIF': '.avif'}[fmt]
+                variant_name = f'{stem}.{width}w{extension}'
+                out = BytesIO()
+                frame = resized.convert('RGB') if fmt == 'JPEG' and resized.mode not in ('RGB', 'L') else resized
+                frame.save(out, fmt, **ENCODE_OPTIONS[fmt])
+                if self.exists(variant_name):
+                    self.delete(variant_name)
+                self._save(variant_name, ContentFile(out.getvalue()))
+                variants.append({'format': fmt.lower(), 'width': width, 'name': variant_name})
+        return variants
+
+    def _precompress(self, name):
+        with self.open(name) as f:
+            content = f.read()
+        copies = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            copies['.br'] = brotli.compress(content)
+        for suffix, data in copies.items():
+            if len(data) < len(content):  # Only worth serving when it is actually smaller
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(data))
+
+    def variant_url(self, name):
+        """URL of a file written by post_process, whose name is already hashed."""
+        return StaticFilesStorage.url(self, name)
+
+    def load_responsive(self):
+        """Return the responsive.json index, or {} before collectstatic has run."""
+        try:
+            with self.open(RESPONSIVE_MANIFEST) as f:
+                return json.loads(f.read().decode())
+        except (OSError, ValueError):
+            return {}
@@ -0,0 +1,64 @@
+"""
+Template tags for the responsive image derivatives written by
+hostel.storage.OptimizedStaticFilesStorage. Before collectstatic has run, or with a
+storage that makes no derivatives, they fall back to the plain static URL.
+"""
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+_MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+_responsive = None
+
+
+def _variants(path):
+    """Return {format: [(width, url)]} for a static path, best formats first."""
+    global _responsive
+    if _responsive is None:
+        load = getattr(staticfiles_storage, 'load_responsive', None)
+        _responsive = load() if load else {}
+        if not _responsive:
+            _responsive = None  # Try again on the next render, collectstatic may have run since
+            return {}
+    by_format = {}
+    for variant in _responsive.get(staticfiles_storage.stored_name(path), []):
+        by_format.setdefault(variant['format'], []).append(
+            (variant['width'], staticfiles_storage.variant_url(variant['name'])))
+    return {fmt: by_format[fmt] for fmt in ('avif', 'webp', 'jpeg', 'png') if fmt in by_format}
+
+
+@register.simple_tag
+def responsive_picture(path, alt='', sizes='100vw', css_class=''):
+    """Render a <picture> with AVIF/WebP sources and a srcset on the fallback <img>."""
+    variants = _variants(path)
+    fallback = staticfiles_storage.url(path)
+    if not variants:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', fallback, alt, css_class)
+    sources = format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', (
+        (_MIME_TYPES[fmt], ', '.join(f'{url} {width}w' for width, url in widths), sizes)
+        for fmt, widths in variants.items() if fmt in ('avif', 'webp')
+    ))
+    base = next((widths for fmt, widths in variants.items() if fmt in ('jpeg', 'png')), None)
+    srcset = ', '.join(f'{url} {width}w' for width, url in base) if base else ''
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        sources, base[-1][1] if base else fallback, srcset, sizes, alt, css_class,
+    )
+
+
+@register.simple_tag
+def bg_image_set(path, max_width=1600):
+    """
+    Return a CSS image-set() value for a background image, offering AVIF and WebP at the
+    largest width not above max_width. Use it after a plain url() declaration as fallback.
+    """
+    variants = _variants(path)
+    if not variants:
+        return format_html("url('{}')", staticfiles_storage.url(path))
+    options = []
+    for fmt, widths in variants.items():
+        fitting = [url for width, url in widths if width <= max_width] or [widths[0][1]]
+        options.append(format_html("url('{}') type('{}')", fitting[-1], _MIME_TYPES[fmt]))
+    return format_html('image-set({})', format_html_join(', ', '{}', ((option,) for option in options)))
@@ -1,3 +1,657 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import threading
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+
+from . import dashboard, live, querystats, queue, ratelimit
+from .allocation import assign_pending_bookings
+from .bulkio import import_students
+from .models import (ContactInquiry, CustomUser, DashboardSnapshot, Feedback, InboxCounter, LiveEvent, Message,
+                     RentBalance, RentLedgerEntry, Room, RoomBooking, RoomRate, RoomType, Student, Task)
+from .search import search
+from .waitlist import fill_free_beds
+
+
+def make_student(student_id, room=None):
+    user = CustomUser.objects.create_user(f'student{student_id}', user_type='student')  # Tests log in with force_login
+    return Student.objects.create(user=user, name=f'Student {student_id}', email=f'{student_id}@example.com',
+                                  student_id=student_id, phone=f'07{student_id}', room=room)
+
+
+@queue.task(max_attempts=2)
+def flaky(fail):
+    if fail:
+        raise ValueError('Not this time')
+    return 'ok'
+
+
+def book(student, room_type='twin', check_in=None, duration='one_month'):
+    return RoomBooking.objects.create(student=student, room_type=room_type, duration_of_stay=duration,
+                                      check_in_date=check_in or datetime.date.today())
+
+
+class ManagementPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user('warden', password='secret', user_type='admin')
+        cls.room = Room.objects.create(room_number='A1', room_type='twin', capacity=2, beds_available=2)
+        cls.student = make_student('S1', room=cls.room)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_room_listing_links_to_edit_and_delete(self):
+        response = self.client.get(reverse('room_management'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, reverse('edit_room', args=[self.room.pk]))
+        self.assertContains(response, reverse('delete_room', args=[self.room.pk]))
+
+    def test_student_listing_links_to_edit_and_delete(self):
+        response = self.client.get(reverse('student_management'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, reverse('edit_student', args=[self.student.pk]))
+        self.assertContains(response, reverse('delete_student', args=[self.student.pk]))
+
+    def test_edit_room(self):
+        self.assertEqual(self.client.get(reverse('edit_room', args=[self.room.pk])).status_code, 200)
+        response = self.client.post(reverse('edit_room', args=[self.room.pk]), {
+            'room_number': 'A1', 'room_type': 'twin', 'capacity': 2, 'beds_available': 0, 'is_available': 'on',
+        })
+        self.assertRedirects(response, reverse('room_management'))
+        self.room.refresh_from_db()
+        self.assertFalse(self.room.is_available)  # Follows the beds left
+
+    def test_delete_room_refuses_an_occupied_room(self):
+        booking = book(self.student)
+        self.assertTrue(booking.assign_room(self.room))
+        self.client.post(reverse('delete_room', args=[self.room.pk]))
+        self.assertTrue(Room.objects.filter(pk=self.room.pk).exists())
+        booking.vacate()
+        self.client.post(reverse('delete_room', args=[self.room.pk]))
+        self.assertFalse(Room.objects.filter(pk=self.room.pk).exists())
+
+    def test_edit_student(self):
+        self.assertEqual(self.client.get(reverse('edit_student', args=[self.student.pk])).status_code, 200)
+        response = self.client.post(reverse('edit_student', args=[self.student.pk]), {
+            'student_id': 'S1', 'name': 'Renamed', 'email': 's1@example.com', 'phone': '0700',
+        })
+        self.assertRedirects(response, reverse('student_management'))
+        self.assertEqual(Student.objects.get(pk=self.student.pk).name, 'Renamed')
+
+    def test_delete_student_gives_the_bed_back(self):
+        booking = book(self.student)
+        self.assertTrue(booking.assign_room(self.room))
+        response = self.client.post(reverse('delete_student', args=[self.student.pk]))
+        self.assertRedirects(response, reverse('student_management'))
+        self.assertFalse(Student.objects.filter(pk=self.student.pk).exists())
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.beds_available, 2)
+
+    def test_students_are_sent_to_login(self):
+        self.client.force_login(self.student.user)
+        self.assertRedirects(self.client.get(reverse('edit_room', args=[self.room.pk])), reverse('login'),
+                             fetch_redirect_response=False)
+
+
+
+class QueryBudgetTests(TestCase):
+    """Every page and API endpoint in settings.QUERY_BUDGETS stays within its budget with rows to list."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user('budget-warden', password='secret', user_type='admin')
+        rooms = [Room.objects.create(room_number=f'Q{i}', room_type='twin', capacity=2, beds_available=2)
+                 for i in range(10)]
+        students = [make_student(f'Q{i}') for i in range(10)]
+        for student, room in zip(students, rooms):
+            book(student).assign_room(room)
+            book(student, 'shared')  # Pending
+            Message.objects.bulk_create([Message(student=student, content=f'Rent reminder {i}') for i in range(3)])
+            Feedback.objects.create(student=student, user=student.user, message='The heating is broken')
+            student.record_payment(Decimal('10'))
+        cls.student = students[0]
+        dashboard.rebuild()  # As the nightly rebuild_dashboard; the first view of a day builds it otherwise
+
+    def test_staff_pages(self):
+        self.client.force_login(self.admin)
+        for url_name, params in [('index', {}), ('room_management', {}), ('student_management', {}),
+                                 ('rent_management', {}), ('feedback_management', {}),
+                                 ('staff_search', {'q': 'heating'}), ('admin_dashboard', {})]:
+            with self.subTest(url_name):
+                response = querystats.assert_query_budget(self.client, url_name, data=params)
+                self.assertEqual(response.status_code, 200)
+
+    def test_student_pages(self):
+        self.client.force_login(self.student.user)
+        for url_name, params in [('student_rooms', {}), ('book_room', {}), ('my_profile', {}),
+                                 ('api_rooms', {}), ('api_room_types', {}), ('api_my_bookings', {}),
+                                 ('api_my_messages', {'unread': '1'})]:
+            with self.subTest(url_name):
+                response = querystats.assert_query_budget(self.client, url_name, data=params)
+                self.assertEqual(response.status_code, 200)
+
+    async def test_async_views_count_the_queries_their_threads_run(self):
+        # The ORM calls of an async view run on sync_to_async's threads, not the event loop's
+        await self.async_client.aforce_login(self.student.user)
+        with querystats.query_budget('my_profile') as recorder:
+            with override_settings(DEBUG=True):
+                response = await self.async_client.get(reverse('my_profile'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(recorder.count, 0)
+        self.assertEqual(response['X-Query-Count'], str(recorder.count))
+
+    def test_batch_assignment_runs_the_same_queries_for_any_number_of_rooms(self):
+        counts = []
+        for rooms in (2, 20):
+            RoomBooking.objects.filter(status='pending').delete()
+            batch = [Room.objects.create(room_number=f'QB{rooms}-{i}', room_type='single', capacity=1,
+                                         beds_available=1) for i in range(rooms)]
+            bookings = [book(make_student(f'QB{rooms}-{i}'), 'single') for i in range(len(batch))]
+            with querystats.QueryRecorder() as recorder:
+                assigned, unmatched = assign_pending_bookings(RoomBooking.objects.filter(
+                    pk__in=[booking.pk for booking in bookings]))
+            self.assertEqual((len(assigned), unmatched), (rooms, []))
+            counts.append(recorder.count)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_every_budget_is_covered(self):
+        covered = {'index', 'room_management', 'student_management', 'rent_management', 'feedback_management',
+                   'staff_search', 'admin_dashboard', 'student_rooms', 'book_room', 'my_profile', 'api_rooms',
+                   'api_room_types', 'api_my_bookings', 'api_my_messages'}
+        self.assertEqual(set(settings.QUERY_BUDGETS), covered)
+
+
+class DateAwareAssignmentTests(TestCase):
+    """A room never holds more stays at once than it has beds; beds_available counts today's."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Room.objects.create(room_number='D1', room_type='single', capacity=1, beds_available=1)
+        cls.today = timezone.localdate()
+
+    def test_overlapping_stays_are_refused(self):
+        self.assertTrue(book(make_student('S10'), 'single').assign_room(self.room))
+        self.assertFalse(book(make_student('S11'), 'single', self.today + datetime.timedelta(days=10))
+                         .assign_room(self.room))
+        later = book(make_student('S12'), 'single', self.today + datetime.timedelta(days=30))
+        self.assertTrue(later.assign_room(self.room))  # Checks in the day the first stay ends
+
+    def test_future_stays_take_their_bed_on_check_in(self):
+        check_in = self.today + datetime.timedelta(days=7)
+        self.assertTrue(book(make_student('S13'), 'single', check_in).assign_room(self.room))
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.beds_available, 1)  # Still free until then
+        self.assertEqual(Room.count_free_beds(on=check_in), [self.room.pk])
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.beds_available, self.room.is_available), (0, False))
+
+    def test_future_bookings_get_rooms_that_are_full_today(self):
+        self.assertTrue(book(make_student('S21'), 'single').assign_room(self.room))
+        future = book(make_student('S22'), 'single', self.today + datetime.timedelta(days=60))
+        assigned, unmatched = assign_pending_bookings(RoomBooking.objects.filter(pk=future.pk))
+        self.assertEqual((assigned, unmatched), ([(future, self.room)], []))
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.beds_available, 0)  # Still the first student's bed today
+
+    def test_the_waitlist_skips_bookings_that_clash(self):
+        self.assertTrue(book(make_student('S23'), 'single', self.today + datetime.timedelta(days=40)).assign_room(
+            self.room))
+        year = book(make_student('S24'), 'single', duration='one_year')  # First in line, but runs into that stay
+        month = book(make_student('S25'), 'single')  # Over before it begins
+        self.assertEqual(fill_free_beds(room_ids=[self.room.pk]), {'assigned': 1})
+        self.assertEqual(RoomBooking.objects.get(pk=year.pk).status, 'pending')
+        self.assertEqual(RoomBooking.objects.get(pk=month.pk).room, self.room)
+
+    def test_batches_skip_rooms_taken_later_in_the_stay(self):
+        check_in = self.today + datetime.timedelta(days=7)
+        self.assertTrue(book(make_student('S14'), 'single', check_in).assign_room(self.room))
+        waiting = book(make_student('S15'), 'single')  # A month from today: runs into the stay above
+        assigned, unmatched = assign_pending_bookings(RoomBooking.objects.filter(pk=waiting.pk))
+        self.assertEqual((assigned, unmatched), ([], [waiting]))
+        self.assertEqual(self.room.occupancies.count(), 1)
+
+
+class ConcurrentAssignmentTests(TransactionTestCase):
+    """Assigners racing in threads, each on its own connection, never put more students in a room than it has beds."""
+    THREADS = 8
+
+    def test_no_room_is_oversold(self):
+        room = Room.objects.create(room_number='F1', room_type='4_sharing', capacity=4, beds_available=4)
+        booking_ids = [book(make_student(f'F{i}'), 'shared').pk for i in range(4 * self.THREADS)]
+        start = threading.Barrier(self.THREADS)
+        errors = []
+
+        def assign(ids):
+            try:
+                start.wait()
+                for booking_id in ids:
+                    try:
+                        RoomBooking.objects.get(pk=booking_id).assign_room(Room.objects.get(pk=room.pk))
+                    except DatabaseError as exc:  # A lock timeout loses that booking, not a bed
+                        errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=assign, args=(booking_ids[i::self.THREADS],)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        room.refresh_from_db()
+        assigned = RoomBooking.objects.filter(room=room, status='assigned').count()
+        self.assertEqual(assigned, 4, errors)
+        self.assertEqual(room.occupancies.count(), assigned)
+        self.assertEqual((room.beds_available, room.is_available), (0, False))
+        self.assertEqual(Student.objects.filter(room=room).count(), assigned)
+
+
+class RentLedgerTests(TestCase):
+    """Student.rent_due and the ledger balance move together, whatever changes them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Room.objects.create(room_number='B1', room_type='twin', capacity=2, beds_available=2)
+
+    def assertInStep(self, student):
+        student.refresh_from_db()
+        balance = RentBalance.objects.filter(student=student).values_list('balance', flat=True).first() or 0
+        self.assertEqual(balance, student.rent_due)
+
+    def test_assigning_a_room_charges_its_rent(self):
+        student = make_student('S2')
+        self.assertTrue(book(student).assign_room(self.room))
+        student.refresh_from_db()
+        self.assertEqual(student.room, self.room)
+        self.assertEqual(student.rent_due, RoomType.price_for('twin'))
+        self.assertInStep(student)
+
+    def test_payments_charges_and_saves_stay_in_step(self):
+        student = make_student('S3', room=self.room)
+        self.assertInStep(student)
+        student.record_payment(Decimal('100'))
+        self.assertInStep(student)
+        student.record_charge(Decimal('25'), note='Key replacement')
+        self.assertInStep(student)
+        stale = Student.objects.get(pk=student.pk)
+        student.record_payment(Decimal('10'))
+        stale.name = 'Renamed'
+        stale.save()  # Mustn't write back its old copy of the rent fields
+        self.assertInStep(student)
+        self.assertEqual(student.rent_paid, Decimal('110'))
+
+    def test_saving_a_student_keeps_their_charges(self):
+        student = make_student('S19', room=self.room)
+        student.record_charge(Decimal('25'), note='Key replacement')
+        student = Student.objects.get(pk=student.pk)
+        student.name = 'Renamed'
+        student.save()
+        self.assertInStep(student)
+        self.assertEqual(student.rent_due, RoomType.price_for('twin') + 25)
+        self.assertFalse(student.ledger_entries.filter(amount__lt=0).exists())
+
+    def test_a_new_room_charges_only_the_difference(self):
+        single = Room.objects.create(room_number='B2', room_type='single', capacity=1, beds_available=1)
+        student = make_student('S20', room=self.room)
+        student.record_charge(Decimal('25'), note='Key replacement')
+        student = Student.objects.get(pk=student.pk)
+        student.room = single
+        student.save()
+        self.assertInStep(student)
+        self.assertEqual(student.rent_due, RoomType.price_for('single') + 25)
+
+    def test_price_changes_are_posted_as_adjustments(self):
+        student = make_student('S8', room=self.room)
+        student.record_charge(Decimal('25'), note='Key replacement')
+        with self.captureOnCommitCallbacks(execute=True):
+            RoomRate.objects.create(room_type_id='twin', effective_from=timezone.localdate(),
+                                    monthly_rent=RoomType.price_for('twin') + 100)
+        self.assertInStep(student)
+        RoomRate.objects.filter(room_type_id='twin', effective_from=timezone.localdate()).update(monthly_rent=1)
+        call_command('recalculate_rent', stdout=io.StringIO())  # As the nightly run after a bulk edit
+        self.assertInStep(student)
+        self.assertEqual(student.rent_due, 1 + 25)  # The new price, and the charge still on top
+        self.assertEqual(student.ledger_entries.filter(note__startswith='Rent recalculated').count(), 2)
+
+    def test_imported_students_open_their_ledger(self):
+        result = import_students(io.StringIO('student_id,name,email,room_number\nS4,Imported,s4@example.com,B1\n'))
+        self.assertEqual(result.created, 1)
+        student = Student.objects.get(student_id='S4')
+        self.assertGreater(student.rent_due, 0)
+        self.assertInStep(student)
+        self.assertTrue(RentLedgerEntry.objects.filter(student=student, entry_type='charge').exists())
+
+
+class StudentImportTests(TestCase):
+    def test_students_only_take_free_beds(self):
+        room = Room.objects.create(room_number='E1', room_type='twin', capacity=2, beds_available=1)
+        result = import_students(io.StringIO('student_id,name,email,room_number\n'
+                                             'S16,First,s16@example.com,E1\nS17,Second,s17@example.com,E1\n'))
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(3, 'Room E1 has no free bed left.')])
+        room.refresh_from_db()
+        self.assertEqual((room.beds_available, room.is_available), (0, False))
+
+    def test_imported_beds_survive_the_nightly_recount(self):
+        room = Room.objects.create(room_number='E2', room_type='twin', capacity=2, beds_available=2)
+        result = import_students(io.StringIO('student_id,name,email,room_number\n'
+                                             'S26,First,s26@example.com,E2\nS27,Second,s27@example.com,E2\n'))
+        self.assertEqual(result.created, 2)
+        self.assertEqual(RoomBooking.objects.filter(room=room, status='assigned').count(), 2)
+        self.assertEqual(Room.count_free_beds(), [])
+        room.refresh_from_db()
+        self.assertEqual((room.beds_available, room.is_available), (0, False))
+
+    def test_over_long_fields_are_reported(self):
+        result = import_students(io.StringIO(f'student_id,name,email,phone\nS18,{"x" * 101},s18@example.com,'
+                                             f'0123456789012345\n'))
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.errors, [(2, 'name is at most 100 characters; phone is at most 15 characters.')])
+
+
+class RentReminderTests(TestCase):
+    def test_every_student_owing_rent_is_reminded(self):
+        owing = make_student('S5')
+        Student.objects.filter(pk=owing.pk).update(rent_due=Decimal('50'))  # As an old import left it: no ledger rows
+        make_student('S6')
+        call_command('send_rent_reminders', date='2026-03-05', due_day='1', stdout=io.StringIO())
+        self.assertEqual(list(Message.objects.values_list('student_id', flat=True)), [owing.pk])
+
+    def test_due_day_must_be_a_day_of_the_month(self):
+        for due_day in ('0', '32', 'first'):
+            with self.assertRaises(CommandError):
+                call_command('send_rent_reminders', date='2026-03-05', due_day=due_day, stdout=io.StringIO())
+
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Room.objects.create(room_number='C1', room_type='twin', capacity=2, beds_available=2)
+        cls.student = make_student('S7')
+
+    def test_rent_totals_follow_the_ledger(self):
+        dashboard.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(book(self.student).assign_room(self.room))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.record_payment(Decimal('40'))
+        snapshot = DashboardSnapshot.objects.get(day=timezone.localdate())
+        self.assertEqual(snapshot.rent_expected, RoomType.price_for('twin'))
+        self.assertEqual(snapshot.rent_collected, Decimal('40'))
+        self.assertEqual(snapshot.rent_expected, RentBalance.objects.aggregate(total=Sum('total_charged'))['total'])
+
+    def test_a_failing_refresh_does_not_fail_the_committed_write(self):
+        with mock.patch('hostel.dashboard.current_snapshot', side_effect=DatabaseError('gone')), \
+                self.assertLogs('django.test', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            booking = book(self.student)
+        self.assertTrue(RoomBooking.objects.filter(pk=booking.pk).exists())
+
+
+class CachedUserTests(TestCase):
+    def test_queryset_updates_reach_logged_in_sessions(self):
+        student = make_student('S9')
+        self.client.force_login(student.user)
+        self.assertEqual(self.client.get(reverse('my_profile')).status_code, 200)  # Now cached
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(pk=student.user_id).update(is_active=False)
+        self.assertRedirects(self.client.get(reverse('my_profile')), f"{reverse('login')}?next={reverse('my_profile')}",
+                             fetch_redirect_response=False)
+
+
+class InboxCounterTests(TestCase):
+    """The unread counter always equals the student's unread messages, whichever way they change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = make_student('I1')
+        cls.other = make_student('I2')
+        Message.objects.create(student=cls.other, content='Welcome')
+
+    def setUp(self):
+        self.client.force_login(self.student.user)
+
+    def assertUnread(self, expected):
+        for student in (self.student, self.other):
+            self.assertEqual(InboxCounter.unread_for(student.pk),
+                             Message.objects.filter(student=student, is_read=False).count())
+        self.assertEqual((InboxCounter.unread_for(self.student.pk), InboxCounter.unread_for(self.other.pk)),
+                         (expected, 1))
+
+    def test_the_counter_follows_every_change(self):
+        first = Message.objects.create(student=self.student, content='Rent reminder')
+        Message.objects.bulk_create([Message(student=self.student, content=f'Notice {i}') for i in range(3)])
+        self.assertUnread(4)
+        for _ in range(2):  # Marking it again changes nothing
+            self.client.post(reverse('mark_message_read', args=[first.pk]))
+            self.assertUnread(3)
+        Message.objects.create(student=self.student, content='Booking approved')
+        self.assertUnread(4)
+        self.client.post(reverse('mark_all_messages_read'))
+        self.assertUnread(0)
+        latest = Message.objects.create(student=self.student, content='Room assigned')
+        self.assertUnread(1)
+        first.is_read = False
+        first.save()
+        self.assertUnread(2)
+        latest.delete()
+        self.assertUnread(1)
+
+
+@override_settings(TASKS_EAGER=False, TASK_RETRY_BACKOFF=10, TASK_RETRY_BACKOFF_MAX=60)
+class TaskQueueTests(TestCase):
+    """Failed attempts come back after a backoff, expired leases are handed out again, and spent tasks die."""
+
+    def past(self):
+        return timezone.now() - datetime.timedelta(seconds=1)
+
+    def test_the_backoff_doubles_up_to_its_cap(self):
+        with mock.patch('hostel.queue.random.uniform', return_value=1):
+            self.assertEqual([queue.backoff(attempt).total_seconds() for attempt in range(1, 6)], [10, 20, 40, 60, 60])
+
+    def test_a_failed_attempt_is_retried_after_the_backoff_then_dies(self):
+        task = flaky.delay(fail=True)
+        with self.assertLogs('hostel.queue', 'WARNING'):
+            self.assertEqual(queue.run_task(queue.claim('w1', 5)[0]), 'queued')
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ('queued', 1))
+        self.assertIn('Not this time', task.last_error)
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertEqual(queue.claim('w1', 5), [])  # Not due yet
+
+        Task.objects.filter(pk=task.pk).update(run_at=self.past())
+        with self.assertLogs('hostel.queue', 'ERROR'):
+            self.assertEqual(queue.run_task(queue.claim('w1', 5)[0]), 'dead')
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, task.locked_until), ('dead', 2, None))
+        self.assertIsNotNone(task.finished_at)
+        Task.objects.filter(pk=task.pk).update(run_at=self.past())
+        self.assertEqual(queue.claim('w1', 5), [])  # Dead tasks are never claimed
+
+    def test_an_expired_lease_is_handed_to_another_worker(self):
+        task = flaky.delay(fail=False)
+        stale = queue.claim('w1', 5)[0]
+        self.assertEqual(queue.requeue_expired(), 0)  # Still leased
+        Task.objects.filter(pk=task.pk).update(locked_until=self.past())
+        self.assertEqual(queue.requeue_expired(), 1)
+        self.assertEqual(queue.renew_leases('w1', [task.pk]), 0)  # w1 lost it
+
+        claimed = queue.claim('w2', 5)[0]
+        self.assertEqual((claimed.locked_by, claimed.attempts), ('w2', 2))
+        queue.run_task(stale)  # w1 finishing late doesn't record over w2's run
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.locked_by), ('running', 'w2'))
+        self.assertEqual(queue.run_task(claimed), 'done')
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.result), ('done', 'ok'))
+
+    def test_an_expired_lease_on_the_last_attempt_is_dead(self):
+        task = flaky.delay(fail=False)
+        Task.objects.filter(pk=task.pk).update(attempts=1)
+        queue.claim('w1', 5)
+        Task.objects.filter(pk=task.pk).update(locked_until=self.past())
+        queue.requeue_expired()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.last_error), ('dead', 'Worker stopped while running the task.'))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Ranks with the FTS5 index the SQLite migration creates')
+class SearchTests(TestCase):
+    """Every word must match; hits come best first and the filters narrow them in the index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        student = make_student('F1')
+        cls.last_month = timezone.now() - datetime.timedelta(days=30)
+        with mock.patch('django.utils.timezone.now', return_value=cls.last_month):
+            cls.old = Feedback.objects.create(student=student, message='Heating broken in the kitchen, it is cold')
+        cls.worst = Feedback.objects.create(student=student, message='The heating is broken again. Heating, heating!')
+        cls.message = Message.objects.create(student=student, content='Your heating repair is booked')
+        cls.maintenance = ContactInquiry.objects.create(name='Visitor', email='v@example.com', phone='0711',
+                                                        inquiry_type='maintenance', message='Broken heating in A1')
+        ContactInquiry.objects.create(name='Visitor', email='v@example.com', phone='0712',
+                                      inquiry_type='general', message='Is heating included in the rent?')
+
+    def found(self, query, **filters):
+        return [(hit.kind, hit.object_id) for hit in search(query, **filters)]
+
+    def test_every_word_must_match_and_the_best_match_comes_first(self):
+        self.assertEqual(self.found('heating broken'), [('feedback', self.worst.pk), ('inquiry', self.maintenance.pk),
+                                                        ('feedback', self.old.pk)])
+        self.assertEqual(self.found('heating plumber'), [])
+
+    def test_words_match_their_other_forms(self):
+        self.assertIn(('message', self.message.pk), self.found('heated repairs'))  # Porter stemming
+
+    def test_filters_narrow_the_hits(self):
+        self.assertEqual(self.found('heating', kinds=['message']), [('message', self.message.pk)])
+        self.assertEqual(self.found('heating', inquiry_type='maintenance'), [('inquiry', self.maintenance.pk)])
+        next_day = self.last_month + datetime.timedelta(days=1)
+        self.assertEqual(self.found('broken', until=next_day), [('feedback', self.old.pk)])
+        self.assertNotIn(('feedback', self.old.pk), self.found('broken', since=next_day))
+
+    def test_search_operators_are_plain_words(self):
+        self.assertEqual(self.found('heating NOT "broken'), [])  # Every word is required, 'not' too
+
+
+class RateLimitTests(TestCase):
+    """Limits are sliding windows: the previous window's count fades out as the current one fills."""
+    START = 600.0  # The start of a 60 second window
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().post('/', {'username': 'warden'})
+
+    def hits(self, now, times=1):
+        return [ratelimit.check('login', self.request, now=now) for _ in range(times)]
+
+    @override_settings(RATE_LIMITS={'login': [('ip', 4, 60)]})
+    def test_the_previous_window_carries_over(self):
+        self.assertEqual(self.hits(self.START, 4), [0, 0, 0, 0])
+        # A quarter into the next window, three quarters of the previous four still count
+        self.assertEqual(self.hits(self.START + 75), [0])
+        self.assertEqual(self.hits(self.START + 75), [15])  # 3 + 2 > 4 until half the previous one has gone
+
+    @override_settings(RATE_LIMITS={'login': [('ip', 4, 60)]})
+    def test_the_count_resets_once_both_windows_have_passed(self):
+        self.assertEqual(self.hits(self.START, 5)[-1], 60)  # The current window alone is full
+        self.assertEqual(self.hits(self.START + 120, 4), [0, 0, 0, 0])
+
+    @override_settings(RATE_LIMITS={'login': [('ip', 3, 60)]})
+    def test_login_answers_429_with_retry_after(self):
+        data = {'username': 'warden', 'password': 'wrong', 'user_type': 'admin'}
+        with mock.patch('hostel.ratelimit.time.time', return_value=self.START + 20):
+            for _ in range(3):
+                self.assertEqual(self.client.post(reverse('login'), data).status_code, 200)
+            response = self.client.post(reverse('login'), data)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '40')
+
+    @override_settings(RATE_LIMITS={'contact': [('email', 2, 600)]})
+    def test_contact_is_counted_per_email(self):
+        def send(email, phone):  # Phone numbers are unique
+            return self.client.post(reverse('contact'), {'name': 'Visitor', 'email': email, 'phone': phone,
+                                                         'inquiry_type': 'general', 'message': 'Hello'}).status_code
+
+        with mock.patch('hostel.ratelimit.time.time', return_value=self.START):
+            self.assertEqual([send('a@example.com', '0701'), send('a@example.com', '0702')], [302, 302])
+            self.assertEqual(send(' A@Example.com', '0703'), 429)
+            self.assertEqual(send('b@example.com', '0704'), 302)
+
+
+class ApiTests(TestCase):
+    """A poll whose If-None-Match still matches gets a 304; any change behind the data moves the ETag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Room.objects.create(room_number='E1', room_type='twin', capacity=2, beds_available=2)
+        cls.student = make_student('E1')
+
+    def setUp(self):
+        cache.clear()
+
+    def poll(self, url_name, etag=None):
+        return self.client.get(reverse(url_name), **({'HTTP_IF_NONE_MATCH': etag} if etag else {}))
+
+    def test_a_matching_etag_gets_a_304_without_queries(self):
+        etag = self.poll('api_rooms')['ETag']
+        with self.assertNumQueries(0):
+            response = self.poll('api_rooms', etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_a_change_gets_a_new_etag_and_a_200(self):
+        etag = self.poll('api_rooms')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Room.objects.create(room_number='E2', room_type='twin', capacity=2, beds_available=2)
+        response = self.poll('api_rooms', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([room['number'] for room in response.json()['data']], ['E1', 'E2'])
+
+    def test_a_new_message_changes_the_students_etag(self):
+        self.client.force_login(self.student.user)
+        etag = self.poll('api_my_messages')['ETag']
+        self.assertEqual(self.poll('api_my_messages', etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(student=self.student, content='Rent reminder')
+        response = self.poll('api_my_messages', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((len(response.json()['data']), response.json()['unread']), (1, 1))
+
+
+@override_settings(LIVE_EVENTS_POLL_INTERVAL=0.05)
+class DatabaseBackendTests(TransactionTestCase):
+    """Events published by any process (here: outside the event loop) reach this process's streams once."""
+
+    async def _receive(self, backend, channel, publish):
+        subscription = live.hub.subscribe([channel])
+        try:
+            backend.start()
+            await asyncio.sleep(0.1)  # The poller starts from the time it began
+            await sync_to_async(publish)()
+            first = await subscription.get(2)
+            again = await subscription.get(0.3)
+        finally:
+            subscription.close()
+        return first, again
+
+    def test_published_events_are_delivered_once(self):
+        backend = live.DatabaseBackend(live.hub)
+        first, again = async_to_sync(self._receive)(
+            backend, 'student:1', lambda: backend.publish('student:1', ('booking', {'id': 1, 'status': 'approved'})))
+        self.assertEqual(first, ('booking', {'id': 1, 'status': 'approved'}))
+        self.assertIsNone(again)
+        self.assertEqual(LiveEvent.objects.count(), 1)
@@ -17,7 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
-from hostel import views
+from hostel import api, live, views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -33,4 +33,24 @@ urlpatterns = [
     path('book/', views.book_room, name='book_room'),
     path('admin_dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('profile/', views.my_profile, name='my_profile'),
+    path('profile/messages/read/', views.mark_all_messages_read, name='mark_all_messages_read'),
+    path('profile/messages/<int:message_id>/read/', views.mark_message_read, name='mark_message_read'),
+    path('manage/rooms/', views.room_management, name='room_management'),
+    path('manage/rooms/add/', views.add_room, name='add_room'),
+    path('manage/rooms/<int:room_id>/edit/', views.edit_room, name='edit_room'),
+    path('manage/rooms/<int:room_id>/delete/', views.delete_room, name='delete_room'),
+    path('manage/students/', views.student_management, name='student_management'),
+    path('manage/students/add/', views.add_student, name='add_student'),
+    path('manage/students/<int:student_id>/edit/', views.edit_student, name='edit_student'),
+    path('manage/students/<int:student_id>/delete/', views.delete_student, name='delete_student'),
+    path('manage/rent/', views.rent_management, name='rent_management'),
+    path('manage/rent/<int:student_id>/', views.edit_rent, name='edit_rent'),
+    path('manage/feedback/', views.feedback_management, name='feedback_management'),
+    path('manage/feedback/<int:feedback_id>/delete/', views.delete_feedback, name='delete_feedback'),
+    path('manage/search/', views.staff_search, name='staff_search'),
+    path('api/v1/rooms/', api.rooms, name='api_rooms'),
+    path('api/v1/room-types/', api.room_types, name='api_room_types'),
+    path('api/v1/me/bookings/', api.my_bookings, name='api_my_bookings'),
+    path('api/v1/me/messages/', api.my_messages, name='api_my_messages'),
+    path('live/', live.live_events, name='live_events'),
 ]
@@ -0,0 +1,87 @@
+"""
+Data version counters for building cache keys.
+
+Each name ('rooms', ...) has a counter in the cache that is bumped whenever the
+data behind it changes. Cache keys that include the counter (template fragments
+with {% cache %}, for instance) stop matching after a change, so stale entries are
+never invalidated explicitly; they just age out. Counters are bumped after the
+writing transaction commits, and start from the current time in nanoseconds if the
+cache lost them, so an evicted counter can't reuse an old value.
+
+Writes happen in every process (web workers, `run_tasks`, management commands), so the
+counters are only right in a cache all of them share; hostel.checks warns about a
+process-local one, and `check --deploy` fails on it.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Message, Room, RoomBooking
+from .signals import room_beds_changed
+
+VERSION_KEY = 'hostel:version:%s'
+
+
+def get_version(name):
+    """Return the current version of a data set."""
+    key = VERSION_KEY % name
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(*names):
+    """Return {name: version} for several data sets with one cache round trip on a hit."""
+    found = cache.get_many([VERSION_KEY % name for name in names])
+    return {name: found.get(VERSION_KEY % name) or get_version(name) for name in names}
+
+
+def _increment(name):
+    key = VERSION_KEY % name
+    try:
+        cache.incr(key)
+    except ValueError:  # The counter was evicted; start a fresh one
+        cache.add(key, time.time_ns(), None)
+
+
+def bump_version(name):
+    """Move a data set to a new version once the current transaction commits."""
+    transaction.on_commit(lambda: _increment(name))
+
+
+def bump_student_versions(student_ids):
+    """Move the 'student:<id>' versions, which cover each student's own bookings and messages."""
+    for student_id in set(student_ids):
+        bump_version(f'student:{student_id}')
+
+
+class DataVersions:
+    """Template-friendly lookup: {{ data_versions.rooms }} reads the 'rooms' counter on use."""
+
+    def __getitem__(self, name):
+        return get_version(name)
+
+
+def data_versions(request):
+    """Context processor exposing the counters for {% cache %} keys."""
+    return {'data_versions': DataVersions()}
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(room_beds_changed)
+def bump_rooms_version(sender, **kwargs):
+    bump_version('rooms')
+
+
+@receiver(post_save, sender=RoomBooking)
+@receiver(post_delete, sender=RoomBooking)
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def bump_student_version(sender, instance, **kwargs):
+    bump_student_versions([instance.student_id])
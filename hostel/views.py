@@ -1,19 +1,49 @@
+import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 # Create your views here.
-from django.shortcuts import render, redirect
-from .models import Room, Student, Feedback, RoomBooking, Message
+from django.shortcuts import get_object_or_404, render, redirect
+from .models import Room, Student, Feedback, ContactInquiry, RoomBooking, Message, RentBalance, InboxCounter, OccupancySnapshot
+from .allocation import compatible_room_types
+from .availability import aget_availability_snapshot
+from .dashboard import current_snapshot, history as dashboard_history
+from .occupancy import earliest_free, free_beds
+from .pagination import akeyset_paginate, keyset_paginate
+from .ratelimit import rate_limited
+from .search import SOURCES as SEARCH_SOURCES, load as load_search_hits, search
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from .forms import SignUpForm, LoginForm, FeedbackForm, RoomForm, StudentForm, RentForm, ContactInquiryForm, RoomBookingForm
+from .forms import SignUpForm, LoginForm, FeedbackForm, RoomForm, StudentForm, StudentEditForm, RentEntryForm, ContactInquiryForm, RoomBookingForm
 from django.contrib.auth.models import User
+from django.db.models import Q, Sum
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+async def _arender(request, template_name, context):
+    """Render from an async view. Templates and context processors use the sync ORM, so run them in a thread."""
+    request.user = await request.auser()  # Reuse the user login_required loaded rather than fetch it again
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
 @login_required(login_url='/hostel/login/')
-def index(request):
-    return render(request, 'student/index.html', {'username': request.user.username})
+async def index(request):
+    user = await request.auser()
+    return await _arender(request, 'student/index.html', {'username': user.username})
 
-def student_rooms(request):
-    rooms = Room.objects.filter(is_available=True)
-    return render(request, 'student/index.html', {'rooms': rooms})
+async def student_rooms(request):
+    snapshot = await aget_availability_snapshot()  # Served from cache; no database work on a hit
+    return await _arender(request, 'student/index.html', {
+        'rooms': snapshot['rooms'],
+        'free_beds_by_type': snapshot['free_beds_by_type'],
+    })
 
 
 @login_required(login_url='/hostel/login/')
@@ -22,7 +52,7 @@ def student_feedback(request):
         form = FeedbackForm(request.POST)
         if form.is_valid():
             try:
-                student = Student.objects.get(user=request.user)  # Get logged-in student
+                student = request.user.student  # Loaded with the user by hostel.identity
                 # Create feedback with user, student, and message
                 Feedback.objects.create(
                     user=request.user,  # Add the logged-in user
@@ -42,6 +72,7 @@ def student_feedback(request):
         form = FeedbackForm()
 
     return render(request, 'student/index.html', {'form': form})
+@rate_limited('contact')
 def contact(request):
     if request.method == 'POST':
         form = ContactInquiryForm(request.POST)
@@ -69,12 +100,23 @@ def book_room(request):
             booking.status = 'pending'  # Set status to pending
             booking.save()  # Save to DB
 
-            messages.success(request, "Your booking request has been submitted!")
+            message = "Your booking request has been submitted!"
+            # Only words the message (assign_room checks the dates itself when it takes a bed); no database
+            # work when the occupancy index is current
+            room_types = compatible_room_types(booking.room_type)
+            if not sum(free_beds(room_types, booking.check_in_date, booking.check_out_date).values()):
+                nights = (booking.check_out_date - booking.check_in_date).days
+                earliest = earliest_free(room_types, booking.check_in_date, nights)
+                if earliest:
+                    message += (" Every bed of that type is taken for your dates; the earliest check-in "
+                                f"with one free is {earliest:%d %b %Y}.")
+            messages.success(request, message)
             return redirect('book_room')  # Redirect to the same page to display the message
     else:
         form = RoomBookingForm()
 
     return render(request, 'student/book.html', {'form': form})
+@rate_limited('signup')
 def signup(request):
     if request.method == 'POST':
         form = SignUpForm(request.POST)
@@ -105,6 +147,7 @@ def signup(request):
     return render(request, 'auth/signup.html', {'form': form})
 
 
+@rate_limited('login')
 def user_login(request):
     if request.method == 'POST':
         form = LoginForm(request.POST)
@@ -137,49 +180,146 @@ def user_logout(request):
     logout(request)
     return redirect('login')
 
+
+# Days of history in the dashboard trend charts
+DASHBOARD_HISTORY_DAYS = 30
+
+
 @login_required(login_url='/hostel/login/')
 def admin_dashboard(request):
     if request.user.user_type != 'admin':
         return redirect('login')
-    return render(request, 'admin/dashboard.html')
+    # Precomputed figures (hostel.dashboard): the same few queries however many rooms there are
+    snapshot, _ = current_snapshot()
+    return render(request, 'admin/dashboard.html', {
+        'snapshot': snapshot,
+        'occupancy': OccupancySnapshot.objects.filter(day=snapshot.day).order_by('pk'),
+        'history': dashboard_history(DASHBOARD_HISTORY_DAYS),
+    })
+
+
+# Rows per page on the admin listings
+ADMIN_PAGE_SIZE = 50
+
+# Allowed ?sort= values for each listing, all on indexed columns so each page is one index seek
+ROOM_SORTS = {
+    'room_number': ('room_number',),
+    '-room_number': ('-room_number',),
+}
+STUDENT_SORTS = {
+    'name': ('name',),
+    '-name': ('-name',),
+    'student_id': ('student_id',),
+    '-student_id': ('-student_id',),
+}
+FEEDBACK_SORTS = {
+    '-timestamp': ('-timestamp',),
+    'timestamp': ('timestamp',),
+}
+
+
+def _listing_context(request, queryset, sorts, default_sort):
+    """Paginate queryset by keyset and return the shared template context for an admin listing."""
+    sort = request.GET.get('sort', default_sort)
+    if sort not in sorts:
+        sort = default_sort
+    page = keyset_paginate(queryset, sorts[sort], request.GET.get('cursor'), ADMIN_PAGE_SIZE)
+    params = request.GET.copy()
+    params.pop('cursor', None)  # Page links add their own cursor
+    return {'page': page, 'sort': sort, 'querystring': params.urlencode()}
 
 
 def room_management(request):
     if request.user.user_type != 'admin':
         return redirect('login')
     rooms = Room.objects.all()
-    return render(request, 'admin/room_management.html', {'rooms': rooms})
+    if request.GET.get('room_type'):
+        rooms = rooms.filter(room_type=request.GET['room_type'])
+    if request.GET.get('available') in ('0', '1'):
+        rooms = rooms.filter(is_available=request.GET['available'] == '1')
+    context = _listing_context(request, rooms, ROOM_SORTS, 'room_number')
+    context['room_types'] = Room.ROOM_TYPE_CHOICES
+    return render(request, 'admin/room_management.html', context)
 
 
 def student_management(request):
     if request.user.user_type != 'admin':
         return redirect('login')
-    students = Student.objects.all()
-    return render(request, 'admin/student_management.html', {'students': students})
+    students = Student.objects.select_related('room')  # The template shows each student's room
+    if request.GET.get('room_type'):
+        students = students.filter(room__room_type=request.GET['room_type'])
+    if request.GET.get('assigned') in ('0', '1'):
+        students = students.filter(room__isnull=request.GET['assigned'] == '0')
+    context = _listing_context(request, students, STUDENT_SORTS, 'name')
+    context['room_types'] = Room.ROOM_TYPE_CHOICES
+    return render(request, 'admin/student_management.html', context)
 
 
 def rent_management(request):
     if request.user.user_type != 'admin':
         return redirect('login')
 
-    students = Student.objects.all()
-    student_balances = []
+    # Balances are kept up to date by the rent ledger, so arrears are one indexed query
+    balances = (RentBalance.objects.filter(balance__gt=0)
+                .select_related('student__room')
+                .order_by('-balance'))
+    totals = RentBalance.objects.aggregate(
+        charged=Sum('total_charged'),
+        paid=Sum('total_paid'),
+        outstanding=Sum('balance', filter=Q(balance__gt=0)),
+    )
 
-    for student in students:
-        balance = student.rent_due - student.rent_paid
-        student_balances.append({
-            'student': student,
-            'balance': balance,
-        })
-
-    return render(request, 'admin/rent_management.html', {'student_balances': student_balances})
+    return render(request, 'admin/rent_management.html', {'balances': balances, 'totals': totals})
 
 
 def feedback_management(request):
     if request.user.user_type != 'admin':
         return redirect('login')
-    feedbacks = Feedback.objects.all()
-    return render(request, 'admin/feedback_management.html', {'feedbacks': feedbacks})
+    feedbacks = Feedback.objects.select_related('student')  # The template shows each student's name
+    if request.GET.get('student'):
+        feedbacks = feedbacks.filter(student__student_id=request.GET['student'])
+    context = _listing_context(request, feedbacks, FEEDBACK_SORTS, '-timestamp')
+    return render(request, 'admin/feedback_management.html', context)
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min)) if day else None
+
+
+def _search_date(request, field):
+    """The date in GET field, or None; a malformed one is reported and ignored."""
+    try:
+        return parse_date(request.GET.get(field, '') or '')
+    except ValueError:  # Well formed but impossible, e.g. 2026-02-31
+        messages.error(request, f"Ignored the {field} date: {request.GET[field]} is not a valid date.")
+        return None
+
+
+@login_required(login_url='/hostel/login/')
+def staff_search(request):
+    """Full-text search over feedback, contact inquiries and messages, best matches first."""
+    if request.user.user_type != 'admin':
+        return redirect('login')
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('kind', '')
+    since = _search_date(request, 'since')
+    until = _search_date(request, 'until')
+    results = []
+    if query:
+        hits = search(
+            query,
+            kinds=[kind] if kind in SEARCH_SOURCES else None,
+            inquiry_type=request.GET.get('inquiry_type') or None,
+            since=_start_of_day(since),
+            until=_start_of_day(until + datetime.timedelta(days=1)) if until else None,  # The until day is included
+        )
+        results = load_search_hits(hits)
+    return render(request, 'admin/search.html', {
+        'query': query,
+        'results': results,
+        'kinds': list(SEARCH_SOURCES),
+        'inquiry_types': ContactInquiry.INQUIRY_CHOICES,
+        'limit': getattr(settings, 'SEARCH_RESULT_LIMIT', 200),
+    })
 
 def add_room(request):
     if request.method == 'POST':
@@ -204,13 +344,15 @@ def add_student(request):
 def edit_rent(request, student_id):
     student = Student.objects.get(id=student_id)
     if request.method == 'POST':
-        form = RentForm(request.POST, instance=student)
+        form = RentEntryForm(request.POST)
         if form.is_valid():
-            form.save()
+            entry = form.save(commit=False)
+            entry.student = student
+            entry.save()  # Appends to the ledger and updates the student's balance
             return redirect('rent_management')
     else:
-        form = RentForm(instance=student)
-    return render(request, 'admin/rent_management.html', {'form': form})
+        form = RentEntryForm()
+    return render(request, 'admin/rent_management.html', {'form': form, 'student': student})
 
 def delete_feedback(request, feedback_id):
     feedback = Feedback.objects.get(id=feedback_id)
@@ -218,17 +360,106 @@ def delete_feedback(request, feedback_id):
         feedback.delete()
         return redirect('feedback_management')
     return render(request, 'admin/feedback_management.html', {'feedback': feedback})
+
 @login_required(login_url='/hostel/login/')
-def my_profile(request):
-    try:
-        student = request.user.student
-    except Student.DoesNotExist:
-        student = None  # Handle the case where the student profile doesn't exist
-    bookings = RoomBooking.objects.filter(student=student).order_by('-booking_date')
-    messages = Message.objects.filter(student=student).order_by('-timestamp')
+def edit_room(request, room_id):
+    if request.user.user_type != 'admin':
+        return redirect('login')
+    room = get_object_or_404(Room, pk=room_id)
+    if request.method == 'POST':
+        form = RoomForm(request.POST, instance=room)
+        if form.is_valid():
+            form.save()
+            return redirect('room_management')
+    else:
+        form = RoomForm(instance=room)
+    return render(request, 'admin/edit_form.html', {'form': form, 'title': f'Edit Room {room.room_number}',
+                                                    'cancel_url': 'room_management'})
 
-    return render(request, 'student/profile.html', {
+@login_required(login_url='/hostel/login/')
+def delete_room(request, room_id):
+    if request.user.user_type != 'admin':
+        return redirect('login')
+    room = get_object_or_404(Room, pk=room_id)
+    if request.method == 'POST':
+        # Deleting an occupied room would leave its bookings assigned to no room
+        if RoomBooking.objects.filter(room=room, status='assigned').exists():
+            messages.error(request, f"Room {room.room_number} is occupied; vacate its bookings first.")
+        else:
+            room.delete()
+        return redirect('room_management')
+    return render(request, 'admin/confirm_delete.html', {'object': room, 'title': f'Delete Room {room.room_number}',
+                                                         'cancel_url': 'room_management'})
+
+@login_required(login_url='/hostel/login/')
+def edit_student(request, student_id):
+    if request.user.user_type != 'admin':
+        return redirect('login')
+    student = get_object_or_404(Student, pk=student_id)
+    if request.method == 'POST':
+        form = StudentEditForm(request.POST, instance=student)
+        if form.is_valid():
+            form.save()
+            return redirect('student_management')
+    else:
+        form = StudentEditForm(instance=student)
+    return render(request, 'admin/edit_form.html', {'form': form, 'title': f'Edit {student.name}',
+                                                    'cancel_url': 'student_management'})
+
+@login_required(login_url='/hostel/login/')
+def delete_student(request, student_id):
+    if request.user.user_type != 'admin':
+        return redirect('login')
+    student = get_object_or_404(Student.objects.select_related('user'), pk=student_id)
+    if request.method == 'POST':
+        # Give the student's beds back first, so the rooms and the waitlist see them free
+        for booking in RoomBooking.objects.filter(student=student, status='assigned'):
+            booking.vacate()
+        student.user.delete()  # The student goes with the account
+        return redirect('student_management')
+    return render(request, 'admin/confirm_delete.html', {'object': student, 'title': f'Delete {student.name}',
+                                                         'cancel_url': 'student_management'})
+# Messages per inbox page and bookings shown on the profile page
+INBOX_PAGE_SIZE = 20
+PROFILE_BOOKINGS = 10
+
+
+@login_required(login_url='/hostel/login/')
+async def my_profile(request):
+    user = await request.auser()
+    # hostel.identity loads the student with the user, so this is normally no query
+    student = await sync_to_async(getattr)(user, 'student', None)  # None if the profile doesn't exist
+    bookings = RoomBooking.objects.filter(student=student).order_by('-booking_date')[:PROFILE_BOOKINGS]
+    inbox = Message.objects.filter(student=student)
+    if request.GET.get('unread') == '1':
+        inbox = inbox.filter(is_read=False)
+
+    # Each read runs on the one thread sync ORM calls share, so they go one after another
+    bookings = await _alist(bookings)
+    page = await akeyset_paginate(inbox, ('-timestamp',), request.GET.get('cursor'), INBOX_PAGE_SIZE)
+    unread = await InboxCounter.aunread_for(student.pk) if student else 0
+    params = request.GET.copy()
+    params.pop('cursor', None)
+
+    return await _arender(request, 'student/profile.html', {
         'student': student,
         'bookings': bookings,
-        'messages': messages,
-    })
\ No newline at end of file
+        'messages': page,
+        'page': page,
+        'querystring': params.urlencode(),
+        'unread_count': unread,
+    })
+
+
+@login_required(login_url='/hostel/login/')
+def mark_message_read(request, message_id):
+    if request.method == 'POST':
+        Message.objects.filter(pk=message_id, student__user=request.user).mark_read()
+    return redirect('my_profile')
+
+
+@login_required(login_url='/hostel/login/')
+def mark_all_messages_read(request):
+    if request.method == 'POST':
+        Message.objects.filter(student__user=request.user).mark_read()  # One UPDATE however many there are
+    return redirect('my_profile')
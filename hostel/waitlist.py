@@ -0,0 +1,114 @@
+"""
+Priority waitlist for room bookings.
+
+Pending bookings wait in one queue per booking preference, highest priority first
+and then in booking order. A booking's priority is worked out once, when it is made,
+by adding up the points from the rules in settings.WAITLIST_PRIORITY_RULES, and is
+stored on the booking so the queue order comes straight from hostel_booking_waitlist_idx:
+finding the next booking for a room type is one index seek per preference that
+room type can satisfy, never a scan of the pending bookings.
+
+Whenever beds may have freed up (a room added or edited, a booking vacated or deleted,
+beds released through room_beds_changed) a background task fills the free beds in those
+rooms from the head of the waitlist once the transaction commits.
+"""
+import threading
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .allocation import BOOKING_ROOM_TYPES
+from .models import Room, RoomBooking
+from .queue import task
+from .signals import room_beds_changed
+
+DEFAULT_PRIORITY_RULES = ['hostel.waitlist.longer_stays_first']
+
+_filling = threading.local()
+
+
+def longer_stays_first(booking):
+    """Priority rule: a year's stay outranks a semester, which outranks a month."""
+    return {'one_year': 2, 'one_semester': 1}.get(booking.duration_of_stay, 0)
+
+
+def priority_for(booking):
+    """Sum of the points every configured priority rule gives a booking."""
+    rules = getattr(settings, 'WAITLIST_PRIORITY_RULES', DEFAULT_PRIORITY_RULES)
+    return sum(import_string(rule)(booking) for rule in rules)
+
+
+def eligible_preferences(room_type):
+    """The booking preferences a bed in a room of room_type can satisfy."""
+    preferences = [preference for preference, room_types in BOOKING_ROOM_TYPES.items() if room_type in room_types]
+    if room_type not in BOOKING_ROOM_TYPES:
+        preferences.append(room_type)  # A booking for the room type itself
+    return preferences
+
+
+def waiting(preference):
+    """Pending bookings for one preference in waitlist order."""
+    return (RoomBooking.objects.filter(status='pending', room_type=preference)
+            .select_related('student').order_by('-priority', 'booking_date', 'pk'))
+
+
+def next_booking(room_type, exclude=()):
+    """The booking first in line for a bed in a room of room_type, skipping exclude (ids); None if nobody is waiting."""
+    heads = [booking for booking in (waiting(preference).exclude(pk__in=exclude).first()
+                                     for preference in eligible_preferences(room_type))
+             if booking is not None]
+    return min(heads, key=lambda booking: (-booking.priority, booking.booking_date, booking.pk), default=None)
+
+
+@task(atomic=False)  # Each bed is assigned in its own transaction
+def fill_free_beds(room_ids=None):
+    """
+    Assign waiting bookings to the free beds in room_ids (every room if None), each
+    bed going to the first booking in waitlist order whose stay fits. Returns how many
+    were assigned.
+    """
+    # Not only rooms with a bed free today: one full now can take a stay that starts later
+    rooms = Room.objects.order_by('beds_available', 'room_number')
+    if room_ids is not None:
+        rooms = rooms.filter(pk__in=room_ids)
+    assigned = 0
+    _filling.active = True
+    try:
+        for room in rooms:
+            clashing = set()  # Waiting bookings whose stay doesn't fit around this room's stays
+            while (booking := next_booking(room.room_type, exclude=clashing)) is not None:
+                if booking.assign_room(room):  # Checks the booking's dates against the room's stays
+                    assigned += 1
+                elif RoomBooking.objects.filter(pk=booking.pk, status='pending').exists():
+                    clashing.add(booking.pk)  # It waits for another room; try the next in line
+                # Otherwise another assigner got there first; look again
+    finally:
+        _filling.active = False
+    return {'assigned': assigned}
+
+
+def queue_fill(room_ids):
+    """Queue filling the free beds in room_ids; workers only see it once the current transaction commits."""
+    if not getattr(_filling, 'active', False):  # Beds taken by fill_free_beds itself
+        fill_free_beds.delay(room_ids=list(room_ids))
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, **kwargs):
+    queue_fill([instance.pk])  # Even a room full today may take a later stay
+
+
+@receiver(room_beds_changed)
+def beds_changed(sender, room_ids, **kwargs):
+    queue_fill(room_ids)
+
+
+@receiver(post_delete, sender=RoomBooking)
+def booking_deleted(sender, instance, **kwargs):
+    """A student leaving (or being removed) with an assigned room frees their bed."""
+    if instance.status == 'assigned' and instance.room_id and instance.stays_on(timezone.localdate()):
+        Room.release_beds([instance.room_id])
+        room_beds_changed.send(sender=Room, room_ids=[instance.room_id])
@@ -3,6 +3,38 @@ ASGI config for hostelmanagement project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+ASGI deployment
+---------------
+The student-facing read views (index, student_rooms, my_profile) are async and
+use the async ORM, and every middleware in settings.MIDDLEWARE can run async, so
+under an ASGI server those requests never hold a thread while they wait on the
+database or on a slow client. Run one event loop per CPU core, for example:
+
+    pip install "uvicorn[standard]" gunicorn
+    gunicorn hostelmanagement.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+or, without gunicorn managing the processes:
+
+    uvicorn hostelmanagement.asgi:application --workers 4 --host 0.0.0.0 --port 8000
+
+The remaining views are synchronous; Django runs each of them in a thread of its
+own, so they behave exactly as under WSGI. The WSGI entry point in wsgi.py still
+works for every view, async ones included, but gives up the concurrency.
+
+The live availability stream (/hostel/live/, hostel.live) needs ASGI: each open
+stream is a coroutine waiting for events, so a worker holds thousands of them
+cheaply, whereas under WSGI it would tie up a thread, so there it answers 204 and
+pages keep the numbers they were rendered with. Events reach every worker, and
+come from `run_tasks` and management commands too, through the database by default
+(hostel.live.DatabaseBackend), so several workers need nothing more. To take that
+polling off the database, set HOSTEL_LIVE_EVENTS_BACKEND=hostel.live.CacheBackend
+with a cache every process shares (HOSTEL_CACHE_URL pointing at Redis).
+Proxies in front must not buffer responses (nginx: proxy_buffering off, or the
+X-Accel-Buffering header the stream sends) and must allow long reads.
+
+`python manage.py benchmark --slow-clients 100 --client-delay 0.25` compares the
+requests per second of a threaded WSGI worker and one ASGI event loop.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,11 +46,13 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'hostel.CustomUser'
 
 MIDDLEWARE = [
+    'hostel.middleware.QueryStatsMiddleware',  # First, so session and auth queries are counted too
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'hostel.identity.CachedUserMiddleware',  # Right after auth: request.user with student and room, from the cache
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -59,13 +64,23 @@ TEMPLATES = [
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates']
         ,
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'hostel.inbox.unread_messages',
+                'hostel.availability.room_catalogue',
+                'hostel.versions.data_versions',
+            ],
+            # Compile each template once per process and keep it in memory; runserver
+            # clears it when a template file changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
@@ -77,15 +92,178 @@ WSGI_APPLICATION = 'hostelmanagement.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'hostel',
-        'USER': 'root',
-        'PASSWORD': '',
-        'HOST': 'localhost',
-        'PORT': '3306',
+# Configured from the environment. HOSTEL_DB_ENGINE picks the backend:
+#   mysql (default)  HOSTEL_DB_NAME, HOSTEL_DB_USER, HOSTEL_DB_PASSWORD, HOSTEL_DB_HOST, HOSTEL_DB_PORT
+#   sqlite           HOSTEL_DB_NAME is the file (db.sqlite3 next to manage.py by default); for
+#                    single-node deployments, local development and benchmarks
+# HOSTEL_DB_CONN_MAX_AGE keeps each worker's connection open for that many seconds instead
+# of reconnecting on every request (0 restores Django's per-request connections). Health
+# checks replace a kept connection the server has dropped before a request uses it.
+# Under ASGI every request runs on a thread of its own, so kept connections are never
+# reused there: set HOSTEL_DB_CONN_MAX_AGE=0 and pool in front of MySQL (ProxySQL, MySQL Router).
+
+DB_ENGINE = os.environ.get('HOSTEL_DB_ENGINE', 'mysql')
+DB_CONN_MAX_AGE = int(os.environ.get('HOSTEL_DB_CONN_MAX_AGE', '60'))
+
+if DB_ENGINE == 'mysql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.environ.get('HOSTEL_DB_NAME', 'hostel'),
+            'USER': os.environ.get('HOSTEL_DB_USER', 'root'),
+            'PASSWORD': os.environ.get('HOSTEL_DB_PASSWORD', ''),
+            'HOST': os.environ.get('HOSTEL_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('HOSTEL_DB_PORT', '3306'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'charset': 'utf8mb4',
+                # Django's recommended level for MySQL; the allocation code relies on
+                # conditional UPDATEs, not on repeatable reads
+                'isolation_level': 'read committed',
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+                'connect_timeout': 5,
+            },
+        }
+    }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('HOSTEL_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before "database is locked"
+                'timeout': float(os.environ.get('HOSTEL_DB_BUSY_TIMEOUT', '20')),
+                # Take the write lock at BEGIN so concurrent write transactions queue on the
+                # busy timeout instead of failing when a read lock can't be upgraded
+                'transaction_mode': 'IMMEDIATE',
+                # Migration 0025 puts the file in WAL mode, which lets readers run alongside
+                # the single writer; synchronous=NORMAL is durable across application crashes
+                # in WAL mode and skips most fsyncs. 64 MB page cache and 256 MB of
+                # memory-mapped reads per connection.
+                'init_command': (
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA cache_size=-65536;'
+                    'PRAGMA mmap_size=268435456;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+            # On disk rather than in memory, so threaded tests get the busy timeout above instead
+            # of shared-cache "table is locked" errors
+            'TEST': {'NAME': os.environ.get('HOSTEL_TEST_DB_NAME', BASE_DIR / 'test_db.sqlite3')},
+        }
     }
+else:
+    raise ImproperlyConfigured(f"HOSTEL_DB_ENGINE must be 'mysql' or 'sqlite', not '{DB_ENGINE}'.")
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Data versions, cached users, sessions and rate limits live here, so every process
+# (web workers, `run_tasks`, management commands) must share it: set HOSTEL_CACHE_URL to
+# a Redis server (redis://host:6379/0). Without it the cache is local memory, private to
+# each process; that is only fine for a single process, and `check --deploy` fails on it.
+
+CACHE_URL = os.environ.get('HOSTEL_CACHE_URL', '')
+
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'hostel',
+        }
+    }
+
+# Sessions are read from the cache and written through to the database, so a cache
+# restart logs nobody out
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
+
+# Maximum age in seconds of a cached user with their student profile and room (hostel.identity)
+USER_CACHE_TIMEOUT = 300
+
+# Cache alias and maximum age in seconds of the cached room availability snapshot
+ROOM_AVAILABILITY_CACHE = 'default'
+ROOM_AVAILABILITY_CACHE_TIMEOUT = 30
+
+# Rules whose points add up to a booking's waitlist priority (higher is assigned first,
+# ties go by booking date). Each is a dotted path to a function taking the booking.
+WAITLIST_PRIORITY_RULES = [
+    'hostel.waitlist.longer_stays_first',
+]
+
+# Background tasks (hostel.queue), run by `manage.py run_tasks`. A failed attempt is retried
+# after TASK_RETRY_BACKOFF seconds, doubling up to TASK_RETRY_BACKOFF_MAX; a worker that holds
+# a task longer than TASK_LEASE seconds is presumed dead. TASKS_EAGER runs tasks inline after
+# the transaction commits instead, with no worker (development and tests).
+TASKS_EAGER = os.environ.get('HOSTEL_TASKS_EAGER', '') == '1'
+TASK_RETRY_BACKOFF = 10
+TASK_RETRY_BACKOFF_MAX = 3600
+TASK_LEASE = 300
+
+# Uploaded files waiting for a background import
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Limits on POSTs to the public forms (hostel.ratelimit): per route, (scope, requests, seconds)
+# where scope 'ip' counts by client address and any other scope by that POST field.
+# RATE_LIMIT_PROXIES is the number of reverse proxies in front that append to X-Forwarded-For.
+RATE_LIMITS = {
+    'login': [('ip', 20, 60), ('ip', 100, 3600), ('username', 10, 900)],
+    'signup': [('ip', 5, 3600)],
+    'contact': [('ip', 5, 600), ('email', 3, 600)],
+}
+RATE_LIMIT_PROXIES = int(os.environ.get('HOSTEL_RATE_LIMIT_PROXIES', '0'))
+
+# JSON API (hostel.api): default and largest page sizes, and how long a serialised
+# response is kept in the cache under its ETag
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+API_RESPONSE_CACHE_TIMEOUT = 300
+
+# Server-Sent Events (hostel.live). DatabaseBackend carries events between every process
+# through the database; 'hostel.live.CacheBackend' does it through a cache they all share;
+# LocalBackend reaches the streams of the publishing process only (one ASGI process with
+# TASKS_EAGER). Seconds between keep-alives, events a slow stream may fall behind by before
+# it gets a snapshot instead, how often the backends poll and for how long they keep
+# events, and how late DatabaseBackend still picks up an event that committed late.
+LIVE_EVENTS_BACKEND = os.environ.get('HOSTEL_LIVE_EVENTS_BACKEND', 'hostel.live.DatabaseBackend')
+LIVE_EVENTS_HEARTBEAT = 15
+LIVE_EVENTS_QUEUE_SIZE = 100
+LIVE_EVENTS_POLL_INTERVAL = 0.5
+LIVE_EVENTS_TTL = 60
+LIVE_EVENTS_GRACE = 5
+
+# Most hits a full-text search returns (hostel.search), best first
+SEARCH_RESULT_LIMIT = 200
+
+
+# Maximum SQL queries per request for each URL name, session and auth lookups included.
+# QueryStatsMiddleware logs a warning when a view goes over; hostel.querystats.assert_query_budget
+# fails a test when it does.
+QUERY_BUDGETS = {
+    'index': 3,
+    'student_rooms': 3,
+    'book_room': 3,
+    'my_profile': 6,
+    'room_management': 3,
+    'student_management': 3,
+    'rent_management': 4,
+    'feedback_management': 3,
+    'staff_search': 6,
+    'api_rooms': 3,
+    'api_room_types': 3,
+    'api_my_bookings': 3,
+    'api_my_messages': 4,
+    'admin_dashboard': 5,
 }
 
 
@@ -123,6 +301,11 @@ USE_TZ = True
 LOGIN_URL = '/hostel/login/'
 LOGIN_REDIRECT_URL = '/hostel/index/'  # Redirect after login
 LOGOUT_REDIRECT_URL = '/hostel/login/'  # Redirect after logout
+
+# Day of the month rent is due; reminders go out from that day on, once per cycle.
+# Use 'last' for the last day of the month. Days past the end of a month fall back to its last day.
+RENT_REMINDER_DUE_DAY = 30
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
@@ -130,6 +313,19 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic hashes file names, writes resized WebP/AVIF copies of images and
+# gzip/brotli copies of CSS and JS (see hostel/storage.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'hostel.storage.OptimizedStaticFilesStorage'},
+}
+STATIC_IMAGE_WIDTHS = [480, 960, 1600]
+
+# Serve STATIC_ROOT from Django with immutable cache headers and precompressed bodies,
+# for deployments with nothing in front of it. Leave off behind nginx or a CDN.
+SERVE_STATIC = False
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
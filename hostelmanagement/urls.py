@@ -14,10 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from hostel.static_views import serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('hostel/', include('hostel.urls')),
 ]
+
+if settings.SERVE_STATIC:
+    # Only for deployments with no web server or CDN in front of /static/
+    urlpatterns += [re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), serve_static)]